@@ -0,0 +1,133 @@
+"""
+Catalog Encoding Benchmark
+
+Compares the list_products tool result the model receives in each catalog
+encoding (raw seller JSON, projected JSON, table): its size in characters and
+estimated prompt tokens, the time to encode it, and the time when the
+encoding is served from the per-version cache.
+
+With --live, also sends a follow-up completion carrying each encoding to the
+LLM API (DAT1_API_KEY must be set) and reports its latency and, when the API
+returns usage, the prompt tokens it counted.
+
+Usage:
+    python benchmarks/catalog_encoding.py [--products 11] [--live] [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import timeit
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chat_backend'))
+
+import requests  # noqa: E402
+
+from catalog_encoding import CatalogEncoder, FORMAT_JSON, FORMAT_RAW, FORMAT_TABLE  # noqa: E402
+from history import estimate_tokens  # noqa: E402
+from llm_service import (  # noqa: E402
+    DAT1_API_KEY,
+    LLM_API_URL,
+    LLM_MODEL,
+    _build_llm_headers,
+    _build_llm_payload
+)
+
+FORMATS = (FORMAT_RAW, FORMAT_JSON, FORMAT_TABLE)
+TAGS = ('wine', 'warm', 'beer', 'soft', 'almost beer', 'strong beer')
+
+
+def build_catalog(count: int) -> Dict[str, Any]:
+    """Build a catalog shaped like the seller backend's GET /products response"""
+    return {'products': [
+        {
+            'id': f"item_{index:03d}",
+            'name': f"Drink number {index}",
+            'price': 300 + 50 * (index % 9),
+            'description': 'Served cold, with a slice of lemon on request',
+            'long_description': (
+                'A classic drink with a long history. Brewed and bottled close to the city it comes '
+                'from, it is appreciated for its balanced flavour and is a popular choice with food. '
+                'Best enjoyed fresh, at the right temperature, in good company.'
+            ),
+            'stock': index % 7,
+            'image': f"https://images.example.com/catalog/drinks/item_{index:03d}-large.jpg",
+            'origin': {'city': 'Brussels', 'country': 'Belgium'},
+            'tag': TAGS[index % len(TAGS)]
+        }
+        for index in range(1, count + 1)
+    ]}
+
+
+def tool_turn(tool_result: str) -> List[Dict[str, Any]]:
+    """History of a catalog browsing turn, ready for the follow-up completion"""
+    return [
+        {'role': 'user', 'content': 'What drinks do you have?'},
+        {'role': 'assistant', 'content': None, 'tool_calls': [
+            {'id': 'call_1', 'type': 'function', 'function': {'name': 'list_products', 'arguments': '{}'}}
+        ]},
+        {'role': 'tool', 'tool_call_id': 'call_1', 'name': 'list_products', 'content': tool_result}
+    ]
+
+
+def measure_live(messages: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    """Time follow-up completions carrying a tool result"""
+    latencies = []
+    prompt_tokens = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        response = requests.post(
+            LLM_API_URL, headers=_build_llm_headers(), json=_build_llm_payload(LLM_MODEL, messages), timeout=120
+        )
+        latencies.append(time.perf_counter() - started_at)
+        response.raise_for_status()
+        prompt_tokens = (response.json().get('usage') or {}).get('prompt_tokens', prompt_tokens)
+    return {'median_ms': statistics.median(latencies) * 1000, 'prompt_tokens': prompt_tokens}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=11, help='Products in the catalog (the demo seller has 11)')
+    parser.add_argument('--live', action='store_true', help='Also time completions against the LLM API')
+    parser.add_argument('--repeat', type=int, default=5, help='Completions per format with --live')
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.products)
+    iterations = 2000
+
+    print(f"Catalog: {args.products} products\n")
+    print(f"{'format':<8} {'chars':>8} {'~tokens':>8} {'saved':>7} {'encode µs':>10} {'cached µs':>10}")
+
+    baseline = None
+    results = {}
+    for output_format in FORMATS:
+        encoder = CatalogEncoder(output_format)
+        encoded = encoder.encode(catalog)
+        tokens = estimate_tokens({'role': 'tool', 'content': encoded})
+        baseline = baseline or tokens
+
+        encode_us = timeit.timeit(lambda: encoder.encode(catalog), number=iterations) / iterations * 1e6
+        encoder.encode(catalog, version=1)
+        cached_us = timeit.timeit(lambda: encoder.encode(catalog, version=1), number=iterations) / iterations * 1e6
+
+        results[output_format] = encoded
+        print(f"{output_format:<8} {len(encoded):>8} {tokens:>8} {1 - tokens / baseline:>7.0%} "
+              f"{encode_us:>10.1f} {cached_us:>10.2f}")
+
+    if not args.live:
+        return
+    if not DAT1_API_KEY:
+        sys.exit('\n--live needs DAT1_API_KEY')
+
+    print(f"\nFollow-up completion latency ({args.repeat} runs each, {LLM_MODEL})\n")
+    print(f"{'format':<8} {'median ms':>10} {'prompt tokens':>14}")
+    for output_format, encoded in results.items():
+        live = measure_live(tool_turn(encoded), args.repeat)
+        print(f"{output_format:<8} {live['median_ms']:>10.0f} {live['prompt_tokens'] or '-':>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,496 @@
+"""
+End-to-End Load Test
+
+Starts the chat backend with its upstreams on one machine and drives a mixed
+workload through it:
+
+    load_test.py ──> chat backend ──> seller_stub.py ──> mock_stripe_spt
+                          │    └──────────────────────────> mock_stripe_spt
+                          └──> mock_llm
+
+Each of --concurrency virtual users runs a closed loop for --duration
+seconds. Every iteration picks one operation by weight (--mix):
+
+    browse       GET  /products
+    create       POST /checkout/create
+    get          GET  /checkout/<id>
+    update       PUT  /checkout/<id>/update
+    complete     POST /checkout/<id>/complete  (issues and redeems an SPT)
+    cancel       POST /checkout/<id>/cancel
+    chat         POST /chat                    (LLM, tool calls, follow-up)
+    chat_stream  POST /chat/stream             (timed to the end of the stream)
+
+Operations on a checkout use one the user created before, creating it first
+when there is none. The report lists throughput, p50/p95/p99 latency and
+errors per operation, measured after --warmup seconds, and is written as JSON
+so runs on different commits can be compared with --compare.
+
+Usage:
+    python benchmarks/load_test.py [--server flask|asgi] [--concurrency 16] [--duration 30]
+        [--mix browse=30,create=10,...] [--llm-latency lognormal:0.4,0.5] [--output run.json]
+    python benchmarks/load_test.py --chat-url http://localhost:9000   # services already running
+    python benchmarks/load_test.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+DEFAULT_MIX = 'browse=30,create=10,get=10,update=10,complete=8,cancel=4,chat=20,chat_stream=8'
+OPERATIONS = ('browse', 'create', 'get', 'update', 'complete', 'cancel', 'chat', 'chat_stream')
+CHECKOUT_OPERATIONS = ('get', 'update', 'complete', 'cancel')
+
+PAYMENT_TOKEN = 'pm_card_visa'
+FULFILLMENT_ADDRESS = {
+    'name': 'Load Test', 'line_one': 'Rue de la Loi 16', 'city': 'Brussels',
+    'state': 'BXL', 'country': 'BE', 'postal_code': '1000'
+}
+CHAT_PROMPTS = (
+    'What drinks do you have?',
+    'Can you add item_003 to my cart?',
+    'Hi, what can you do?',
+    'Show me the menu please',
+    'I want to buy item_007'
+)
+
+
+# ============================================================================
+# SERVICES
+# ============================================================================
+
+class Services:
+    """
+    Starts the chat backend, mock SPT server, mock LLM and seller stand-in as
+    subprocesses on consecutive ports, and stops them again.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.log_dir = tempfile.mkdtemp(prefix='acp-load-test-')
+        self.processes: List[subprocess.Popen] = []
+        port = args.base_port
+        self.chat_url = f"http://127.0.0.1:{port}"
+        self.seller_url = f"http://127.0.0.1:{port + 1}"
+        self.spt_url = f"http://127.0.0.1:{port + 2}"
+        self.llm_url = f"http://127.0.0.1:{port + 3}"
+
+    def _start(self, name: str, command: List[str], cwd: str, env: Dict[str, str]) -> None:
+        log = open(os.path.join(self.log_dir, f"{name}.log"), 'w')
+        # Own process group, so reloaders and worker processes are stopped with their parent
+        self.processes.append(subprocess.Popen(
+            command, cwd=cwd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True
+        ))
+
+    def start(self) -> None:
+        args = self.args
+        port = args.base_port
+        spt_command = [sys.executable, 'server.py']
+        if args.spt_workers:
+            spt_command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'server:app']
+        self._start('mock_stripe_spt', spt_command, os.path.join(ROOT, 'mock_stripe_spt'), {
+            'MOCK_STRIPE_SPT_PORT': str(port + 2),
+            'MOCK_SPT_WORKERS': str(args.spt_workers),
+            'MOCK_SPT_STORE_PATH': os.path.join(self.log_dir, 'spt_tokens.sqlite3')
+        })
+        self._start('mock_llm', [sys.executable, 'server.py'], os.path.join(ROOT, 'mock_llm'), {
+            'MOCK_LLM_PORT': str(port + 3),
+            'MOCK_LLM_LATENCY': args.llm_latency,
+            'MOCK_LLM_TOKEN_DELAY': str(args.llm_token_delay),
+            'MOCK_LLM_SEED': str(args.seed)
+        })
+        self._start('seller_stub', [
+            sys.executable, os.path.join(ROOT, 'benchmarks', 'seller_stub.py'), '--port', str(port + 1),
+            '--spt-url', self.spt_url, '--latency', str(args.seller_latency),
+            '--payment-latency', str(args.payment_latency)
+        ], ROOT, {})
+        server_script = 'asgi_server.py' if args.server == 'asgi' else 'server.py'
+        self._start('chat_backend', [sys.executable, server_script], os.path.join(ROOT, 'chat_backend'), {
+            'CHAT_BACKEND_PORT': str(port),
+            'SELLER_BACKEND_URL': self.seller_url,
+            'MOCK_STRIPE_SPT_URL': self.spt_url,
+            'LLM_API_URL': f"{self.llm_url}/v1/chat/completions",
+            'LLM_MODEL': 'mock-llm',
+            'DAT1_API_KEY': 'load-test',
+            'DEBUG': 'False',
+            'ASGI_WORKERS': str(args.workers),
+            'ASGI_LOG_LEVEL': 'warning'
+        })
+        for url in (self.spt_url, self.llm_url, self.seller_url, self.chat_url):
+            self._wait_healthy(url)
+
+    def _wait_healthy(self, url: str, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(f"{url}/health", timeout=1).ok:
+                    return
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        sys.exit(f"{url} did not become healthy; logs are in {self.log_dir}")
+
+    def stop(self) -> None:
+        for process in self.processes:
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+
+
+# ============================================================================
+# WORKLOAD
+# ============================================================================
+
+class Recorder:
+    """
+    Thread-safe collector of per-operation latencies and errors.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+        self.recording = False
+
+    def record(self, operation: str, latency: float, error: Optional[str]) -> None:
+        if not self.recording:
+            return
+        with self._lock:
+            self.latencies[operation].append(latency)
+            if error is not None:
+                self.errors[operation][error] += 1
+
+
+class VirtualUser:
+    """
+    One closed-loop client with its own connection pool and open checkouts.
+    """
+
+    def __init__(self, chat_url: str, mix: List[Tuple[str, int]], recorder: Recorder, seed: int,
+                 timeout: float) -> None:
+        self.chat_url = chat_url
+        self.operations = [operation for operation, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.recorder = recorder
+        self.random = random.Random(seed)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.checkouts: List[str] = []
+        self.product_ids = [f"item_{index:03d}" for index in range(1, 12)]
+
+    def _call(self, operation: str, method: str, path: str, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        started_at = time.perf_counter()
+        error = None
+        body = None
+        try:
+            response = self.session.request(method, f"{self.chat_url}{path}", timeout=self.timeout, **kwargs)
+            # Reading the body is part of the latency, for streams too
+            content = response.content
+            if response.status_code >= 400:
+                error = str(response.status_code)
+            elif response.headers.get('Content-Type', '').startswith('application/json'):
+                body = json.loads(content)
+        except requests.exceptions.RequestException as exception:
+            error = type(exception).__name__
+        self.recorder.record(operation, time.perf_counter() - started_at, error)
+        return body
+
+    def _items(self) -> List[Dict[str, Any]]:
+        return [{'id': item_id, 'quantity': self.random.randint(1, 3)}
+                for item_id in self.random.sample(self.product_ids, self.random.randint(1, 3))]
+
+    def _checkout(self) -> Optional[str]:
+        if not self.checkouts:
+            self.create()
+        return self.random.choice(self.checkouts) if self.checkouts else None
+
+    def browse(self) -> None:
+        self._call('browse', 'GET', '/products')
+
+    def create(self) -> None:
+        body = self._call('create', 'POST', '/checkout/create', json={
+            'items': self._items(), 'fulfillment_address': FULFILLMENT_ADDRESS
+        })
+        if body and body.get('id'):
+            self.checkouts.append(body['id'])
+
+    def get(self) -> None:
+        checkout_id = self._checkout()
+        if checkout_id:
+            self._call('get', 'GET', f"/checkout/{checkout_id}")
+
+    def update(self) -> None:
+        checkout_id = self._checkout()
+        if checkout_id:
+            self._call('update', 'PUT', f"/checkout/{checkout_id}/update", json={'items': self._items()})
+
+    def complete(self) -> None:
+        checkout_id = self._checkout()
+        if checkout_id:
+            self.checkouts.remove(checkout_id)
+            self._call('complete', 'POST', f"/checkout/{checkout_id}/complete", json={'payment_token': PAYMENT_TOKEN})
+
+    def cancel(self) -> None:
+        checkout_id = self._checkout()
+        if checkout_id:
+            self.checkouts.remove(checkout_id)
+            self._call('cancel', 'POST', f"/checkout/{checkout_id}/cancel")
+
+    def chat(self) -> None:
+        self._call('chat', 'POST', '/chat', json={
+            'messages': [{'role': 'user', 'content': self.random.choice(CHAT_PROMPTS)}]
+        })
+
+    def chat_stream(self) -> None:
+        self._call('chat_stream', 'POST', '/chat/stream', json={
+            'messages': [{'role': 'user', 'content': self.random.choice(CHAT_PROMPTS)}]
+        })
+
+    def run(self, stop: threading.Event, think_time: float) -> None:
+        actions: Dict[str, Callable[[], None]] = {operation: getattr(self, operation) for operation in OPERATIONS}
+        while not stop.is_set():
+            actions[self.random.choices(self.operations, self.weights)[0]]()
+            if think_time:
+                stop.wait(think_time)
+
+
+def run_load(chat_url: str, args: argparse.Namespace) -> Tuple[Recorder, float]:
+    """
+    Drive the workload and return the recorder and the measured duration in seconds.
+    """
+    recorder = Recorder()
+    stop = threading.Event()
+    mix = parse_mix(args.mix)
+    users = [VirtualUser(chat_url, mix, recorder, args.seed + index, args.timeout) for index in range(args.concurrency)]
+    threads = [threading.Thread(target=user.run, args=(stop, args.think_time), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.warmup)
+    recorder.recording = True
+    started_at = time.perf_counter()
+    time.sleep(args.duration)
+    recorder.recording = False
+    duration = time.perf_counter() - started_at
+
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=args.timeout)
+    return recorder, duration
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def parse_mix(value: str) -> List[Tuple[str, int]]:
+    """Parse "operation=weight,..." into (operation, weight) pairs"""
+    mix = []
+    for part in value.split(','):
+        operation, _, weight = part.partition('=')
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {operation!r}; choose from {', '.join(OPERATIONS)}")
+        if int(weight) > 0:
+            mix.append((operation, int(weight)))
+    if not mix:
+        raise argparse.ArgumentTypeError('The mix needs at least one operation with a positive weight')
+    return mix
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: Counter, duration: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles (milliseconds) and errors of one operation"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        'requests': count,
+        'errors': sum(errors.values()),
+        'error_rate': round(sum(errors.values()) / count, 4) if count else 0.0,
+        'errors_by_kind': dict(errors),
+        'throughput_rps': round(count / duration, 2) if duration else 0.0,
+        'latency_ms': {
+            'mean': round(sum(ordered) / count * 1000, 2) if count else 0.0,
+            'p50': round(percentile(ordered, 0.50) * 1000, 2),
+            'p95': round(percentile(ordered, 0.95) * 1000, 2),
+            'p99': round(percentile(ordered, 0.99) * 1000, 2),
+            'max': round(ordered[-1] * 1000, 2) if count else 0.0
+        }
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    """Commit the run was made on, and whether the tree had local changes"""
+    def git(*command: str) -> str:
+        return subprocess.run(['git', *command], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {'commit': git('rev-parse', '--short', 'HEAD') or None, 'dirty': bool(git('status', '--porcelain'))}
+
+
+def build_report(recorder: Recorder, duration: float, args: argparse.Namespace,
+                 backend_stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    all_errors: Counter = Counter()
+    for errors in recorder.errors.values():
+        all_errors.update(errors)
+    return {
+        'label': args.label,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git': git_revision(),
+        'config': {
+            'server': args.server if not args.chat_url else 'external',
+            'workers': args.workers,
+            'spt_workers': args.spt_workers,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'think_time_s': args.think_time,
+            'mix': dict(parse_mix(args.mix)),
+            'llm_latency': args.llm_latency,
+            'llm_token_delay_s': args.llm_token_delay,
+            'seller_latency_s': args.seller_latency,
+            'payment_latency_s': args.payment_latency,
+            'seed': args.seed
+        },
+        'measured_duration_s': round(duration, 3),
+        'total': summarize(all_latencies, all_errors, duration),
+        'operations': {
+            operation: summarize(recorder.latencies[operation], recorder.errors[operation], duration)
+            for operation in OPERATIONS if operation in recorder.latencies
+        },
+        'backend_stats': backend_stats
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{'operation':<12} {'requests':>9} {'rps':>8} {'errors':>7} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(report['operations'].items()) + [('total', report['total'])]
+    for operation, stats in rows:
+        latency = stats['latency_ms']
+        print(f"{operation:<12} {stats['requests']:>9} {stats['throughput_rps']:>8.1f} {stats['errors']:>7} "
+              f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} {latency['max']:>9.1f}")
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Print the change in throughput and latency percentiles between two reports"""
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) / old:+.0%}" if old else '-'
+
+    print(f"before: {before.get('label') or before_path} ({before['git']['commit']})")
+    print(f"after:  {after.get('label') or after_path} ({after['git']['commit']})\n")
+    print(f"{'operation':<12} {'rps':>16} {'p50 ms':>20} {'p95 ms':>20} {'p99 ms':>20} {'errors':>10}")
+    operations = [op for op in OPERATIONS if op in before['operations'] and op in after['operations']]
+    for operation in operations + ['total']:
+        old = before['total'] if operation == 'total' else before['operations'][operation]
+        new = after['total'] if operation == 'total' else after['operations'][operation]
+        cells = [f"{new['throughput_rps']:.1f} {change(old['throughput_rps'], new['throughput_rps']):>5}"]
+        for key in ('p50', 'p95', 'p99'):
+            old_ms, new_ms = old['latency_ms'][key], new['latency_ms'][key]
+            cells.append(f"{new_ms:.1f} {change(old_ms, new_ms):>5}")
+        print(f"{operation:<12} {cells[0]:>16} {cells[1]:>20} {cells[2]:>20} {cells[3]:>20} "
+              f"{old['errors']:>4}→{new['errors']:<4}")
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask', help='Chat backend server to start')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for --server asgi')
+    parser.add_argument('--spt-workers', type=int, default=0,
+                        help='Run the mock SPT server under gunicorn with this many workers (0: development server)')
+    parser.add_argument('--chat-url', help='Load an already running chat backend instead of starting services')
+    parser.add_argument('--base-port', type=int, default=19000,
+                        help='Chat backend port; the seller, SPT server and LLM use the next three')
+    parser.add_argument('--concurrency', type=int, default=16, help='Virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of load before measuring')
+    parser.add_argument('--think-time', type=float, default=0, help='Pause between a user\'s requests')
+    parser.add_argument('--timeout', type=float, default=60, help='Client timeout per request')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Operation weights, e.g. "browse=3,chat=1"')
+    parser.add_argument('--llm-latency', default='lognormal:0.4,0.5', help='Mock LLM time to first token')
+    parser.add_argument('--llm-token-delay', type=float, default=0.02, help='Mock LLM seconds per token')
+    parser.add_argument('--seller-latency', type=float, default=0.0, help='Seconds added to seller requests')
+    parser.add_argument('--payment-latency', type=float, default=0.05, help='Seconds the simulated Stripe call takes')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the workload and mock LLM latencies')
+    parser.add_argument('--label', help='Name of the run, stored in the report')
+    parser.add_argument('--output', help='Report path (default: benchmarks/results/load-<commit>-<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Compare two reports and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    try:
+        parse_mix(args.mix)
+    except (argparse.ArgumentTypeError, ValueError) as error:
+        parser.error(str(error))
+
+    services = None
+    chat_url = args.chat_url
+    if chat_url is None:
+        services = Services(args)
+        print(f"Starting services (logs in {services.log_dir})...")
+        services.start()
+        chat_url = services.chat_url
+
+    try:
+        print(f"Running {args.concurrency} users for {args.warmup:g}s warmup + {args.duration:g}s against {chat_url}")
+        recorder, duration = run_load(chat_url.rstrip('/'), args)
+        try:
+            backend_stats = requests.get(f"{chat_url.rstrip('/')}/health", timeout=5).json()
+        except (requests.exceptions.RequestException, ValueError):
+            backend_stats = None
+    finally:
+        if services is not None:
+            services.stop()
+
+    report = build_report(recorder, duration, args, backend_stats)
+    print_report(report)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"load-{report['git']['commit'] or 'nogit'}-{stamp}.json")
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""ACP client microbenchmarks for the work done on every checkout completion"""
+
+import pytest
+
+from acp_client import _extract_total_amount_from_checkout
+
+
+@pytest.mark.parametrize('line_items', [1, 10, 100])
+def bench_extract_total_amount(benchmark, line_items, checkout_factory):
+    checkout = checkout_factory(line_items)
+    assert benchmark(_extract_total_amount_from_checkout, checkout) == 800 * line_items
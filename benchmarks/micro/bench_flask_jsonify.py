@@ -0,0 +1,27 @@
+"""
+Chat backend response serialization: jsonify of checkout sessions, and the
+GET /checkout/<id> request end to end with the seller backend stubbed.
+"""
+
+import pytest
+from flask import jsonify
+
+import server
+
+
+@pytest.mark.parametrize('line_items', [1, 10, 100])
+def bench_jsonify_checkout(benchmark, line_items, checkout_factory):
+    checkout = checkout_factory(line_items)
+    with server.app.app_context():
+        response = benchmark(jsonify, checkout)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('line_items', [1, 100])
+def bench_get_checkout_request(benchmark, line_items, checkout_factory, monkeypatch):
+    checkout = checkout_factory(line_items)
+    monkeypatch.setattr(server.acp_client, 'get_checkout', lambda checkout_id: checkout)
+    client = server.app.test_client()
+
+    response = benchmark(client.get, f"/checkout/{checkout['id']}")
+    assert response.status_code == 200
@@ -0,0 +1,89 @@
+"""
+LLMService microbenchmarks: a tool-calling turn end to end with the LLM and
+seller backend stubbed, and the JSON work done per streamed chunk.
+"""
+
+import json
+
+import pytest
+
+from conftest import StubLLMTransport, tool_call
+from llm_service import LLMService, StreamAccumulator, _parse_stream_line
+
+USER_MESSAGES = [
+    {'role': 'system', 'content': 'You are a helpful shop assistant.'},
+    {'role': 'user', 'content': 'What drinks do you have? Add a Zinnebir to my cart.'}
+]
+TOOL_CALLS = [
+    tool_call('call_1', 'list_products', {}),
+    tool_call('call_2', 'add_to_cart', {'item_id': 'item_008', 'quantity': 1})
+]
+
+
+@pytest.fixture
+def llm_service(acp_client):
+    service = LLMService(acp_client, transport=StubLLMTransport(TOOL_CALLS))
+    yield service
+    service.tool_executor.shutdown()
+
+
+def bench_process_message_with_tools(benchmark, llm_service):
+    """Two LLM calls around a list_products and an add_to_cart tool call"""
+    response = benchmark(lambda: llm_service.process_message(list(USER_MESSAGES)))
+    assert response['content'] and len(response['original_tool_calls']) == 2
+
+
+def bench_process_message_text_only(benchmark, acp_client):
+    service = LLMService(acp_client, transport=StubLLMTransport([]))
+    response = benchmark(lambda: service.process_message(list(USER_MESSAGES)))
+    service.tool_executor.shutdown()
+    assert response['content']
+
+
+def bench_run_tool_calls(benchmark, llm_service):
+    def run():
+        messages = list(USER_MESSAGES)
+        llm_service._run_tool_calls(TOOL_CALLS, messages)
+        return messages
+
+    messages = benchmark(run)
+    assert [message['role'] for message in messages[-2:]] == ['tool', 'tool']
+
+
+def bench_stream_accumulation(benchmark):
+    """Parse and merge the chunks of a streamed answer with one tool call"""
+    chunks = [{'content': f"word{index} "} for index in range(60)]
+    chunks.append({'tool_calls': [{'index': 0, 'id': 'call_1', 'function': {'name': 'add_to_cart', 'arguments': ''}}]})
+    chunks.extend({'tool_calls': [{'index': 0, 'function': {'arguments': part}}]}
+                  for part in ('{"item_id": ', '"item_008", ', '"quantity": 1}'))
+    lines = [f"data: {json.dumps({'choices': [{'delta': delta}]})}" for delta in chunks] + ['', 'data: [DONE]']
+
+    def accumulate():
+        accumulator = StreamAccumulator()
+        events = []
+        for line in lines:
+            delta = _parse_stream_line(line)
+            if delta is not None:
+                events.extend(accumulator.add(delta))
+        events.extend(accumulator.finish())
+        return accumulator.message()
+
+    message = benchmark(accumulate)
+    assert message['tool_calls'][0]['function']['arguments'] == '{"item_id": "item_008", "quantity": 1}'
+
+
+@pytest.mark.parametrize('turns', [4, 32])
+def bench_conversation_json_roundtrip(benchmark, turns, acp_client):
+    """Encode a request payload and decode a response, as every LLM call does"""
+    messages = list(USER_MESSAGES)
+    for index in range(turns):
+        messages.append({'role': 'assistant', 'content': None, 'tool_calls': TOOL_CALLS})
+        messages.append({'role': 'tool', 'tool_call_id': f"call_{index}", 'name': 'list_products',
+                         'content': json.dumps(acp_client.list_products())})
+    body = json.dumps({'choices': [{'message': messages[-2]}]})
+
+    def roundtrip():
+        json.dumps({'model': 'mock-llm', 'messages': messages})
+        return json.loads(body)
+
+    benchmark(roundtrip)
@@ -0,0 +1,50 @@
+"""
+Mock SPT server microbenchmarks: storing a token, the full GET
+/v1/shared_payment/granted_tokens/<id> request through Flask's test client, and
+the batch lookup of 100 tokens.
+"""
+
+import itertools
+
+import pytest
+
+from conftest import load_module
+
+spt_server = load_module('mock_stripe_spt/server.py', 'mock_stripe_spt_server')
+
+
+@pytest.fixture
+def spt_client():
+    spt_server.spt_storage.clear()
+    yield spt_server.app.test_client()
+    spt_server.spt_storage.clear()
+
+
+def _store(spt_id: str) -> None:
+    spt_server._store_spt(spt_id, 'pm_card_visa', 'usd', 5000, None, 'network_1', 'seller_1', 'trace_1')
+
+
+def bench_store_spt(benchmark, spt_client):
+    ids = (f"spt_{index:012d}" for index in itertools.count())
+    benchmark(lambda: _store(next(ids)))
+
+
+@pytest.mark.parametrize('stored_tokens', [1, 10000])
+def bench_get_spt(benchmark, spt_client, stored_tokens, monkeypatch):
+    for index in range(stored_tokens):
+        _store(f"spt_{index:012d}")
+    # The handler logs every lookup; keep the console out of the measurement
+    monkeypatch.setattr(spt_server, 'print', lambda *args, **kwargs: None, raising=False)
+
+    response = benchmark(spt_client.get, '/v1/shared_payment/granted_tokens/spt_000000000000')
+    assert response.status_code == 200
+
+
+def bench_get_spt_batch(benchmark, spt_client, monkeypatch):
+    ids = [f"spt_{index:012d}" for index in range(100)]
+    for spt_id in ids:
+        _store(spt_id)
+    monkeypatch.setattr(spt_server, 'print', lambda *args, **kwargs: None, raising=False)
+
+    response = benchmark(spt_client.post, '/v1/shared_payment/granted_tokens/batch', json={'ids': ids})
+    assert len(response.get_json()['data']) == 100
@@ -0,0 +1,170 @@
+"""
+Shared fixtures for the chat backend microbenchmarks.
+
+Upstreams are stubbed in-process: the LLM by a transport returning scripted
+completions, the seller backend by an ACP client returning canned sessions,
+so each benchmark measures only the CPU work of the code under test.
+"""
+
+import importlib.util
+import json
+import os
+import sys
+from types import ModuleType
+from typing import Any, Dict, List
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+sys.path.insert(0, os.path.join(ROOT, 'chat_backend'))
+
+# Read by the chat backend modules at import time
+os.environ['DAT1_API_KEY'] = 'microbenchmark'
+os.environ['COMPLETION_CACHE_ENABLED'] = 'False'
+os.environ['LLM_LIMITER_ENABLED'] = 'False'
+os.environ.pop('TRACE_EXPORT_PATH', None)
+
+PRODUCT_COUNT = 11
+
+
+def load_module(relative_path: str, name: str) -> ModuleType:
+    """Import a file under a unique module name (several services have a server.py)"""
+    path = os.path.join(ROOT, relative_path)
+    # Its sibling modules are imported as top-level modules
+    if os.path.dirname(path) not in sys.path:
+        sys.path.append(os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_catalog(count: int = PRODUCT_COUNT) -> Dict[str, Any]:
+    """Catalog shaped like the seller backend's GET /products response"""
+    return {'products': [
+        {
+            'id': f"item_{index:03d}",
+            'name': f"Drink number {index}",
+            'price': 300 + 50 * (index % 9),
+            'description': 'Served cold',
+            'long_description': 'A classic drink with a long history, appreciated for its balanced flavour. ' * 4,
+            'stock': 100,
+            'image': f"https://images.example.com/catalog/item_{index:03d}-large.webp",
+            'origin': {'city': 'Brussels', 'country': 'Belgium'},
+            'tags': ['beer', 'local']
+        }
+        for index in range(1, count + 1)
+    ]}
+
+
+def build_checkout(line_item_count: int) -> Dict[str, Any]:
+    """Checkout session shaped like the seller backend's, with the given number of line items"""
+    line_items = [
+        {
+            'id': f"item_{index:03d}",
+            'item': {'id': f"item_{index:03d}", 'quantity': 2},
+            'base_amount': 800, 'discount': 0, 'subtotal': 800, 'tax': 0, 'total': 800
+        }
+        for index in range(1, line_item_count + 1)
+    ]
+    subtotal = 800 * line_item_count
+    return {
+        'id': 'checkout_1761406798104_abc123def',
+        'buyer': {'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com'},
+        'payment_provider': {'provider': 'stripe', 'supported_payment_methods': ['card']},
+        'status': 'ready_for_payment',
+        'currency': 'usd',
+        'line_items': line_items,
+        'fulfillment_address': {
+            'name': 'Ada Lovelace', 'line_one': 'Rue de la Loi 16', 'city': 'Brussels',
+            'state': 'BXL', 'country': 'BE', 'postal_code': '1000'
+        },
+        'fulfillment_options': [{
+            'type': 'shipping', 'id': 'free', 'title': 'Take from Fridge', 'subtitle': 'In a second',
+            'carrier': 'Yourself', 'subtotal': '0', 'tax': '0', 'total': '0'
+        }],
+        'fulfillment_option_id': 'free',
+        'totals': [
+            {'type': 'subtotal', 'display_text': 'Subtotal', 'amount': subtotal},
+            {'type': 'fulfillment', 'display_text': 'Shipping', 'amount': 0},
+            {'type': 'tax', 'display_text': 'Tax', 'amount': 0},
+            {'type': 'total', 'display_text': 'Total', 'amount': subtotal}
+        ],
+        'messages': [],
+        'links': [
+            {'type': 'terms_of_use', 'url': 'https://example.com/terms'},
+            {'type': 'privacy_policy', 'url': 'https://example.com/privacy'}
+        ]
+    }
+
+
+def tool_call(call_id: str, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return {'id': call_id, 'type': 'function', 'function': {'name': name, 'arguments': json.dumps(arguments)}}
+
+
+class StubACPClient:
+    """ACP client answering from memory, like a fully cached seller backend"""
+
+    catalog_cache = None
+
+    def __init__(self) -> None:
+        self.catalog = build_catalog()
+        self.checkout = build_checkout(3)
+
+    def list_products(self) -> Dict[str, Any]:
+        return self.catalog
+
+    def get_checkout(self, checkout_id: str) -> Dict[str, Any]:
+        return self.checkout
+
+    def complete_checkout(self, checkout_id: str, payment_token: str, **kwargs: Any) -> Dict[str, Any]:
+        return {**self.checkout, 'status': 'completed'}
+
+
+class StubResponse:
+    status_code = 200
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> Dict[str, Any]:
+        # Decoded on every call, as requests does
+        return json.loads(self._body)
+
+
+class StubLLMTransport:
+    """
+    Transport answering chat completions in-process: a tool call turn while the
+    conversation ends with the user, the final answer once tool results follow.
+    Without tool calls the first completion is the answer.
+    """
+
+    def __init__(self, tool_calls: List[Dict[str, Any]]) -> None:
+        self._answer = json.dumps({'choices': [{'message': {
+            'role': 'assistant', 'content': 'Here is what we have, and I added it to your cart.'
+        }}]}).encode()
+        self._tool_turn = json.dumps({'choices': [{'message': {
+            'role': 'assistant', 'content': None, 'tool_calls': tool_calls
+        }}]}).encode() if tool_calls else self._answer
+
+    def request(self, method: str, url: str, operation: str = None, **kwargs: Any) -> StubResponse:
+        # The request body is encoded, as requests does before sending
+        json.dumps(kwargs.get('json'))
+        messages = kwargs['json']['messages']
+        return StubResponse(self._answer if messages[-1]['role'] == 'tool' else self._tool_turn)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+@pytest.fixture
+def acp_client() -> StubACPClient:
+    return StubACPClient()
+
+
+@pytest.fixture
+def checkout_factory():
+    return build_checkout
@@ -0,0 +1,266 @@
+"""
+Seller Backend Stand-in
+
+Python stand-in for seller_backend/server.ts, so the load test needs neither
+Node.js nor a Stripe key. It serves the same ACP endpoints with responses of
+the same shape and size: the product catalog (with ETags, like Express), and
+checkout sessions with line items, totals, fulfillment options and links.
+Completing a checkout retrieves the Shared Payment Token from the mock SPT
+server, as the real seller does. The Stripe payment intent that follows is
+replaced by a configurable delay.
+
+Usage:
+    python benchmarks/seller_stub.py [--port 3000] [--spt-url http://localhost:8001]
+        [--latency 0] [--payment-latency 0.05] [--products 11]
+"""
+
+import argparse
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+from flask import Flask, Response, jsonify, request
+
+CURRENCY = 'usd'
+# (name, price in cents, tags) of the demo seller's catalog
+CATALOG = (
+    ('Glass of wine', 500, ['soft']),
+    ('Tea / coffee', 200, ['soft', 'Alcohol-free']),
+    ('APIC Session IPA', 400, ['beer', 'local']),
+    ('Soft drink', 300, ['soft', 'Alcohol-free']),
+    ('Trotinette', 350, ['beer', 'Alcohol-free', 'local']),
+    ('Grisette Blonde', 400, ['beer', 'local']),
+    ('Grisette Blanche', 400, ['beer', 'local']),
+    ('Zinnebir', 400, ['beer', 'local']),
+    ('Taras Boulba', 400, ['beer', 'local']),
+    ('Jambe de Bois', 450, ['beer', 'local']),
+    ('Mug', 500, ['soft'])
+)
+LONG_DESCRIPTION = (
+    'A classic drink with a long history. Brewed and bottled close to the city it comes from, it is '
+    'appreciated for its balanced flavour and is a popular choice with food. Best enjoyed fresh, at the '
+    'right temperature, in good company. Its origins trace back to the brewing traditions of the region.'
+)
+FULFILLMENT_OPTIONS = [{
+    'type': 'shipping',
+    'id': 'free',
+    'title': 'Take from Fridge',
+    'subtitle': 'In a second',
+    'carrier': 'Yourself',
+    'subtotal': '0',
+    'tax': '0',
+    'total': '0'
+}]
+LINKS = [
+    {'type': 'terms_of_use', 'url': 'https://example.com/terms'},
+    {'type': 'privacy_policy', 'url': 'https://example.com/privacy'}
+]
+
+app = Flask(__name__)
+settings: Dict[str, Any] = {}
+products: Dict[str, Dict[str, Any]] = {}
+checkouts: Dict[str, Dict[str, Any]] = {}
+checkouts_lock = threading.Lock()
+checkout_ids = itertools.count(1)
+spt_session = requests.Session()
+
+
+def build_products(count: int) -> Dict[str, Dict[str, Any]]:
+    """Build a catalog shaped like seller_backend's PRODUCT_CATALOG, repeating the demo products past 11"""
+    catalog = {}
+    for index in range(1, count + 1):
+        name, price, tags = CATALOG[(index - 1) % len(CATALOG)]
+        product_id = f"item_{index:03d}"
+        catalog[product_id] = {
+            'id': product_id,
+            'name': name if index <= len(CATALOG) else f"{name} #{index}",
+            'price': price,
+            'description': 'Served cold',
+            'long_description': LONG_DESCRIPTION,
+            'stock': 100,
+            'image': f"https://images.example.com/catalog/{product_id}-large.webp",
+            'origin': {'city': 'Brussels', 'country': 'Belgium'},
+            'tags': tags
+        }
+    return catalog
+
+
+def _error(code: str, message: str, status_code: int, error_type: str = 'processing_error') -> Response:
+    response = jsonify({'type': error_type, 'code': code, 'message': message})
+    response.status_code = status_code
+    return response
+
+
+def _line_items(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    line_items = []
+    for item in items:
+        product = products.get(item.get('id'))
+        if product is None:
+            raise ValueError(f"Product {item.get('id')} not found in catalog")
+        amount = product['price'] * int(item.get('quantity', 1))
+        line_items.append({
+            'id': item['id'],
+            'item': {'id': item['id'], 'quantity': int(item.get('quantity', 1))},
+            'base_amount': amount, 'discount': 0, 'subtotal': amount, 'tax': 0, 'total': amount
+        })
+    return line_items
+
+
+def _recalculate(checkout: Dict[str, Any]) -> None:
+    subtotal = sum(line_item['subtotal'] for line_item in checkout['line_items'])
+    checkout['totals'] = [
+        {'type': 'subtotal', 'display_text': 'Subtotal', 'amount': subtotal},
+        {'type': 'fulfillment', 'display_text': 'Shipping', 'amount': 0},
+        {'type': 'tax', 'display_text': 'Tax', 'amount': 0},
+        {'type': 'total', 'display_text': 'Total', 'amount': subtotal}
+    ]
+    ready = checkout.get('fulfillment_address') and checkout.get('fulfillment_option_id')
+    checkout['status'] = 'ready_for_payment' if ready else 'not_ready_for_payment'
+
+
+def _find_checkout(checkout_id: str, modifiable: bool = False) -> Optional[Response]:
+    checkout = checkouts.get(checkout_id)
+    if checkout is None:
+        return _error('not_found', f"Checkout session {checkout_id} not found", 404, 'invalid_request')
+    if modifiable and checkout['status'] in ('completed', 'canceled'):
+        return _error(f"checkout_{checkout['status']}", f"Cannot modify a {checkout['status']} checkout", 400,
+                      'invalid_request')
+    return None
+
+
+@app.before_request
+def _simulate_latency() -> None:
+    if settings['latency']:
+        time.sleep(settings['latency'])
+
+
+@app.get('/health')
+def health() -> Response:
+    return jsonify({'status': 'healthy', 'service': 'seller-stub', 'checkouts': len(checkouts)})
+
+
+@app.get('/products')
+def list_products() -> Response:
+    response = jsonify({'products': list(products.values())})
+    response.add_etag(weak=True)
+    return response.make_conditional(request)
+
+
+@app.post('/checkout_sessions')
+def create_checkout() -> Response:
+    body = request.get_json(silent=True) or {}
+    if not body.get('items'):
+        return _error('invalid_request', 'Items array is required and must not be empty', 400)
+    try:
+        line_items = _line_items(body['items'])
+    except ValueError as error:
+        return _error('not_found', str(error), 404)
+
+    checkout = {
+        'id': f"checkout_{int(time.time() * 1000)}_{next(checkout_ids)}",
+        'buyer': body.get('buyer'),
+        'payment_provider': {'provider': 'stripe', 'supported_payment_methods': ['card']},
+        'currency': CURRENCY,
+        'line_items': line_items,
+        'fulfillment_address': body.get('fulfillment_address'),
+        'fulfillment_options': FULFILLMENT_OPTIONS,
+        'fulfillment_option_id': FULFILLMENT_OPTIONS[0]['id'] if body.get('fulfillment_address') else None,
+        'messages': [],
+        'links': LINKS
+    }
+    _recalculate(checkout)
+    with checkouts_lock:
+        checkouts[checkout['id']] = checkout
+    response = jsonify(checkout)
+    response.status_code = 201
+    return response
+
+
+@app.get('/checkout_sessions/<checkout_id>')
+def get_checkout(checkout_id: str) -> Response:
+    return _find_checkout(checkout_id) or jsonify(checkouts[checkout_id])
+
+
+@app.post('/checkout_sessions/<checkout_id>')
+def update_checkout(checkout_id: str) -> Response:
+    error = _find_checkout(checkout_id, modifiable=True)
+    if error is not None:
+        return error
+    body = request.get_json(silent=True) or {}
+    checkout = checkouts[checkout_id]
+    try:
+        if body.get('items'):
+            checkout['line_items'] = _line_items(body['items'])
+    except ValueError as error:
+        return _error('not_found', str(error), 404)
+    if body.get('buyer'):
+        checkout['buyer'] = body['buyer']
+    if body.get('fulfillment_address'):
+        checkout['fulfillment_address'] = body['fulfillment_address']
+        checkout['fulfillment_option_id'] = checkout['fulfillment_option_id'] or FULFILLMENT_OPTIONS[0]['id']
+    if body.get('fulfillment_option_id'):
+        checkout['fulfillment_option_id'] = body['fulfillment_option_id']
+    _recalculate(checkout)
+    return jsonify(checkout)
+
+
+@app.post('/checkout_sessions/<checkout_id>/complete')
+def complete_checkout(checkout_id: str) -> Response:
+    error = _find_checkout(checkout_id, modifiable=True)
+    if error is not None:
+        return error
+    token = ((request.get_json(silent=True) or {}).get('payment_data') or {}).get('token', '')
+    if not token.startswith('spt_'):
+        return _error('payment_failed', 'Only SPT tokens are supported in demo mode', 400)
+
+    traceparent = request.headers.get('traceparent')
+    spt_response = spt_session.get(
+        f"{settings['spt_url']}/v1/shared_payment/granted_tokens/{token}",
+        headers={'traceparent': traceparent} if traceparent else {}, timeout=10
+    )
+    if not spt_response.ok:
+        return _error('payment_failed', spt_response.json().get('error', {}).get('message', 'SPT lookup failed'), 400)
+    # Stands in for the Stripe payment intent
+    time.sleep(settings['payment_latency'])
+
+    checkout = checkouts[checkout_id]
+    checkout['status'] = 'completed'
+    checkout['messages'].append({'type': 'info', 'content_type': 'plain',
+                                 'content': 'Payment processed successfully. Order confirmed!'})
+    checkout.pop('payment_provider', None)
+    order_id = f"order_{int(time.time() * 1000)}_{next(checkout_ids)}"
+    return jsonify({**checkout, 'order': {
+        'id': order_id, 'checkout_session_id': checkout_id, 'permalink_url': f"https://example.com/orders/{order_id}"
+    }})
+
+
+@app.post('/checkout_sessions/<checkout_id>/cancel')
+def cancel_checkout(checkout_id: str) -> Response:
+    error = _find_checkout(checkout_id, modifiable=True)
+    if error is not None:
+        return error
+    checkout = checkouts[checkout_id]
+    checkout['status'] = 'canceled'
+    checkout['messages'].append({'type': 'info', 'content_type': 'plain', 'content': 'Checkout has been canceled'})
+    return jsonify(checkout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--spt-url', default=os.getenv('MOCK_STRIPE_SPT_URL', 'http://localhost:8001'))
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request')
+    parser.add_argument('--payment-latency', type=float, default=0.05, help='Seconds the Stripe call takes')
+    parser.add_argument('--products', type=int, default=11, help='Products in the catalog')
+    args = parser.parse_args()
+
+    settings.update(spt_url=args.spt_url.rstrip('/'), latency=args.latency, payment_latency=args.payment_latency)
+    products.update(build_products(args.products))
+    app.run(host='127.0.0.1', port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
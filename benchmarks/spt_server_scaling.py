@@ -0,0 +1,201 @@
+"""
+SPT Server Scaling Benchmark
+
+Measures the mock SPT server's issue and lookup requests per second as its
+worker processes grow. Each configuration is started on its own, then
+client processes issue tokens and look each one up, as the chat backend and
+seller do for every checkout completion, for a fixed duration.
+
+Configurations:
+- dev: `python server.py`, the Flask development server (one process)
+- gunicorn-N: `gunicorn -c gunicorn.conf.py server:app` with N workers;
+  with more than one, workers share tokens through the SQLite store
+
+The load generator is also Python, so give it enough --clients processes
+to keep the server busy. Results are only meaningful up to the machine's
+core count, shared by the server and the clients.
+
+Usage:
+    python benchmarks/spt_server_scaling.py [--workers 1,2,4] [--threads 4]
+        [--clients 4] [--connections 8] [--duration 10] [--port 19101]
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+SPT_DIR = os.path.join(ROOT, 'mock_stripe_spt')
+
+OPERATIONS = ('issue', 'lookup')
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+def start_server(name: str, workers: int, threads: int, port: int, directory: str) -> subprocess.Popen:
+    """Start one server configuration and wait until it is healthy"""
+    env = {
+        **os.environ,
+        'MOCK_STRIPE_SPT_PORT': str(port),
+        'MOCK_SPT_LOG_TOKENS': 'False',
+        'MOCK_SPT_STORE_PATH': os.path.join(directory, f"{name}.sqlite3")
+    }
+    if name == 'dev':
+        command = [sys.executable, 'server.py']
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'server:app']
+        env.update(MOCK_SPT_WORKERS=str(workers), MOCK_SPT_THREADS=str(threads))
+    log = open(os.path.join(directory, f"{name}.log"), 'w')
+    process = subprocess.Popen(command, cwd=SPT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                               start_new_session=True)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    sys.exit(f"{name} did not become healthy; see {log.name}")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def server_backend(port: int) -> str:
+    return requests.get(f"http://127.0.0.1:{port}/health", timeout=5).json()['token_store']['backend']
+
+
+# ============================================================================
+# CLIENTS
+# ============================================================================
+
+def run_client(url: str, connections: int, start_at: float, stop_at: float) -> Dict[str, Any]:
+    """
+    One client process: `connections` threads, each with its own keep-alive
+    connection, issuing a token then looking it up until `stop_at`.
+
+    Returns:
+        Latencies in seconds per operation, and the number of errors
+    """
+    latencies: Dict[str, List[float]] = {operation: [] for operation in OPERATIONS}
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker() -> None:
+        session = requests.Session()
+        local = {operation: [] for operation in OPERATIONS}
+        local_errors = 0
+        time.sleep(max(0.0, start_at - time.time()))
+        while time.time() < stop_at:
+            try:
+                started_at = time.perf_counter()
+                response = session.post(f"{url}/v1/shared_payment/issued_tokens",
+                                        data={'payment_method': 'pm_card_visa', 'usage_limits[max_amount]': '5000'})
+                local['issue'].append(time.perf_counter() - started_at)
+                response.raise_for_status()
+
+                started_at = time.perf_counter()
+                response = session.get(f"{url}/v1/shared_payment/granted_tokens/{response.json()['id']}")
+                local['lookup'].append(time.perf_counter() - started_at)
+                response.raise_for_status()
+            except requests.exceptions.RequestException:
+                local_errors += 1
+        with lock:
+            for operation in OPERATIONS:
+                latencies[operation].extend(local[operation])
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'latencies': latencies, 'errors': errors[0]}
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def measure(url: str, clients: int, connections: int, duration: float) -> Dict[str, Any]:
+    """Run the client processes against a server and summarize their requests"""
+    start_at = time.time() + 1
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.starmap(run_client, [(url, connections, start_at, start_at + duration)] * clients)
+
+    summary: Dict[str, Any] = {'errors': sum(result['errors'] for result in results)}
+    for operation in OPERATIONS:
+        latencies = [latency for result in results for latency in result['latencies'][operation]]
+        summary[operation] = {
+            'rps': len(latencies) / duration,
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+            'p99_ms': (percentile(latencies, 0.99) or 0) * 1000
+        }
+    return summary
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default=f"1,2,{os.cpu_count() or 1}", help='Comma-separated gunicorn worker counts')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+    parser.add_argument('--clients', type=int, default=os.cpu_count() or 1, help='Client processes')
+    parser.add_argument('--connections', type=int, default=8, help='Connections per client process')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per configuration')
+    parser.add_argument('--port', type=int, default=19101, help='Port the servers listen on')
+    parser.add_argument('--no-dev', action='store_true', help='Skip the Flask development server')
+    args = parser.parse_args()
+
+    configurations = [] if args.no_dev else [('dev', 1)]
+    for workers in sorted({int(count) for count in args.workers.split(',')}):
+        configurations.append((f"gunicorn-{workers}", workers))
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes x {args.connections} connections, "
+          f"{args.duration:g}s per configuration\n")
+    print(f"{'server':<12} {'backend':<7} {'issue/s':>8} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'lookup/s':>9} {'p50 ms':>7} {'p99 ms':>7} {'errors':>7}")
+
+    with tempfile.TemporaryDirectory(prefix='spt-scaling-') as directory:
+        for name, workers in configurations:
+            process = start_server(name, workers, args.threads, args.port, directory)
+            try:
+                backend = server_backend(args.port)
+                summary = measure(f"http://127.0.0.1:{args.port}", args.clients, args.connections, args.duration)
+            finally:
+                stop_server(process)
+            issue, lookup = summary['issue'], summary['lookup']
+            print(f"{name:<12} {backend:<7} {issue['rps']:>8,.0f} {issue['p50_ms']:>7.1f} {issue['p99_ms']:>7.1f} "
+                  f"{lookup['rps']:>9,.0f} {lookup['p50_ms']:>7.1f} {lookup['p99_ms']:>7.1f} {summary['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+SPT Token Store Scaling Benchmark
+
+Measures issue and lookup throughput of the mock SPT server's token store as
+the number of threads grows, with a single lock (one shard) and with the
+lock striped across shards. Each thread issues tokens and looks up
+previously issued ones, as the chat backend and seller do.
+
+Also reports the memory one stored token costs, as a slot record and in the
+nested-dict layout the server used before. With --sqlite, also measures the
+issue throughput of the SQLite backend with one transaction per token and
+with group commit.
+
+With the GIL only one thread runs Python code at a time, so the sharded store
+mainly avoids threads queueing on one lock; on a free-threaded build
+(python3.13t) it lets issues and lookups run in parallel.
+
+Usage:
+    python benchmarks/spt_store_scaling.py [--threads 1,2,4,8,16] [--duration 2]
+        [--shards 16] [--lookups-per-issue 1] [--sqlite]
+"""
+
+import argparse
+import os
+import secrets
+import sys
+import sysconfig
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mock_stripe_spt'))
+
+from token_store import SPT_COMMIT_BATCH, SQLiteTokenStore, TokenRecord, TokenStore  # noqa: E402
+
+MEMORY_SAMPLE = 10000
+
+
+def new_record(spt_id: str) -> TokenRecord:
+    return TokenRecord(spt_id, 'pm_card_visa', 'usd', 5000, int(time.time()) + 3600, 'network_1', 'seller_1',
+                       int(time.time()), trace_id=secrets.token_hex(16))
+
+
+def nested_dict_record(spt_id: str) -> Dict[str, Any]:
+    """A token in the nested-dict layout the server stored before TokenRecord"""
+    return {
+        'id': spt_id,
+        'payment_method': 'pm_card_visa',
+        'usage_limits': {'currency': 'usd', 'max_amount': 5000, 'expires_at': int(time.time()) + 3600},
+        'seller_details': {'network_id': 'network_1', 'external_id': 'seller_1'},
+        'created_at': int(time.time()),
+        'status': 'active',
+        'trace_id': secrets.token_hex(16)
+    }
+
+
+def measure_throughput(store: Any, threads: int, duration: float, lookups_per_issue: int) -> float:
+    """Run the issue/lookup mix on an empty store and return operations per second"""
+    barrier = threading.Barrier(threads + 1)
+    stop = threading.Event()
+    counts: List[int] = [0] * threads
+
+    def worker(index: int) -> None:
+        issued: List[str] = []
+        operations = 0
+        barrier.wait()
+        while not stop.is_set():
+            spt_id = f"spt_{secrets.token_hex(12)}"
+            store.put(new_record(spt_id))
+            issued.append(spt_id)
+            for offset in range(lookups_per_issue):
+                lookup_id = issued[(len(issued) * 7 + offset) % len(issued)]
+                if store.get(lookup_id) is not None:
+                    store.mark_used(lookup_id)
+            operations += 1 + lookups_per_issue
+        counts[index] = operations
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started_at = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started_at)
+
+
+def bytes_per_token(build: Callable[[str], Any]) -> float:
+    """Memory allocated per stored token, ID string included"""
+    ids = [f"spt_{secrets.token_hex(12)}" for _ in range(MEMORY_SAMPLE)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tokens = {spt_id: build(spt_id) for spt_id in ids}
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del tokens
+    return used / MEMORY_SAMPLE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', default='1,2,4,8,16', help='Comma-separated thread counts')
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds per measurement')
+    parser.add_argument('--shards', type=int, default=16, help='Shards of the striped store')
+    parser.add_argument('--lookups-per-issue', type=int, default=1, help='Lookups after each issued token')
+    parser.add_argument('--sqlite', action='store_true', help='Also measure the SQLite backend')
+    args = parser.parse_args()
+
+    thread_counts = [int(count) for count in args.threads.split(',')]
+    gil = 'disabled' if sysconfig.get_config_var('Py_GIL_DISABLED') and not sys._is_gil_enabled() else 'enabled'
+    print(f"Python {sys.version.split()[0]}, GIL {gil}, {os.cpu_count()} CPUs, "
+          f"{args.lookups_per_issue} lookup(s) per issue, {args.duration:g}s per run\n")
+    print(f"{'threads':>7} {'1 shard ops/s':>14} {f'{args.shards} shards ops/s':>16} {'ratio':>6}")
+
+    for threads in thread_counts:
+        single = measure_throughput(TokenStore(max_tokens=1_000_000, shards=1), threads, args.duration,
+                                    args.lookups_per_issue)
+        sharded = measure_throughput(TokenStore(max_tokens=1_000_000, shards=args.shards), threads, args.duration,
+                                     args.lookups_per_issue)
+        print(f"{threads:>7} {single:>14,.0f} {sharded:>16,.0f} {sharded / single:>6.2f}")
+
+    if args.sqlite:
+        print("\nSQLite backend, issue/lookup ops/s\n")
+        print(f"{'threads':>7} {'1 token/commit':>15} {'group commit':>13} {'tokens/commit':>14} {'ratio':>6}")
+        for threads in thread_counts:
+            with tempfile.TemporaryDirectory() as directory:
+                single = measure_throughput(
+                    SQLiteTokenStore(path=os.path.join(directory, 'single.sqlite3'), commit_batch=1),
+                    threads, args.duration, args.lookups_per_issue
+                )
+                store = SQLiteTokenStore(path=os.path.join(directory, 'group.sqlite3'), commit_batch=SPT_COMMIT_BATCH)
+                grouped = measure_throughput(store, threads, args.duration, args.lookups_per_issue)
+                print(f"{threads:>7} {single:>15,.0f} {grouped:>13,.0f} "
+                      f"{store.stats()['tokens_per_commit']:>14} {grouped / single:>6.2f}")
+
+    print(f"\nMemory per stored token ({MEMORY_SAMPLE:,} tokens)\n")
+    print(f"{'layout':<12} {'bytes':>7}")
+    print(f"{'nested dict':<12} {bytes_per_token(nested_dict_record):>7.0f}")
+    print(f"{'TokenRecord':<12} {bytes_per_token(new_record):>7.0f}")
+
+
+if __name__ == '__main__':
+    main()
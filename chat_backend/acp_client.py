@@ -6,11 +6,19 @@ Provides methods for managing products, checkout sessions, and payment processin
 """
 
 import requests
-from typing import Optional, Dict, List, Any
+import threading
+from typing import Optional, Dict, List, Any, Callable, Tuple
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 
+from http_transport import HTTPTransport, Timeout, operation_timeouts_from_env
+from catalog_cache import CatalogCache, CATALOG_CACHE_ENABLED, CACHE_FRESH, CACHE_STALE
+from singleflight import SingleFlight
+from spt_prefetch import SPTPrefetcher, SPT_PREFETCH_ENABLED, _SPTSlotTable
+from resilience import Resilience, RESILIENCE_ENABLED
+from tracing import span
+
 load_dotenv()
 
 
@@ -24,6 +32,27 @@ CONTENT_TYPE_JSON: str = 'application/json'
 FACILITATOR_TOKEN: str = 'Bearer facilitator_token'
 DEFAULT_PAYMENT_PROVIDER: str = 'stripe'
 SPT_EXPIRATION_DAYS: int = 1
+MOCK_STRIPE_SPT_URL: str = os.getenv('MOCK_STRIPE_SPT_URL', 'http://localhost:8001')
+# Most tokens per batch request; the mock SPT server accepts MOCK_SPT_MAX_BATCH (1000 by default)
+SPT_BATCH_SIZE: int = int(os.getenv('SPT_BATCH_SIZE', '1000'))
+SINGLE_FLIGHT_ENABLED: bool = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+
+# Checkout status in which the total is final and payment can be prepared
+READY_FOR_PAYMENT_STATUS: str = 'ready_for_payment'
+
+# Default (connect, read) timeouts per ACP operation, in seconds.
+# Override with ACP_TIMEOUT_<OPERATION>="<connect>,<read>", e.g. ACP_TIMEOUT_COMPLETE_CHECKOUT="3,30"
+DEFAULT_OPERATION_TIMEOUTS: Dict[str, Timeout] = {
+    'list_products': (3.05, 5.0),
+    'create_checkout': (3.05, 10.0),
+    'get_checkout': (3.05, 5.0),
+    'update_checkout': (3.05, 10.0),
+    'complete_checkout': (3.05, 30.0),
+    'cancel_checkout': (3.05, 10.0),
+    'issue_spt': (3.05, 10.0),
+    'issue_spt_batch': (3.05, 30.0),
+    'get_spt_batch': (3.05, 30.0)
+}
 
 
 # ============================================================================
@@ -66,6 +95,261 @@ def _extract_total_amount_from_checkout(checkout_response: Dict[str, Any]) -> in
     raise ValueError('Total amount not found in checkout response')
 
 
+def _error_from_request_exception(error: requests.exceptions.RequestException) -> Dict[str, Any]:
+    """
+    Convert a requests exception to the error dictionary format.
+    
+    Args:
+        error: Exception raised by requests
+        
+    Returns:
+        Dictionary with 'error' message and 'status_code' (None if no response)
+    """
+    status_code = None
+    if hasattr(error, 'response') and error.response is not None:
+        status_code = error.response.status_code
+    
+    return {
+        'error': str(error),
+        'status_code': status_code
+    }
+
+
+def _is_idempotent(method: str, endpoint: str) -> bool:
+    """
+    Tell whether a seller backend request may safely be retried.
+    
+    Reads and cancellations leave the session in the same state however
+    often they are repeated; creates, updates and completions do not.
+    
+    Args:
+        method: HTTP method
+        endpoint: API endpoint path
+        
+    Returns:
+        True if the request may be retried
+    """
+    return method == 'GET' or endpoint.endswith('/cancel')
+
+
+def _build_acp_headers() -> Dict[str, str]:
+    """
+    Build HTTP headers required for ACP API requests.
+    
+    Returns:
+        Dictionary containing required headers
+    """
+    return {
+        'Content-Type': CONTENT_TYPE_JSON,
+        'Authorization': FACILITATOR_TOKEN,
+        'API-Version': API_VERSION
+    }
+
+
+def _build_create_checkout_data(
+    items: List[Dict[str, Any]],
+    buyer: Optional[Dict[str, str]] = None,
+    fulfillment_address: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    Build the request body for creating a checkout session.
+    
+    Args:
+        items: List of items with id and quantity
+        buyer: Optional buyer information
+        fulfillment_address: Optional shipping address
+        
+    Returns:
+        Request body dictionary
+    """
+    data: Dict[str, Any] = {'items': items}
+    
+    if buyer:
+        data['buyer'] = buyer
+    
+    if fulfillment_address:
+        data['fulfillment_address'] = fulfillment_address
+    
+    return data
+
+
+def _build_update_checkout_data(
+    items: Optional[List[Dict[str, Any]]] = None,
+    buyer: Optional[Dict[str, str]] = None,
+    fulfillment_address: Optional[Dict[str, str]] = None,
+    fulfillment_option_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Build the request body for updating a checkout session.
+    
+    Args:
+        items: Optional updated items list
+        buyer: Optional updated buyer information
+        fulfillment_address: Optional updated shipping address
+        fulfillment_option_id: Optional selected fulfillment option
+        
+    Returns:
+        Request body dictionary containing only the fields being updated
+    """
+    data: Dict[str, Any] = {}
+    
+    if items is not None:
+        data['items'] = items
+    
+    if buyer:
+        data['buyer'] = buyer
+    
+    if fulfillment_address:
+        data['fulfillment_address'] = fulfillment_address
+    
+    if fulfillment_option_id:
+        data['fulfillment_option_id'] = fulfillment_option_id
+    
+    return data
+
+
+def _build_spt_request_data(payment_token: str, total_amount: int) -> Dict[str, Any]:
+    """
+    Build the form data for issuing a Shared Payment Token.
+    
+    Args:
+        payment_token: Payment method from the payment provider
+        total_amount: Maximum amount the token may be charged for
+        
+    Returns:
+        Form data dictionary in Stripe's bracketed parameter format
+    """
+    return {
+        "payment_method": payment_token,
+        "usage_limits[currency]": "usd",
+        "usage_limits[max_amount]": total_amount,
+        "usage_limits[expires_at]": _calculate_expiration_timestamp(SPT_EXPIRATION_DAYS),
+        "seller_details[network_id]": "internal",
+        "seller_details[external_id]": "stripe_test_merchant",
+    }
+
+
+def _build_spt_batch_request_data(payments: List[Tuple[str, int]]) -> Dict[str, Any]:
+    """
+    Build the JSON body for issuing several Shared Payment Tokens in one request.
+    
+    Args:
+        payments: (payment_token, total_amount) pairs, one per token
+        
+    Returns:
+        Request body whose tokens carry the same fields as a single issue
+    """
+    return {'tokens': [_build_spt_request_data(payment_token, total_amount) for payment_token, total_amount in payments]}
+
+
+def _spt_batches(items: List[Any], batch_size: int = SPT_BATCH_SIZE) -> List[List[Any]]:
+    """
+    Split the items of a bulk SPT operation into batches the token server accepts.
+    
+    Args:
+        items: Items to send
+        batch_size: Most items per request
+        
+    Returns:
+        Consecutive slices of items, in order
+    """
+    return [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+
+
+def _combine_spt_batch_responses(batches: List[List[Any]], responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine the responses to every batch of a bulk SPT operation, keeping the
+    results of the batches that succeeded when others failed.
+    
+    Args:
+        batches: Items sent, one list per request
+        responses: List response or error dictionary of each request, in the same order
+        
+    Returns:
+        Dictionary with the tokens of the successful batches in 'data', their
+        per-token 'errors' (lookups only), and in 'batch_errors' one entry per
+        failed request: the position of its first item, its item count, and
+        its 'error' and 'status_code'
+    """
+    result: Dict[str, Any] = {'object': 'list', 'data': [], 'batch_errors': []}
+    start = 0
+    for batch, response in zip(batches, responses):
+        if 'error' in response:
+            result['batch_errors'].append({'start': start, 'count': len(batch), **response})
+        else:
+            result['data'].extend(response['data'])
+            if 'errors' in response:
+                result.setdefault('errors', []).extend(response['errors'])
+        start += len(batch)
+    return result
+
+
+def _build_complete_checkout_data(
+    spt_token_id: str,
+    payment_provider: str,
+    billing_address: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    Build the request body for completing a checkout session.
+    
+    Args:
+        spt_token_id: Shared Payment Token to pay with
+        payment_provider: Payment provider name
+        billing_address: Optional billing address
+        
+    Returns:
+        Request body dictionary
+    """
+    data: Dict[str, Any] = {
+        'payment_data': {
+            'token': spt_token_id,
+            'provider': payment_provider
+        }
+    }
+    
+    if billing_address:
+        data['billing_address'] = billing_address
+    
+    return data
+
+
+def _prefetch_spt_for_session(
+    prefetcher: _SPTSlotTable,
+    checkout_id: Optional[str],
+    session: Dict[str, Any],
+    payment_token: Optional[str]
+) -> None:
+    """
+    Keep a checkout's prefetched Shared Payment Token in line with its session.
+    
+    A session that is ready for payment gets a token for its current total
+    (reissued if the total changed); any other session drops its token.
+    
+    Args:
+        prefetcher: Prefetcher holding the checkout's token slot
+        checkout_id: ID of the checkout session
+        session: Response from a create or update request
+        payment_token: Payment method the buyer will pay with, if known
+            (defaults to the one a previous prefetch used)
+    """
+    if not checkout_id or 'error' in session:
+        return
+    
+    if session.get('status') != READY_FOR_PAYMENT_STATUS:
+        prefetcher.discard(checkout_id)
+        return
+    
+    payment_token = payment_token or prefetcher.payment_method_for(checkout_id)
+    if not payment_token:
+        return
+    
+    try:
+        total_amount = _extract_total_amount_from_checkout(session)
+    except ValueError:
+        return
+    prefetcher.prefetch(checkout_id, payment_token, total_amount)
+
+
 # ============================================================================
 # ACP CLIENT CLASS
 # ============================================================================
@@ -78,14 +362,48 @@ class ACPClient:
     product listing, checkout session management, and payment processing.
     """
     
-    def __init__(self, base_url: str = SELLER_BACKEND_URL) -> None:
+    def __init__(
+        self,
+        base_url: str = SELLER_BACKEND_URL,
+        transport: Optional[HTTPTransport] = None,
+        catalog_cache: Optional[CatalogCache] = None,
+        single_flight: bool = SINGLE_FLIGHT_ENABLED,
+        spt_prefetch: bool = SPT_PREFETCH_ENABLED,
+        resilience: Optional[Resilience] = None
+    ) -> None:
         """
         Initialize ACP client with seller backend URL.
         
         Args:
             base_url: Base URL of the seller backend (defaults to config value)
+            transport: Pooled HTTP transport to use (defaults to a new transport
+                with the per-operation timeouts from the environment)
+            catalog_cache: Product catalog cache (defaults to a new cache when
+                CATALOG_CACHE_ENABLED, otherwise no caching)
+            single_flight: Whether concurrent identical GET requests share one
+                upstream call (defaults to SINGLE_FLIGHT_ENABLED)
+            spt_prefetch: Whether the Shared Payment Token is issued as soon as a
+                checkout is ready for payment (defaults to SPT_PREFETCH_ENABLED)
+            resilience: Retry and circuit breaker policy for seller backend calls
+                (defaults to a new policy when RESILIENCE_ENABLED)
         """
         self.base_url = base_url.rstrip('/')
+        
+        if transport is None:
+            transport = HTTPTransport(
+                operation_timeouts=operation_timeouts_from_env(DEFAULT_OPERATION_TIMEOUTS, 'ACP_TIMEOUT_')
+            )
+        self.transport = transport
+        
+        if catalog_cache is None and CATALOG_CACHE_ENABLED:
+            catalog_cache = CatalogCache()
+        self.catalog_cache = catalog_cache
+        self.single_flight: Optional[SingleFlight] = SingleFlight() if single_flight else None
+        self.spt_prefetcher: Optional[SPTPrefetcher] = SPTPrefetcher(self._issue_spt) if spt_prefetch else None
+        
+        if resilience is None and RESILIENCE_ENABLED:
+            resilience = Resilience()
+        self.resilience = resilience
     
     def _build_headers(self) -> Dict[str, str]:
         """
@@ -94,25 +412,76 @@ class ACPClient:
         Returns:
             Dictionary containing required headers
         """
-        return {
-            'Content-Type': CONTENT_TYPE_JSON,
-            'Authorization': FACILITATOR_TOKEN,
-            'API-Version': API_VERSION
-        }
+        return _build_acp_headers()
     
     def _make_request(
         self,
         method: str,
         endpoint: str,
-        data: Optional[Dict[str, Any]] = None
+        data: Optional[Dict[str, Any]] = None,
+        operation: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Make HTTP request to seller backend.
         
+        Concurrent identical GET requests are coalesced into one upstream call
+        whose result every caller receives. Calls go through the endpoint's
+        circuit breaker, and idempotent ones are retried on upstream failures.
+        
+        Args:
+            method: HTTP method (GET, POST, PUT)
+            endpoint: API endpoint path
+            data: Optional request body data
+            operation: Operation name used to select the request timeout
+            
+        Returns:
+            JSON response as dictionary, or error dictionary if request fails
+            
+        Raises:
+            ValueError: If unsupported HTTP method is used
+        """
+        send = self._resilient(method, endpoint, lambda: self._send_request(method, endpoint, data, operation))
+        
+        if method == 'GET' and self.single_flight is not None:
+            return self.single_flight.do((method, endpoint), send)
+        return send()
+    
+    def _resilient(
+        self,
+        method: str,
+        endpoint: str,
+        fn: Callable[[], Dict[str, Any]]
+    ) -> Callable[[], Dict[str, Any]]:
+        """
+        Wrap one request attempt in the client's retry and circuit breaker policy.
+        
+        Args:
+            method: HTTP method
+            endpoint: API endpoint path
+            fn: Zero-argument function performing one attempt
+            
+        Returns:
+            Zero-argument function performing the call under the policy
+        """
+        if self.resilience is None:
+            return fn
+        return lambda: self.resilience.call(method, endpoint, fn, retry=_is_idempotent(method, endpoint))
+    
+    def _send_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        operation: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Send one HTTP request to seller backend.
+        
         Args:
             method: HTTP method (GET, POST, PUT)
             endpoint: API endpoint path
             data: Optional request body data
+            operation: Operation name used to select the request timeout
             
         Returns:
             JSON response as dictionary, or error dictionary if request fails
@@ -127,14 +496,12 @@ class ACPClient:
         if method not in ['GET', 'POST', 'PUT']:
             raise ValueError(f"Unsupported HTTP method: {method}")
         
-        # Step 2: Execute HTTP request based on method
+        # Step 2: Execute HTTP request over the pooled transport
         try:
             if method == 'GET':
-                response = requests.get(url, headers=headers)
-            elif method == 'POST':
-                response = requests.post(url, json=data, headers=headers)
-            elif method == 'PUT':
-                response = requests.put(url, json=data, headers=headers)
+                response = self.transport.request(method, url, operation=operation, headers=headers)
+            else:
+                response = self.transport.request(method, url, operation=operation, json=data, headers=headers)
             
             # Step 3: Raise exception for HTTP errors
             response.raise_for_status()
@@ -144,29 +511,145 @@ class ACPClient:
         
         except requests.exceptions.RequestException as e:
             # Step 5: Convert HTTP exceptions to error dictionary format
-            status_code = None
-            if hasattr(e, 'response') and e.response is not None:
-                status_code = e.response.status_code
+            return _error_from_request_exception(e)
+    
+    def _fetch_catalog(self) -> Dict[str, Any]:
+        """
+        Fetch the product catalog, revalidating the cached copy with If-None-Match.
+        
+        Returns:
+            Catalog dictionary, or error dictionary if request fails (errors are not cached)
+        """
+        headers = self._build_headers()
+        etag = self.catalog_cache.etag
+        if etag:
+            headers['If-None-Match'] = etag
+        
+        try:
+            response = self.transport.request(
+                'GET',
+                f"{self.base_url}/products",
+                operation='list_products',
+                headers=headers
+            )
+            response.raise_for_status()
+            
+            cached_catalog = self.catalog_cache.cached()
+            if response.status_code == 304 and cached_catalog is not None:
+                self.catalog_cache.mark_not_modified()
+                return cached_catalog
             
-            return {
-                'error': str(e),
-                'status_code': status_code
-            }
+            catalog = response.json()
+            self.catalog_cache.store(catalog, response.headers.get('ETag'))
+            return catalog
+        
+        except requests.exceptions.RequestException as e:
+            return _error_from_request_exception(e)
+    
+    def _refresh_catalog_in_background(self) -> None:
+        """
+        Revalidate a stale catalog; runs on a background thread.
+        """
+        try:
+            self._resilient('GET', '/products', self._fetch_catalog)()
+        finally:
+            self.catalog_cache.end_refresh()
     
     def list_products(self) -> Dict[str, Any]:
         """
         Get list of available products from seller backend.
         
+        Served from the catalog cache when enabled: fresh entries are returned
+        directly, stale entries are returned while a background refresh runs.
+        
         Returns:
             Dictionary containing products list
         """
-        return self._make_request('GET', '/products')
+        if self.catalog_cache is None:
+            return self._make_request('GET', '/products', operation='list_products')
+        
+        catalog, state = self.catalog_cache.lookup()
+        if state == CACHE_FRESH:
+            return catalog
+        
+        if state == CACHE_STALE:
+            if self.catalog_cache.begin_refresh():
+                threading.Thread(target=self._refresh_catalog_in_background, daemon=True).start()
+            return catalog
+        
+        fetch = self._resilient('GET', '/products', self._fetch_catalog)
+        if self.single_flight is not None:
+            return self.single_flight.do(('GET', '/products'), fetch)
+        return fetch()
+    
+    def invalidate_catalog_cache(self) -> None:
+        """
+        Drop the cached product catalog so the next read fetches it from the seller backend.
+        """
+        if self.catalog_cache is not None:
+            self.catalog_cache.invalidate()
+    
+    def _issue_spt(self, payment_token: str, total_amount: int) -> str:
+        """
+        Exchange a payment method for a Shared Payment Token.
+        
+        Args:
+            payment_token: Payment method from the payment provider
+            total_amount: Maximum amount the token may be charged for
+            
+        Returns:
+            ID of the issued token
+            
+        Raises:
+            requests.exceptions.RequestException: If the token server cannot be reached or rejects the request
+            KeyError: If the response carries no token ID
+        """
+        # ============================================================
+        # DEMO MODE: Mock Stripe SPT Server (for European demo)
+        # ============================================================
+        mock_spt_url = MOCK_STRIPE_SPT_URL
+        print(f"🎭 DEMO MODE: Using mock Stripe SPT server: {mock_spt_url}/v1/shared_payment/issued_tokens")
+        
+        get_pst_token_response = self.transport.request(
+            'POST',
+            f"{mock_spt_url}/v1/shared_payment/issued_tokens",
+            operation='issue_spt',
+            data=_build_spt_request_data(payment_token, total_amount)
+        )
+        
+        # # ============================================================
+        # # PRODUCTION MODE: Real Stripe API (commented out)
+        # # ============================================================
+        # # Uncomment below and comment out DEMO MODE block above for production
+        # #
+        # # stripe_api_url = "https://api.stripe.com/v1/shared_payment/issued_tokens"
+        # # print(f"💳 PRODUCTION MODE: Using real Stripe API: {stripe_api_url}")
+        # # 
+        # # get_pst_token_response = self.transport.request(
+        # #     'POST',
+        # #     stripe_api_url,
+        # #     operation='issue_spt',
+        # #     data=_build_spt_request_data(payment_token, total_amount),
+        # #     auth=(os.getenv("FACILITATOR_API_KEY"), "")
+        # # )
+        
+        get_pst_token_response.raise_for_status()
+        print(get_pst_token_response.json())
+        return get_pst_token_response.json()['id']
+    
+    def _prefetch_spt(self, checkout_id: Optional[str], result: Dict[str, Any], payment_token: Optional[str]) -> None:
+        """
+        Start issuing the Shared Payment Token once a checkout is ready for payment.
+        """
+        if self.spt_prefetcher is not None:
+            _prefetch_spt_for_session(self.spt_prefetcher, checkout_id, result, payment_token)
     
     def create_checkout(
         self,
         items: List[Dict[str, Any]],
         buyer: Optional[Dict[str, str]] = None,
-        fulfillment_address: Optional[Dict[str, str]] = None
+        fulfillment_address: Optional[Dict[str, str]] = None,
+        payment_token: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create a new checkout session.
@@ -175,19 +658,16 @@ class ACPClient:
             items: List of items with id and quantity
             buyer: Optional buyer information (first_name, last_name, email, phone_number)
             fulfillment_address: Optional shipping address
+            payment_token: Optional payment method the buyer will pay with; not sent
+                to the seller, only used to prefetch the Shared Payment Token
             
         Returns:
             Dictionary containing checkout session details
         """
-        data: Dict[str, Any] = {'items': items}
-        
-        if buyer:
-            data['buyer'] = buyer
-        
-        if fulfillment_address:
-            data['fulfillment_address'] = fulfillment_address
-        
-        return self._make_request('POST', '/checkout_sessions', data)
+        data = _build_create_checkout_data(items, buyer, fulfillment_address)
+        result = self._make_request('POST', '/checkout_sessions', data, operation='create_checkout')
+        self._prefetch_spt(result.get('id'), result, payment_token)
+        return result
     
     def get_checkout(self, checkout_id: str) -> Dict[str, Any]:
         """
@@ -199,7 +679,7 @@ class ACPClient:
         Returns:
             Dictionary containing checkout session details
         """
-        return self._make_request('GET', f'/checkout_sessions/{checkout_id}')
+        return self._make_request('GET', f'/checkout_sessions/{checkout_id}', operation='get_checkout')
     
     def update_checkout(
         self,
@@ -207,7 +687,8 @@ class ACPClient:
         items: Optional[List[Dict[str, Any]]] = None,
         buyer: Optional[Dict[str, str]] = None,
         fulfillment_address: Optional[Dict[str, str]] = None,
-        fulfillment_option_id: Optional[str] = None
+        fulfillment_option_id: Optional[str] = None,
+        payment_token: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Update an existing checkout session.
@@ -218,25 +699,16 @@ class ACPClient:
             buyer: Optional updated buyer information
             fulfillment_address: Optional updated shipping address
             fulfillment_option_id: Optional selected fulfillment option
+            payment_token: Optional payment method the buyer will pay with; not sent
+                to the seller, only used to prefetch the Shared Payment Token
             
         Returns:
             Dictionary containing updated checkout session details
         """
-        data: Dict[str, Any] = {}
-        
-        if items is not None:
-            data['items'] = items
-        
-        if buyer:
-            data['buyer'] = buyer
-        
-        if fulfillment_address:
-            data['fulfillment_address'] = fulfillment_address
-        
-        if fulfillment_option_id:
-            data['fulfillment_option_id'] = fulfillment_option_id
-        
-        return self._make_request('POST', f'/checkout_sessions/{checkout_id}', data)
+        data = _build_update_checkout_data(items, buyer, fulfillment_address, fulfillment_option_id)
+        result = self._make_request('POST', f'/checkout_sessions/{checkout_id}', data, operation='update_checkout')
+        self._prefetch_spt(checkout_id, result, payment_token)
+        return result
     
     def complete_checkout(
         self,
@@ -255,77 +727,50 @@ class ACPClient:
             billing_address: Optional billing address
             
         Returns:
-            Dictionary containing completion result
-            
-        Raises:
-            ValueError: If total amount cannot be extracted from checkout
+            Dictionary containing completion result, or an error dictionary if the
+            session, the Shared Payment Token or the completion request failed
         """
-        # Step 1: Get checkout details to extract total amount
-        checkout_response = self.get_checkout(checkout_id)
-        total_amount = _extract_total_amount_from_checkout(checkout_response)
+        # Step 0: Fail fast while the seller's completion endpoint is failing, before minting a token
+        endpoint = f'/checkout_sessions/{checkout_id}/complete'
+        if self.resilience is not None:
+            circuit_error = self.resilience.check('POST', endpoint)
+            if circuit_error is not None:
+                return circuit_error
         
-        # Step 2: Build payment data structure
-        payment_data: Dict[str, Any] = {
-            'token': payment_token,
-            'provider': payment_provider
-        }
-        
-        # Step 3: Exchange payment token for SPT token
-        tomorrow = datetime.now() + timedelta(days=1)
-        expires_at_timestamp = int(tomorrow.timestamp()) 
-        
-        # ============================================================
-        # DEMO MODE: Mock Stripe SPT Server (for European demo)
-        # ============================================================
-        mock_spt_url = os.getenv('MOCK_STRIPE_SPT_URL', 'http://localhost:8001')
-        print(f"🎭 DEMO MODE: Using mock Stripe SPT server: {mock_spt_url}/v1/shared_payment/issued_tokens")
+        # Step 1: Get checkout details to extract total amount
+        checkout = self.get_checkout(checkout_id)
+        if 'error' in checkout:
+            return checkout
         
-        get_pst_token_response = requests.post(
-            url=f"{mock_spt_url}/v1/shared_payment/issued_tokens", 
-            data={
-                "payment_method": payment_token,
-                "usage_limits[currency]": "usd",
-                "usage_limits[max_amount]": total_amount,
-                "usage_limits[expires_at]": expires_at_timestamp,
-                "seller_details[network_id]": "internal",
-                "seller_details[external_id]": "stripe_test_merchant",
-            }
+        try:
+            total_amount = _extract_total_amount_from_checkout(checkout)
+            
+            # Step 2: Exchange payment token for SPT token (prefetched when it matches the total)
+            spt_token_id = None
+            if self.spt_prefetcher is not None:
+                with span('spt_prefetch.take') as take_span:
+                    spt_token_id = self.spt_prefetcher.take(checkout_id, payment_token, total_amount)
+                    if take_span is not None:
+                        take_span.set_attribute('spt.prefetched', spt_token_id is not None)
+            if spt_token_id is None:
+                spt_token_id = self._issue_spt(payment_token, total_amount)
+        except requests.exceptions.RequestException as e:
+            # The token server could not be reached or rejected the request
+            return _error_from_request_exception(e)
+        except (KeyError, ValueError) as e:
+            # The session has no total, or the token server sent no token ID
+            return {'error': f"Cannot pay for checkout {checkout_id}: {e}", 'status_code': None}
+        
+        # Step 3: Build request data
+        data = _build_complete_checkout_data(spt_token_id, payment_provider, billing_address)
+        
+        # Step 4: Send completion request
+        return self._make_request(
+            'POST',
+            endpoint,
+            data,
+            operation='complete_checkout'
         )
-        
-        # # ============================================================
-        # # PRODUCTION MODE: Real Stripe API (commented out)
-        # # ============================================================
-        # # Uncomment below and comment out DEMO MODE block above for production
-        # #
-        # # stripe_api_url = "https://api.stripe.com/v1/shared_payment/issued_tokens"
-        # # print(f"💳 PRODUCTION MODE: Using real Stripe API: {stripe_api_url}")
-        # # 
-        # # get_pst_token_response = requests.post(
-        # #     url=stripe_api_url, 
-        # #     data={
-        # #         "payment_method": payment_token,
-        # #         "usage_limits[currency]": "usd",
-        # #         "usage_limits[max_amount]": total_amount,
-        # #         "usage_limits[expires_at]": expires_at_timestamp,
-        # #         "seller_details[network_id]": "internal",
-        # #         "seller_details[external_id]": "stripe_test_merchant",
-        # #     },
-        # #     auth=(os.getenv("FACILITATOR_API_KEY"), "")
-        # # )
-        
-        print(get_pst_token_response.json())
-        spt_token_id = get_pst_token_response.json()['id']
-        
-        payment_data['token'] = spt_token_id
-        
-        # Step 4: Build request data
-        data: Dict[str, Any] = {'payment_data': payment_data}
-        
-        if billing_address:
-            data['billing_address'] = billing_address
-        
-        # Step 5: Send completion request
-        return self._make_request('POST', f'/checkout_sessions/{checkout_id}/complete', data)
     
     def cancel_checkout(self, checkout_id: str) -> Dict[str, Any]:
         """
@@ -337,5 +782,85 @@ class ACPClient:
         Returns:
             Dictionary containing cancellation result
         """
-        return self._make_request('POST', f'/checkout_sessions/{checkout_id}/cancel', {})
-  
\ No newline at end of file
+        result = self._make_request(
+            'POST',
+            f'/checkout_sessions/{checkout_id}/cancel',
+            {},
+            operation='cancel_checkout'
+        )
+        if self.spt_prefetcher is not None:
+            self.spt_prefetcher.discard(checkout_id)
+        return result
+
+    def _send_spt_batch(self, endpoint: str, key: str, batch: List[Any], operation: str) -> Dict[str, Any]:
+        """
+        Send one batch of a bulk operation to the mock Stripe SPT server.
+        
+        Args:
+            endpoint: Batch endpoint path
+            key: Name of the list in the request body
+            batch: Items to send
+            operation: Operation name used to select the request timeout
+            
+        Returns:
+            List response, or error dictionary if the request fails
+        """
+        try:
+            response = self.transport.request(
+                'POST',
+                f"{MOCK_STRIPE_SPT_URL}{endpoint}",
+                operation=operation,
+                json={key: batch}
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            return _error_from_request_exception(e)
+    
+    def _send_spt_batches(self, endpoint: str, key: str, items: List[Any], operation: str) -> Dict[str, Any]:
+        """
+        Send a bulk operation to the mock Stripe SPT server, one request per batch
+        of SPT_BATCH_SIZE items. A failed batch does not stop the others.
+        
+        Returns:
+            Combined response (see _combine_spt_batch_responses)
+        """
+        batches = _spt_batches(items)
+        return _combine_spt_batch_responses(
+            batches,
+            [self._send_spt_batch(endpoint, key, batch, operation) for batch in batches]
+        )
+    
+    def issue_spts(self, payments: List[Tuple[str, int]]) -> Dict[str, Any]:
+        """
+        Issue several Shared Payment Tokens, e.g. to pre-provision them for a load test.
+        
+        Args:
+            payments: (payment_token, total_amount) pairs, one per token
+            
+        Returns:
+            Dictionary whose 'data' lists the issued tokens in order, and whose
+            'batch_errors' lists the requests that failed and which payments they held
+        """
+        return self._send_spt_batches(
+            '/v1/shared_payment/issued_tokens/batch',
+            'tokens',
+            _build_spt_batch_request_data(payments)['tokens'],
+            'issue_spt_batch'
+        )
+    
+    def get_spts(self, spt_ids: List[str]) -> Dict[str, Any]:
+        """
+        Look up several Shared Payment Tokens, e.g. to reconcile orders. Tokens
+        are not marked as used.
+        
+        Args:
+            spt_ids: IDs of the tokens
+            
+        Returns:
+            Dictionary whose 'data' lists the found tokens, 'errors' the unknown or
+            expired ones, and 'batch_errors' the requests that failed and which IDs they held
+        """
+        result = self._send_spt_batches('/v1/shared_payment/granted_tokens/batch', 'ids', spt_ids, 'get_spt_batch')
+        result.setdefault('errors', [])
+        return result
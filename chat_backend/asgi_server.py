@@ -0,0 +1,557 @@
+"""
+Chat Backend ASGI Server
+
+Production serving mode for the chat backend. Serves the same routes as
+server.py with non-blocking handlers built on AsyncACPClient and
+AsyncLLMService, so slow LLM conversations wait on the event loop instead of
+holding an OS thread each.
+
+Run with several worker processes:
+    python asgi_server.py
+    uvicorn asgi_server:app --host 0.0.0.0 --port 9000 --workers 4
+"""
+
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import wraps
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Union
+
+import uvicorn
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from async_acp_client import AsyncACPClient
+from async_llm_service import AsyncLLMService
+from llm_service import format_sse_event
+from concurrency_limiter import LLMOverloaded, OVERLOADED_STATUS_CODE
+from idempotency import (
+    AsyncIdempotencyStore,
+    IdempotencyKeyReused,
+    IDEMPOTENCY_ENABLED,
+    IDEMPOTENCY_KEY_HEADER,
+    IDEMPOTENT_REPLAYED_HEADER,
+    request_fingerprint
+)
+from metrics import observe_route, register_stats, render_metrics
+from tracing import (
+    SPAN_SERVER,
+    TRACE_ID_HEADER,
+    TRACEPARENT_HEADER,
+    end_span,
+    start_span,
+    tracing_stats
+)
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+CHAT_BACKEND_PORT: int = int(os.getenv('CHAT_BACKEND_PORT', '9000'))
+ASGI_WORKERS: int = int(os.getenv('ASGI_WORKERS', str(os.cpu_count() or 1)))
+ASGI_LOG_LEVEL: str = os.getenv('ASGI_LOG_LEVEL', 'warning')
+
+
+# ============================================================================
+# APPLICATION STATE
+# ============================================================================
+
+# Created per worker process by the lifespan handler
+acp_client: AsyncACPClient
+llm_service: AsyncLLMService
+idempotency_store: Optional[AsyncIdempotencyStore]
+
+# Component statistics reported on /health and exported as gauges on /metrics
+STATS_SOURCES: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {
+    'catalog_cache': lambda: acp_client.catalog_cache.stats() if acp_client.catalog_cache else None,
+    'single_flight': lambda: acp_client.single_flight.stats() if acp_client.single_flight else None,
+    'spt_prefetch': lambda: acp_client.spt_prefetcher.stats() if acp_client.spt_prefetcher else None,
+    'resilience': lambda: acp_client.resilience.stats() if acp_client.resilience else None,
+    'idempotency': lambda: idempotency_store.stats() if idempotency_store else None,
+    'history': lambda: llm_service.history.stats() if llm_service.history else None,
+    'catalog_encoder': lambda: llm_service.catalog_encoder.stats(),
+    'completion_cache': lambda: llm_service.completion_cache.stats() if llm_service.completion_cache else None,
+    'llm_limiter': lambda: llm_service.limiter.stats() if llm_service.limiter else None,
+    'tracing': tracing_stats
+}
+
+
+@asynccontextmanager
+async def lifespan(_app: Starlette) -> AsyncIterator[None]:
+    """
+    Create the pooled upstream clients when a worker starts and close them on shutdown.
+    """
+    global acp_client, llm_service, idempotency_store
+
+    acp_client = AsyncACPClient()
+    llm_service = AsyncLLMService(acp_client)
+    idempotency_store = AsyncIdempotencyStore() if IDEMPOTENCY_ENABLED else None
+    register_stats(STATS_SOURCES)
+    try:
+        yield
+    finally:
+        await llm_service.aclose()
+        await acp_client.aclose()
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+async def _validate_request_json(request: Request) -> Dict[str, Any]:
+    """
+    Validate that the request contains a JSON object.
+
+    Args:
+        request: The incoming request.
+
+    Returns:
+        The parsed JSON data from the request.
+
+    Raises:
+        ValueError: If request JSON is missing or invalid.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        raise ValueError("Request body must contain valid JSON")
+
+    if not isinstance(data, dict):
+        raise ValueError("Request body must contain valid JSON")
+    return data
+
+
+def _handle_acp_error(result: Dict[str, Any], default_status_code: int = 500) -> JSONResponse:
+    """
+    Handle errors returned from ACP client operations.
+
+    Args:
+        result: The result dictionary from ACP client that contains an error.
+        default_status_code: Default HTTP status code to use if not specified in result.
+
+    Returns:
+        JSON response with the error and HTTP status code.
+    """
+    status_code = result.get('status_code')
+    if status_code is None:
+        status_code = default_status_code
+    return JSONResponse(result, status_code=status_code)
+
+
+def _bad_request(message: str) -> JSONResponse:
+    """
+    Build a 400 response with an error message.
+    """
+    return JSONResponse({'error': message}, status_code=400)
+
+
+def _overloaded(error: LLMOverloaded) -> JSONResponse:
+    """
+    Build the 503 response for a chat request shed by the LLM concurrency limiter.
+    """
+    return JSONResponse(
+        {'error': str(error), 'status_code': OVERLOADED_STATUS_CODE},
+        status_code=OVERLOADED_STATUS_CODE,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+def _idempotent(endpoint: Callable[[Request], Awaitable[JSONResponse]]) -> Callable[[Request], Awaitable[JSONResponse]]:
+    """
+    Make an endpoint honour the Idempotency-Key request header.
+
+    Same behaviour as server._idempotent. Keys are stored per worker process.
+
+    Args:
+        endpoint: Starlette endpoint returning a JSONResponse
+
+    Returns:
+        The wrapped endpoint
+    """
+    @wraps(endpoint)
+    async def wrapper(request: Request) -> JSONResponse:
+        idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if idempotency_store is None or not idempotency_key:
+            return await endpoint(request)
+
+        try:
+            request_data = await request.json()
+        except ValueError:
+            request_data = None
+
+        key = f"{request.url.path}:{idempotency_key}"
+        try:
+            record, owner = idempotency_store.begin(key, request_fingerprint(request_data))
+        except IdempotencyKeyReused as error:
+            return JSONResponse({'error': str(error)}, status_code=422)
+
+        if not owner:
+            stored = await idempotency_store.wait(record)
+            if stored is None:
+                return JSONResponse(
+                    {'error': f'A request with this {IDEMPOTENCY_KEY_HEADER} is in progress or failed'},
+                    status_code=409
+                )
+            body, status_code = stored
+            return JSONResponse(body, status_code=status_code, headers={IDEMPOTENT_REPLAYED_HEADER: 'true'})
+
+        try:
+            response = await endpoint(request)
+        except BaseException:
+            idempotency_store.abandon(key, record)
+            raise
+        idempotency_store.finish(key, record, json.loads(response.body), response.status_code)
+        return response
+
+    return wrapper
+
+
+class RouteMetricsMiddleware:
+    """
+    ASGI middleware recording each request's route, status and duration,
+    including the time spent streaming the response body.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_and_record_status(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            # The router stores the matched endpoint in the shared scope
+            route = getattr(scope.get('endpoint'), '__name__', 'unmatched')
+            observe_route(route, scope['method'], status_code, time.perf_counter() - started_at)
+
+
+class RequestTracingMiddleware:
+    """
+    ASGI middleware running each request inside a server span that continues
+    the caller's traceparent header (or starts a new trace) and returning the
+    trace ID in the X-Trace-Id response header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        span = start_span(
+            f"{scope['method']} {scope['path']}",
+            SPAN_SERVER,
+            traceparent=headers.get(TRACEPARENT_HEADER),
+            attributes={'http.method': scope['method'], 'http.path': scope['path']}
+        )
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_trace_id(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                message['headers'] = [
+                    *message.get('headers', []),
+                    (TRACE_ID_HEADER.lower().encode('latin-1'), span.trace_id.encode('latin-1'))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            # The router stores the matched endpoint in the shared scope
+            route = getattr(scope.get('endpoint'), '__name__', 'unmatched')
+            span.name = f"{scope['method']} {route}"
+            span.set_attribute('http.route', route)
+            span.set_attribute('http.status_code', status_code)
+            end_span(span, error=status_code >= 500)
+
+
+# ============================================================================
+# PRODUCT ENDPOINTS
+# ============================================================================
+
+async def list_products(_request: Request) -> JSONResponse:
+    """
+    Get list of available products from the seller backend.
+    """
+    result = await acp_client.list_products()
+
+    if 'error' in result:
+        return _handle_acp_error(result, default_status_code=500)
+
+    return JSONResponse(result, status_code=200)
+
+
+async def invalidate_products_cache(_request: Request) -> JSONResponse:
+    """
+    Drop the cached product catalog, e.g. after the seller changes it.
+    """
+    acp_client.invalidate_catalog_cache()
+    return JSONResponse({'invalidated': True}, status_code=200)
+
+
+# ============================================================================
+# CHECKOUT ENDPOINTS
+# ============================================================================
+
+@_idempotent
+async def create_checkout(request: Request) -> JSONResponse:
+    """
+    Create a new checkout session with specified items; honours Idempotency-Key.
+    """
+    try:
+        request_data = await _validate_request_json(request)
+    except ValueError as error:
+        return _bad_request(str(error))
+
+    if 'items' not in request_data:
+        return _bad_request('Items are required')
+
+    result = await acp_client.create_checkout(
+        items=request_data['items'],
+        buyer=request_data.get('buyer'),
+        fulfillment_address=request_data.get('fulfillment_address'),
+        payment_token=request_data.get('payment_token')
+    )
+
+    if 'error' in result:
+        return _handle_acp_error(result, default_status_code=500)
+
+    return JSONResponse(result, status_code=201)
+
+
+async def get_checkout(request: Request) -> JSONResponse:
+    """
+    Retrieve an existing checkout session by ID.
+    """
+    result = await acp_client.get_checkout(request.path_params['checkout_id'])
+
+    if 'error' in result:
+        return _handle_acp_error(result, default_status_code=404)
+
+    return JSONResponse(result, status_code=200)
+
+
+async def update_checkout(request: Request) -> JSONResponse:
+    """
+    Update an existing checkout session.
+    """
+    try:
+        request_data = await _validate_request_json(request)
+    except ValueError as error:
+        return _bad_request(str(error))
+
+    result = await acp_client.update_checkout(
+        checkout_id=request.path_params['checkout_id'],
+        items=request_data.get('items'),
+        buyer=request_data.get('buyer'),
+        fulfillment_address=request_data.get('fulfillment_address'),
+        fulfillment_option_id=request_data.get('fulfillment_option_id'),
+        payment_token=request_data.get('payment_token')
+    )
+
+    if 'error' in result:
+        return _handle_acp_error(result, default_status_code=400)
+
+    return JSONResponse(result, status_code=200)
+
+
+@_idempotent
+async def complete_checkout(request: Request) -> JSONResponse:
+    """
+    Complete a checkout session with payment; honours Idempotency-Key.
+    """
+    try:
+        request_data = await _validate_request_json(request)
+    except ValueError as error:
+        return _bad_request(str(error))
+
+    if 'payment_token' not in request_data:
+        return _bad_request('Payment token is required')
+
+    payment_provider = request_data.get('payment_provider')
+    if payment_provider is None:
+        payment_provider = 'stripe'
+
+    result = await acp_client.complete_checkout(
+        checkout_id=request.path_params['checkout_id'],
+        payment_token=request_data['payment_token'],
+        payment_provider=payment_provider,
+        billing_address=request_data.get('billing_address')
+    )
+
+    if 'error' in result:
+        return _handle_acp_error(result, default_status_code=400)
+
+    return JSONResponse(result, status_code=200)
+
+
+async def cancel_checkout(request: Request) -> JSONResponse:
+    """
+    Cancel an existing checkout session.
+    """
+    result = await acp_client.cancel_checkout(request.path_params['checkout_id'])
+
+    if 'error' in result:
+        return _handle_acp_error(result, default_status_code=400)
+
+    return JSONResponse(result, status_code=200)
+
+
+# ============================================================================
+# CHAT ENDPOINTS
+# ============================================================================
+
+async def chat(request: Request) -> JSONResponse:
+    """
+    Process chat messages through the LLM service.
+    """
+    try:
+        request_data = await _validate_request_json(request)
+    except ValueError as error:
+        return _bad_request(str(error))
+
+    if 'messages' not in request_data:
+        return _bad_request('Messages are required')
+
+    try:
+        response = await llm_service.process_message(request_data['messages'])
+    except LLMOverloaded as error:
+        return _overloaded(error)
+
+    return JSONResponse(response, status_code=200)
+
+
+async def chat_stream(request: Request) -> Union[StreamingResponse, JSONResponse]:
+    """
+    Process chat messages through the LLM service, streaming the answer as Server-Sent Events.
+    """
+    try:
+        request_data = await _validate_request_json(request)
+    except ValueError as error:
+        return _bad_request(str(error))
+
+    if 'messages' not in request_data:
+        return _bad_request('Messages are required')
+
+    events = llm_service.stream_message(request_data['messages'])
+
+    # Wait for the first event so an overloaded LLM is reported with a status code
+    try:
+        first_event = await anext(events)
+    except LLMOverloaded as error:
+        return _overloaded(error)
+
+    async def generate() -> AsyncIterator[str]:
+        yield format_sse_event(*first_event)
+        async for event, data in events:
+            yield format_sse_event(event, data)
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+# ============================================================================
+# HEALTH ENDPOINTS
+# ============================================================================
+
+async def health(_request: Request) -> JSONResponse:
+    """
+    Health check endpoint.
+    """
+    return JSONResponse({
+        'status': 'healthy',
+        'service': 'chat-backend',
+        'mode': 'asgi',
+        'pid': os.getpid(),
+        **{name: source() for name, source in STATS_SOURCES.items()}
+    }, status_code=200)
+
+
+async def metrics(_request: Request) -> Response:
+    """
+    Prometheus metrics in the text exposition format.
+    """
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+
+# ============================================================================
+# APPLICATION SETUP
+# ============================================================================
+
+routes = [
+    Route('/products', list_products, methods=['GET']),
+    Route('/products/cache/invalidate', invalidate_products_cache, methods=['POST']),
+    Route('/checkout/create', create_checkout, methods=['POST']),
+    Route('/checkout/{checkout_id}', get_checkout, methods=['GET']),
+    Route('/checkout/{checkout_id}/update', update_checkout, methods=['PUT']),
+    Route('/checkout/{checkout_id}/complete', complete_checkout, methods=['POST']),
+    Route('/checkout/{checkout_id}/cancel', cancel_checkout, methods=['POST']),
+    Route('/chat', chat, methods=['POST']),
+    Route('/chat/stream', chat_stream, methods=['POST']),
+    Route('/health', health, methods=['GET']),
+    Route('/metrics', metrics, methods=['GET'])
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(RequestTracingMiddleware),
+        Middleware(RouteMetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    lifespan=lifespan
+)
+
+
+# ============================================================================
+# APPLICATION ENTRY POINT
+# ============================================================================
+
+if __name__ == '__main__':
+    print(f"\nChat Backend ASGI Server Starting...")
+    print(f"Port: {CHAT_BACKEND_PORT}")
+    print(f"Workers: {ASGI_WORKERS}")
+    print(f"\n")
+
+    uvicorn.run(
+        'asgi_server:app',
+        host='0.0.0.0',
+        port=CHAT_BACKEND_PORT,
+        workers=ASGI_WORKERS,
+        log_level=ASGI_LOG_LEVEL
+    )
@@ -0,0 +1,687 @@
+"""
+Asynchronous Agentic Commerce Protocol Client
+
+asyncio counterpart of ACPClient. Exposes the same methods and the same
+error-dictionary contract, but every call is a coroutine running over one
+shared httpx connection pool, so many checkout operations can be awaited
+concurrently from a single event loop.
+"""
+
+import asyncio
+from urllib.parse import urlsplit
+from typing import Optional, Dict, List, Any, Awaitable, Callable, Iterable, TypeVar, Set, Tuple
+
+import httpx
+
+from acp_client import (
+    SELLER_BACKEND_URL,
+    SINGLE_FLIGHT_ENABLED,
+    MOCK_STRIPE_SPT_URL,
+    DEFAULT_PAYMENT_PROVIDER,
+    DEFAULT_OPERATION_TIMEOUTS,
+    _build_acp_headers,
+    _build_create_checkout_data,
+    _build_update_checkout_data,
+    _build_spt_request_data,
+    _build_spt_batch_request_data,
+    _spt_batches,
+    _combine_spt_batch_responses,
+    _build_complete_checkout_data,
+    _extract_total_amount_from_checkout,
+    _is_idempotent,
+    _prefetch_spt_for_session
+)
+from catalog_cache import CatalogCache, CATALOG_CACHE_ENABLED, CACHE_FRESH, CACHE_STALE
+from singleflight import AsyncSingleFlight
+from spt_prefetch import AsyncSPTPrefetcher, SPT_PREFETCH_ENABLED
+from resilience import Resilience, RESILIENCE_ENABLED
+from metrics import upstream_timer
+from tracing import client_span, record_status, span
+from http_transport import (
+    HTTP_POOL_MAXSIZE,
+    HTTP_KEEP_ALIVE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    Timeout,
+    operation_timeouts_from_env
+)
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+# Maximum number of operations a single fan-out call runs at the same time
+DEFAULT_FAN_OUT_LIMIT: int = HTTP_POOL_MAXSIZE
+
+T = TypeVar('T')
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def _to_httpx_timeout(timeout: Timeout) -> httpx.Timeout:
+    """
+    Convert a (connect, read) timeout tuple to an httpx timeout.
+
+    Args:
+        timeout: Tuple of (connect timeout, read timeout) in seconds
+
+    Returns:
+        Equivalent httpx.Timeout, using the read timeout for writes and pool waits
+    """
+    connect_timeout, read_timeout = timeout
+    return httpx.Timeout(read_timeout, connect=connect_timeout)
+
+
+def _error_from_exception(error: Exception) -> Dict[str, Any]:
+    """
+    Convert an httpx exception, or the ValueError of a non-JSON body, to the
+    ACPClient error dictionary format.
+
+    Args:
+        error: Exception raised by httpx or while decoding the response
+
+    Returns:
+        Dictionary with 'error' message and 'status_code' (None if no response)
+    """
+    status_code = None
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+
+    return {
+        'error': str(error),
+        'status_code': status_code
+    }
+
+
+# ============================================================================
+# ASYNC ACP CLIENT CLASS
+# ============================================================================
+
+class AsyncACPClient:
+    """
+    asyncio client for interacting with ACP-compliant seller backend.
+
+    Mirrors ACPClient method for method. Use it as an async context manager,
+    or call aclose() when done, so the shared connection pool is released.
+    """
+
+    def __init__(
+        self,
+        base_url: str = SELLER_BACKEND_URL,
+        max_connections: int = HTTP_POOL_MAXSIZE,
+        keep_alive: bool = HTTP_KEEP_ALIVE,
+        operation_timeouts: Optional[Dict[str, Timeout]] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        catalog_cache: Optional[CatalogCache] = None,
+        single_flight: bool = SINGLE_FLIGHT_ENABLED,
+        spt_prefetch: bool = SPT_PREFETCH_ENABLED,
+        resilience: Optional[Resilience] = None
+    ) -> None:
+        """
+        Initialize async ACP client with seller backend URL.
+
+        Args:
+            base_url: Base URL of the seller backend (defaults to config value)
+            max_connections: Maximum number of pooled connections
+            keep_alive: Reuse connections between requests
+            operation_timeouts: Timeout per operation name (defaults to the
+                ACPClient defaults with environment overrides)
+            http_client: Existing httpx client to share (defaults to a new one)
+            catalog_cache: Product catalog cache (defaults to a new cache when
+                CATALOG_CACHE_ENABLED, otherwise no caching)
+            single_flight: Whether concurrent identical GET requests share one
+                upstream call (defaults to SINGLE_FLIGHT_ENABLED)
+            spt_prefetch: Whether the Shared Payment Token is issued as soon as a
+                checkout is ready for payment (defaults to SPT_PREFETCH_ENABLED)
+            resilience: Retry and circuit breaker policy for seller backend calls
+                (defaults to a new policy when RESILIENCE_ENABLED)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.operation_timeouts = operation_timeouts or operation_timeouts_from_env(
+            DEFAULT_OPERATION_TIMEOUTS, 'ACP_TIMEOUT_'
+        )
+
+        if http_client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections if keep_alive else 0
+                ),
+                timeout=_to_httpx_timeout((HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+            )
+        self.http_client = http_client
+
+        if catalog_cache is None and CATALOG_CACHE_ENABLED:
+            catalog_cache = CatalogCache()
+        self.catalog_cache = catalog_cache
+        self._background_tasks: Set[asyncio.Task] = set()
+        self.single_flight: Optional[AsyncSingleFlight] = AsyncSingleFlight() if single_flight else None
+        self.spt_prefetcher: Optional[AsyncSPTPrefetcher] = (
+            AsyncSPTPrefetcher(self._issue_spt) if spt_prefetch else None
+        )
+
+        if resilience is None and RESILIENCE_ENABLED:
+            resilience = Resilience()
+        self.resilience = resilience
+
+    async def __aenter__(self) -> 'AsyncACPClient':
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Close all pooled connections.
+        """
+        await self.http_client.aclose()
+
+    def _timeout_for(self, operation: Optional[str]) -> httpx.Timeout:
+        """
+        Look up the httpx timeout to use for an operation.
+
+        Args:
+            operation: Operation name, or None for the client default
+
+        Returns:
+            httpx timeout for the request
+        """
+        default = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        if operation is None:
+            return _to_httpx_timeout(default)
+        return _to_httpx_timeout(self.operation_timeouts.get(operation, default))
+
+    async def _request(self, method: str, url: str, operation: Optional[str], **kwargs: Any) -> httpx.Response:
+        """
+        Send an HTTP request over the shared pool with the operation's timeout, recording its
+        latency and tracing it as a child span with its traceparent header.
+
+        Args:
+            method: HTTP method
+            url: Absolute request URL
+            operation: Operation name used to select the timeout
+            **kwargs: Extra arguments passed to httpx.AsyncClient.request
+
+        Returns:
+            The HTTP response
+
+        Raises:
+            httpx.HTTPError: If the request fails or times out
+        """
+        headers = kwargs['headers'] = dict(kwargs.get('headers') or {})
+        with upstream_timer(urlsplit(url).netloc, operation) as outcome, \
+                client_span(operation, method, url, headers) as span:
+            response = await self.http_client.request(method, url, timeout=self._timeout_for(operation), **kwargs)
+            outcome.record_status(response.status_code)
+            record_status(span, response.status_code)
+        return response
+
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        operation: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Make HTTP request to seller backend.
+
+        Concurrent identical GET requests are coalesced into one upstream call
+        whose result every caller receives. Calls go through the endpoint's
+        circuit breaker, and idempotent ones are retried on upstream failures.
+
+        Args:
+            method: HTTP method (GET, POST, PUT)
+            endpoint: API endpoint path
+            data: Optional request body data
+            operation: Operation name used to select the request timeout
+
+        Returns:
+            JSON response as dictionary, or error dictionary if request fails
+
+        Raises:
+            ValueError: If unsupported HTTP method is used
+        """
+        send = self._resilient(method, endpoint, lambda: self._send_request(method, endpoint, data, operation))
+
+        if method == 'GET' and self.single_flight is not None:
+            return await self.single_flight.do((method, endpoint), send)
+        return await send()
+
+    def _resilient(
+        self,
+        method: str,
+        endpoint: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Callable[[], Awaitable[Dict[str, Any]]]:
+        """
+        Wrap one request attempt in the client's retry and circuit breaker policy.
+
+        Args:
+            method: HTTP method
+            endpoint: API endpoint path
+            fn: Zero-argument coroutine function performing one attempt
+
+        Returns:
+            Zero-argument coroutine function performing the call under the policy
+        """
+        if self.resilience is None:
+            return fn
+        return lambda: self.resilience.acall(method, endpoint, fn, retry=_is_idempotent(method, endpoint))
+
+    async def _send_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        operation: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Send one HTTP request to seller backend.
+
+        Args:
+            method: HTTP method (GET, POST, PUT)
+            endpoint: API endpoint path
+            data: Optional request body data
+            operation: Operation name used to select the request timeout
+
+        Returns:
+            JSON response as dictionary, or error dictionary if request fails
+
+        Raises:
+            ValueError: If unsupported HTTP method is used
+        """
+        url = f"{self.base_url}{endpoint}"
+
+        # Step 1: Validate HTTP method
+        if method not in ['GET', 'POST', 'PUT']:
+            raise ValueError(f"Unsupported HTTP method: {method}")
+
+        # Step 2: Execute HTTP request over the shared pool
+        try:
+            response = await self._request(
+                method,
+                url,
+                operation,
+                json=data if method != 'GET' else None,
+                headers=_build_acp_headers()
+            )
+
+            # Step 3: Raise exception for HTTP errors
+            response.raise_for_status()
+
+            # Step 4: Return JSON response
+            return response.json()
+
+        except (httpx.HTTPError, ValueError) as e:
+            # Step 5: Convert HTTP exceptions and non-JSON bodies to error dictionary format
+            return _error_from_exception(e)
+
+    async def _fetch_catalog(self) -> Dict[str, Any]:
+        """
+        Fetch the product catalog, revalidating the cached copy with If-None-Match.
+
+        Returns:
+            Catalog dictionary, or error dictionary if request fails (errors are not cached)
+        """
+        headers = _build_acp_headers()
+        etag = self.catalog_cache.etag
+        if etag:
+            headers['If-None-Match'] = etag
+
+        try:
+            response = await self._request('GET', f"{self.base_url}/products", 'list_products', headers=headers)
+
+            # httpx treats 304 as an error status, so handle it before raise_for_status()
+            cached_catalog = self.catalog_cache.cached()
+            if response.status_code == 304 and cached_catalog is not None:
+                self.catalog_cache.mark_not_modified()
+                return cached_catalog
+
+            response.raise_for_status()
+            catalog = response.json()
+            self.catalog_cache.store(catalog, response.headers.get('ETag'))
+            return catalog
+
+        except (httpx.HTTPError, ValueError) as e:
+            return _error_from_exception(e)
+
+    async def _refresh_catalog_in_background(self) -> None:
+        """
+        Revalidate a stale catalog; runs as a background task.
+        """
+        try:
+            await self._resilient('GET', '/products', self._fetch_catalog)()
+        finally:
+            self.catalog_cache.end_refresh()
+
+    async def list_products(self) -> Dict[str, Any]:
+        """
+        Get list of available products from seller backend.
+
+        Served from the catalog cache when enabled, like ACPClient.list_products.
+
+        Returns:
+            Dictionary containing products list
+        """
+        if self.catalog_cache is None:
+            return await self._make_request('GET', '/products', operation='list_products')
+
+        catalog, state = self.catalog_cache.lookup()
+        if state == CACHE_FRESH:
+            return catalog
+
+        if state == CACHE_STALE:
+            if self.catalog_cache.begin_refresh():
+                task = asyncio.create_task(self._refresh_catalog_in_background())
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+            return catalog
+
+        fetch = self._resilient('GET', '/products', self._fetch_catalog)
+        if self.single_flight is not None:
+            return await self.single_flight.do(('GET', '/products'), fetch)
+        return await fetch()
+
+    def invalidate_catalog_cache(self) -> None:
+        """
+        Drop the cached product catalog so the next read fetches it from the seller backend.
+        """
+        if self.catalog_cache is not None:
+            self.catalog_cache.invalidate()
+
+    async def _issue_spt(self, payment_token: str, total_amount: int) -> str:
+        """
+        Exchange a payment method for a Shared Payment Token (mock Stripe SPT server).
+
+        Args:
+            payment_token: Payment method from the payment provider
+            total_amount: Maximum amount the token may be charged for
+
+        Returns:
+            ID of the issued token
+
+        Raises:
+            httpx.HTTPError: If the token server cannot be reached or rejects the request
+        """
+        spt_response = await self._request(
+            'POST',
+            f"{MOCK_STRIPE_SPT_URL}/v1/shared_payment/issued_tokens",
+            'issue_spt',
+            data=_build_spt_request_data(payment_token, total_amount)
+        )
+        spt_response.raise_for_status()
+        return spt_response.json()['id']
+
+    def _prefetch_spt(self, checkout_id: Optional[str], result: Dict[str, Any], payment_token: Optional[str]) -> None:
+        """
+        Start issuing the Shared Payment Token once a checkout is ready for payment.
+        """
+        if self.spt_prefetcher is not None:
+            _prefetch_spt_for_session(self.spt_prefetcher, checkout_id, result, payment_token)
+
+    async def create_checkout(
+        self,
+        items: List[Dict[str, Any]],
+        buyer: Optional[Dict[str, str]] = None,
+        fulfillment_address: Optional[Dict[str, str]] = None,
+        payment_token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Create a new checkout session.
+
+        Args:
+            items: List of items with id and quantity
+            buyer: Optional buyer information (first_name, last_name, email, phone_number)
+            fulfillment_address: Optional shipping address
+            payment_token: Optional payment method the buyer will pay with; not sent
+                to the seller, only used to prefetch the Shared Payment Token
+
+        Returns:
+            Dictionary containing checkout session details
+        """
+        data = _build_create_checkout_data(items, buyer, fulfillment_address)
+        result = await self._make_request('POST', '/checkout_sessions', data, operation='create_checkout')
+        self._prefetch_spt(result.get('id'), result, payment_token)
+        return result
+
+    async def get_checkout(self, checkout_id: str) -> Dict[str, Any]:
+        """
+        Retrieve an existing checkout session.
+
+        Args:
+            checkout_id: Unique identifier for the checkout session
+
+        Returns:
+            Dictionary containing checkout session details
+        """
+        return await self._make_request('GET', f'/checkout_sessions/{checkout_id}', operation='get_checkout')
+
+    async def update_checkout(
+        self,
+        checkout_id: str,
+        items: Optional[List[Dict[str, Any]]] = None,
+        buyer: Optional[Dict[str, str]] = None,
+        fulfillment_address: Optional[Dict[str, str]] = None,
+        fulfillment_option_id: Optional[str] = None,
+        payment_token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Update an existing checkout session.
+
+        Args:
+            checkout_id: ID of the checkout to update
+            items: Optional updated items list
+            buyer: Optional updated buyer information
+            fulfillment_address: Optional updated shipping address
+            fulfillment_option_id: Optional selected fulfillment option
+            payment_token: Optional payment method the buyer will pay with; not sent
+                to the seller, only used to prefetch the Shared Payment Token
+
+        Returns:
+            Dictionary containing updated checkout session details
+        """
+        data = _build_update_checkout_data(items, buyer, fulfillment_address, fulfillment_option_id)
+        result = await self._make_request(
+            'POST',
+            f'/checkout_sessions/{checkout_id}',
+            data,
+            operation='update_checkout'
+        )
+        self._prefetch_spt(checkout_id, result, payment_token)
+        return result
+
+    async def complete_checkout(
+        self,
+        checkout_id: str,
+        payment_token: str,
+        payment_provider: str = DEFAULT_PAYMENT_PROVIDER,
+        billing_address: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Complete a checkout with payment.
+
+        Args:
+            checkout_id: ID of the checkout to complete
+            payment_token: Payment token from payment provider
+            payment_provider: Payment provider name (default: stripe)
+            billing_address: Optional billing address
+
+        Returns:
+            Dictionary containing completion result, or an error dictionary if the
+            session, the Shared Payment Token or the completion request failed
+        """
+        # Step 0: Fail fast while the seller's completion endpoint is failing, before minting a token
+        endpoint = f'/checkout_sessions/{checkout_id}/complete'
+        if self.resilience is not None:
+            circuit_error = self.resilience.check('POST', endpoint)
+            if circuit_error is not None:
+                return circuit_error
+
+        # Step 1: Get checkout details to extract total amount
+        checkout = await self.get_checkout(checkout_id)
+        if 'error' in checkout:
+            return checkout
+
+        try:
+            total_amount = _extract_total_amount_from_checkout(checkout)
+
+            # Step 2: Exchange payment token for SPT token (prefetched when it matches the total)
+            spt_token_id = None
+            if self.spt_prefetcher is not None:
+                with span('spt_prefetch.take') as take_span:
+                    spt_token_id = await self.spt_prefetcher.take(checkout_id, payment_token, total_amount)
+                    if take_span is not None:
+                        take_span.set_attribute('spt.prefetched', spt_token_id is not None)
+            if spt_token_id is None:
+                spt_token_id = await self._issue_spt(payment_token, total_amount)
+        except httpx.HTTPError as e:
+            # The token server could not be reached or rejected the request
+            return _error_from_exception(e)
+        except (KeyError, ValueError) as e:
+            # The session has no total, or the token server sent no token ID
+            return {'error': f"Cannot pay for checkout {checkout_id}: {e}", 'status_code': None}
+
+        # Step 3: Build request data
+        data = _build_complete_checkout_data(spt_token_id, payment_provider, billing_address)
+
+        # Step 4: Send completion request
+        return await self._make_request(
+            'POST',
+            endpoint,
+            data,
+            operation='complete_checkout'
+        )
+
+    async def cancel_checkout(self, checkout_id: str) -> Dict[str, Any]:
+        """
+        Cancel an existing checkout session.
+
+        Args:
+            checkout_id: ID of the checkout session to cancel
+
+        Returns:
+            Dictionary containing cancellation result
+        """
+        result = await self._make_request(
+            'POST',
+            f'/checkout_sessions/{checkout_id}/cancel',
+            {},
+            operation='cancel_checkout'
+        )
+        if self.spt_prefetcher is not None:
+            self.spt_prefetcher.discard(checkout_id)
+        return result
+
+    async def gather(
+        self,
+        operations: Iterable[Awaitable[T]],
+        limit: int = DEFAULT_FAN_OUT_LIMIT
+    ) -> List[T]:
+        """
+        Await many client operations concurrently over the shared pool.
+
+        Args:
+            operations: Coroutines returned by this client's methods
+            limit: Maximum number of operations in flight at once
+
+        Returns:
+            Results in the same order as the operations
+        """
+        semaphore = asyncio.Semaphore(limit)
+
+        async def _bounded(operation: Awaitable[T]) -> T:
+            async with semaphore:
+                return await operation
+
+        return await asyncio.gather(*(_bounded(operation) for operation in operations))
+
+    async def get_checkouts(
+        self,
+        checkout_ids: Iterable[str],
+        limit: int = DEFAULT_FAN_OUT_LIMIT
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Refresh many checkout sessions concurrently.
+
+        Args:
+            checkout_ids: IDs of the checkout sessions to retrieve
+            limit: Maximum number of requests in flight at once
+
+        Returns:
+            Dictionary mapping each checkout ID to its session details or error dictionary
+        """
+        checkout_ids = list(checkout_ids)
+        results = await self.gather((self.get_checkout(checkout_id) for checkout_id in checkout_ids), limit)
+        return dict(zip(checkout_ids, results))
+
+    async def _send_spt_batch(self, endpoint: str, key: str, batch: List[Any], operation: str) -> Dict[str, Any]:
+        """
+        Send one batch of a bulk operation to the mock Stripe SPT server.
+
+        Args:
+            endpoint: Batch endpoint path
+            key: Name of the list in the request body
+            batch: Items to send
+            operation: Operation name used to select the request timeout
+
+        Returns:
+            List response, or error dictionary if the request fails
+        """
+        try:
+            response = await self._request('POST', f"{MOCK_STRIPE_SPT_URL}{endpoint}", operation, json={key: batch})
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            return _error_from_exception(e)
+
+    async def _send_spt_batches(self, endpoint: str, key: str, items: List[Any], operation: str) -> Dict[str, Any]:
+        """
+        Send a bulk operation to the mock Stripe SPT server, with its batches of
+        SPT_BATCH_SIZE items in flight concurrently. A failed batch does not stop the others.
+
+        Returns:
+            Combined response (see _combine_spt_batch_responses)
+        """
+        batches = _spt_batches(items)
+        responses = await self.gather(self._send_spt_batch(endpoint, key, batch, operation) for batch in batches)
+        return _combine_spt_batch_responses(batches, responses)
+
+    async def issue_spts(self, payments: List[Tuple[str, int]]) -> Dict[str, Any]:
+        """
+        Issue several Shared Payment Tokens, e.g. to pre-provision them for a load test.
+
+        Args:
+            payments: (payment_token, total_amount) pairs, one per token
+
+        Returns:
+            Dictionary whose 'data' lists the issued tokens in order, and whose
+            'batch_errors' lists the requests that failed and which payments they held
+        """
+        return await self._send_spt_batches(
+            '/v1/shared_payment/issued_tokens/batch',
+            'tokens',
+            _build_spt_batch_request_data(payments)['tokens'],
+            'issue_spt_batch'
+        )
+
+    async def get_spts(self, spt_ids: List[str]) -> Dict[str, Any]:
+        """
+        Look up several Shared Payment Tokens, e.g. to reconcile orders. Tokens
+        are not marked as used.
+
+        Args:
+            spt_ids: IDs of the tokens
+
+        Returns:
+            Dictionary whose 'data' lists the found tokens, 'errors' the unknown or
+            expired ones, and 'batch_errors' the requests that failed and which IDs they held
+        """
+        result = await self._send_spt_batches(
+            '/v1/shared_payment/granted_tokens/batch', 'ids', spt_ids, 'get_spt_batch'
+        )
+        result.setdefault('errors', [])
+        return result
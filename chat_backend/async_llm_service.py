@@ -0,0 +1,304 @@
+"""
+Asynchronous LLM Service
+
+asyncio counterpart of LLMService for the ASGI server. Runs the same
+conversation flow (completion, tool execution, follow-up completion) without
+holding an OS thread while waiting on the LLM or the seller backend.
+"""
+
+import asyncio
+import json
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from urllib.parse import urlsplit
+
+import httpx
+
+from async_acp_client import AsyncACPClient
+from catalog_encoding import CatalogEncoder
+from completion_cache import CompletionCache, COMPLETION_CACHE_ENABLED
+from concurrency_limiter import AsyncConcurrencyLimiter, LLMOverloaded, LLM_LIMITER_ENABLED, LLM_MAX_CONCURRENCY
+from history import HistoryManager, HISTORY_COMPACTION_ENABLED
+from metrics import upstream_timer, tool_timer, record_tool_timeout
+from tracing import client_span, record_status, span
+from llm_service import (
+    DAT1_API_KEY,
+    LLM_API_URL,
+    LLM_MODEL,
+    LLM_CONNECT_TIMEOUT,
+    LLM_READ_TIMEOUT,
+    LLM_TOOLS,
+    LLM_TOOL_WORKERS,
+    FRONTEND_TOOLS,
+    MISSING_API_KEY_MESSAGE,
+    LLM_UNAVAILABLE_MESSAGE,
+    LLM_OVERLOADED_MESSAGE,
+    _build_llm_headers,
+    _build_llm_payload,
+    _catalog_version,
+    _message_as_delta,
+    _prompt_messages,
+    _parse_tool_call,
+    _frontend_tool_result,
+    _tool_message,
+    _tool_timeout,
+    _tool_timeout_result,
+    _parse_stream_line,
+    StreamAccumulator
+)
+
+
+# ============================================================================
+# ASYNC LLM SERVICE CLASS
+# ============================================================================
+
+class AsyncLLMService:
+    def __init__(
+        self,
+        acp_client: AsyncACPClient,
+        http_client: Optional[httpx.AsyncClient] = None,
+        tool_workers: int = LLM_TOOL_WORKERS,
+        history: Optional[HistoryManager] = None,
+        completion_cache: Optional[CompletionCache] = None,
+        limiter: Optional[AsyncConcurrencyLimiter] = None
+    ):
+        self.acp_client = acp_client
+        self.tool_semaphore = asyncio.Semaphore(tool_workers)
+        self.api_url = LLM_API_URL
+        self.model = LLM_MODEL
+        self.tools = LLM_TOOLS
+
+        if http_client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY),
+                timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+            )
+        self.http_client = http_client
+
+        if history is None and HISTORY_COMPACTION_ENABLED:
+            history = HistoryManager()
+        self.history = history
+        self.catalog_encoder = CatalogEncoder()
+
+        if completion_cache is None and COMPLETION_CACHE_ENABLED:
+            completion_cache = CompletionCache()
+        self.completion_cache = completion_cache
+
+        if limiter is None and LLM_LIMITER_ENABLED:
+            limiter = AsyncConcurrencyLimiter()
+        self.limiter = limiter
+
+    async def aclose(self) -> None:
+        """Close the pooled LLM connections"""
+        await self.http_client.aclose()
+
+    def _llm_slot(self) -> Any:
+        """Async context manager holding a concurrency slot for one LLM call (raises LLMOverloaded)"""
+        return self.limiter.slot() if self.limiter is not None else nullcontext()
+
+    def _cache_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Completion cache key of a request, or None when it must go to the LLM"""
+        return self.completion_cache.key_for(payload) if self.completion_cache is not None else None
+
+    async def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a completion, off the event loop when the backend does disk I/O"""
+        if self.completion_cache.blocking:
+            return await asyncio.to_thread(self.completion_cache.get, key)
+        return self.completion_cache.get(key)
+
+    async def _cache_put(self, key: str, message: Dict[str, Any]) -> None:
+        """Store a completion, off the event loop when the backend does disk I/O"""
+        if self.completion_cache.blocking:
+            await asyncio.to_thread(self.completion_cache.put, key, message)
+        else:
+            self.completion_cache.put(key, message)
+
+    async def _call_llm(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Call the LLM API, answering from the completion cache when possible.
+
+        Raises:
+            LLMOverloaded: If no concurrency slot is available
+        """
+        if not DAT1_API_KEY:
+            return dict(MISSING_API_KEY_MESSAGE)
+
+        payload = _build_llm_payload(self.model, _prompt_messages(self.history, messages))
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+
+        async with self._llm_slot():
+            try:
+                headers = _build_llm_headers()
+                with upstream_timer(urlsplit(self.api_url).netloc, 'chat_completions') as outcome, \
+                        client_span('chat_completions', 'POST', self.api_url, headers) as llm_span:
+                    response = await self.http_client.post(self.api_url, headers=headers, json=payload)
+                    outcome.record_status(response.status_code)
+                    record_status(llm_span, response.status_code)
+                response.raise_for_status()
+                message = response.json()['choices'][0]['message']
+                if cache_key is not None:
+                    await self._cache_put(cache_key, message)
+                return message
+            except Exception as e:
+                print(f"LLM API Error: {e}")
+                return dict(LLM_UNAVAILABLE_MESSAGE)
+
+    async def _execute_tool(self, function_name: str, function_args: Dict[str, Any]) -> str:
+        """Execute a single tool call and return its JSON-encoded result"""
+        if function_name == "list_products":
+            with tool_timer(function_name) as outcome, span(f"tool.{function_name}"):
+                products = await self.acp_client.list_products()
+                outcome.error = 'error' in products
+            return self.catalog_encoder.encode(products, _catalog_version(self.acp_client))
+
+        if function_name == "complete_checkout":
+            with tool_timer(function_name) as outcome, span(f"tool.{function_name}"):
+                result = await self.acp_client.complete_checkout(
+                    checkout_id=function_args['checkout_id'],
+                    payment_token=function_args['payment_token']
+                )
+                outcome.error = 'error' in result
+            return json.dumps(result)
+
+        return _frontend_tool_result(function_name, function_args)
+
+    async def _stream_llm(self, messages: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Call the LLM API with streaming enabled and yield the choice deltas.
+        A cached completion is yielded as a single delta. The concurrency slot
+        is held until the stream ends.
+
+        Raises:
+            LLMOverloaded: If no concurrency slot is available
+        """
+        if not DAT1_API_KEY:
+            yield {"content": MISSING_API_KEY_MESSAGE['content']}
+            return
+
+        payload = _build_llm_payload(self.model, _prompt_messages(self.history, messages))
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                yield _message_as_delta(cached)
+                return
+        payload['stream'] = True
+
+        # Rebuild the streamed message so it can be cached once complete
+        accumulator = StreamAccumulator() if cache_key is not None else None
+        received = False
+        async with self._llm_slot():
+            try:
+                headers = _build_llm_headers()
+                with upstream_timer(urlsplit(self.api_url).netloc, 'chat_completions_stream'), \
+                        client_span('chat_completions_stream', 'POST', self.api_url, headers):
+                    async with self.http_client.stream(
+                        'POST', self.api_url, headers=headers, json=payload
+                    ) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            delta = _parse_stream_line(line)
+                            if delta is not None:
+                                received = True
+                                if accumulator is not None:
+                                    accumulator.add(delta)
+                                yield delta
+                if accumulator is not None and received:
+                    await self._cache_put(cache_key, accumulator.message())
+            except Exception as e:
+                print(f"LLM API Error: {e}")
+                if not received:
+                    yield {"content": LLM_UNAVAILABLE_MESSAGE['content']}
+
+    async def _run_tool(self, function_name: str, function_args: Dict[str, Any]) -> str:
+        """Execute one tool call within its time budget"""
+        if function_name in FRONTEND_TOOLS:
+            return _frontend_tool_result(function_name, function_args)
+
+        try:
+            async with self.tool_semaphore:
+                return await asyncio.wait_for(
+                    self._execute_tool(function_name, function_args),
+                    timeout=_tool_timeout(function_name)
+                )
+        except asyncio.TimeoutError:
+            print(f"Tool {function_name} timed out")
+            record_tool_timeout(function_name)
+            return _tool_timeout_result(function_name)
+
+    async def _run_tool_calls(self, tool_calls: List[Dict[str, Any]], messages: List[Dict[str, Any]]) -> None:
+        """
+        Execute the tool calls concurrently and append their results to the history
+        in the original tool_call order.
+        """
+        parsed_calls = [_parse_tool_call(tool_call) for tool_call in tool_calls]
+        tool_results = await asyncio.gather(*(
+            self._run_tool(function_name, function_args)
+            for function_name, function_args, _ in parsed_calls
+        ))
+
+        for (function_name, _, tool_call_id), tool_result in zip(parsed_calls, tool_results):
+            messages.append(_tool_message(tool_call_id, function_name, tool_result))
+
+    async def process_message(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Process a chat message history, execute tools if needed, and return the final response.
+        Same contract as LLMService.process_message.
+        """
+        response_message = await self._call_llm(messages)
+
+        if not response_message.get('tool_calls'):
+            return response_message
+
+        messages.append(response_message)
+        tool_calls = response_message['tool_calls']
+        await self._run_tool_calls(tool_calls, messages)
+
+        # Call LLM again with tool results; attach the tool calls for the frontend
+        try:
+            final_response = await self._call_llm(messages)
+        except LLMOverloaded:
+            final_response = dict(LLM_OVERLOADED_MESSAGE)
+        final_response['original_tool_calls'] = tool_calls
+
+        return final_response
+
+    async def stream_message(self, messages: List[Dict[str, Any]]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of process_message.
+        Same events as LLMService.stream_message.
+        """
+        accumulator = StreamAccumulator()
+        async for delta in self._stream_llm(messages):
+            for event in accumulator.add(delta):
+                yield event
+        for event in accumulator.finish():
+            yield event
+
+        response_message = accumulator.message()
+        if not response_message.get('tool_calls'):
+            yield ('done', response_message)
+            return
+
+        messages.append(response_message)
+        tool_calls = response_message['tool_calls']
+        await self._run_tool_calls(tool_calls, messages)
+
+        # Stream the follow-up answer
+        final_accumulator = StreamAccumulator()
+        try:
+            async for delta in self._stream_llm(messages):
+                for event in final_accumulator.add(delta):
+                    if event[0] == 'token':
+                        yield event
+            final_response = final_accumulator.message()
+        except LLMOverloaded:
+            final_response = dict(LLM_OVERLOADED_MESSAGE)
+            yield ('token', {'content': final_response['content']})
+        final_response['original_tool_calls'] = tool_calls
+
+        yield ('done', final_response)
@@ -0,0 +1,186 @@
+"""
+Product Catalog Cache
+
+In-memory cache for the seller's product catalog. Entries are fresh for a
+configurable TTL, then served stale while a single background refresh
+revalidates them against the seller backend with If-None-Match.
+The cache only holds state; ACPClient and AsyncACPClient perform the fetches.
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+CATALOG_CACHE_ENABLED: bool = os.getenv('CATALOG_CACHE_ENABLED', 'True').lower() == 'true'
+CATALOG_CACHE_TTL: float = float(os.getenv('CATALOG_CACHE_TTL', '60'))
+CATALOG_CACHE_STALE_TTL: float = float(os.getenv('CATALOG_CACHE_STALE_TTL', '600'))
+
+# Lookup states
+CACHE_FRESH: str = 'fresh'
+CACHE_STALE: str = 'stale'
+CACHE_MISS: str = 'miss'
+
+
+# ============================================================================
+# CATALOG CACHE CLASS
+# ============================================================================
+
+class CatalogCache:
+    """
+    Thread-safe cache for the product catalog with TTL and stale-while-revalidate.
+
+    An entry younger than ttl is fresh. Between ttl and ttl + stale_ttl it is
+    stale: still served, but callers should trigger a background refresh.
+    Older entries, or no entry at all, are a miss and must be fetched inline.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL, stale_ttl: float = CATALOG_CACHE_STALE_TTL) -> None:
+        """
+        Initialize an empty cache.
+
+        Args:
+            ttl: Seconds an entry is served without revalidation
+            stale_ttl: Extra seconds a stale entry may be served while it is refreshed
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._lock = threading.Lock()
+        self._catalog: Optional[Dict[str, Any]] = None
+        self._etag: Optional[str] = None
+        self._stored_at = 0.0
+        self._version = 0
+        self._refreshing = False
+
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._revalidations = 0
+        self._not_modified = 0
+
+    @property
+    def etag(self) -> Optional[str]:
+        """ETag of the cached catalog, sent as If-None-Match on refresh"""
+        with self._lock:
+            return self._etag if self._catalog is not None else None
+
+    @property
+    def version(self) -> int:
+        """Number that changes every time the cached catalog content changes"""
+        with self._lock:
+            return self._version
+
+    def lookup(self) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Look up the cached catalog.
+
+        Returns:
+            Tuple of (catalog or None, state), state being CACHE_FRESH, CACHE_STALE or CACHE_MISS
+        """
+        with self._lock:
+            if self._catalog is None:
+                self._misses += 1
+                return None, CACHE_MISS
+
+            age = time.monotonic() - self._stored_at
+            if age <= self.ttl:
+                self._hits += 1
+                return self._catalog, CACHE_FRESH
+            if age <= self.ttl + self.stale_ttl:
+                self._stale_hits += 1
+                return self._catalog, CACHE_STALE
+
+            self._misses += 1
+            return None, CACHE_MISS
+
+    def cached(self) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached catalog regardless of age, or None if empty.
+        """
+        with self._lock:
+            return self._catalog
+
+    def store(self, catalog: Dict[str, Any], etag: Optional[str] = None) -> None:
+        """
+        Store a catalog freshly fetched from the seller backend.
+
+        Args:
+            catalog: Response body of GET /products
+            etag: ETag header of the response, if any
+        """
+        with self._lock:
+            if catalog != self._catalog:
+                self._version += 1
+            self._catalog = catalog
+            self._etag = etag
+            self._stored_at = time.monotonic()
+            self._revalidations += 1
+
+    def mark_not_modified(self) -> None:
+        """
+        Record a 304 Not Modified answer: the cached catalog is fresh again.
+        """
+        with self._lock:
+            self._stored_at = time.monotonic()
+            self._revalidations += 1
+            self._not_modified += 1
+
+    def begin_refresh(self) -> bool:
+        """
+        Claim the background refresh slot.
+
+        Returns:
+            True if the caller should refresh, False if a refresh is already running
+        """
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def end_refresh(self) -> None:
+        """
+        Release the background refresh slot.
+        """
+        with self._lock:
+            self._refreshing = False
+
+    def invalidate(self) -> None:
+        """
+        Drop the cached catalog so the next lookup fetches it from the seller backend.
+        """
+        with self._lock:
+            self._catalog = None
+            self._etag = None
+            self._stored_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache configuration and hit/miss counters.
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'cached': self._catalog is not None,
+                'version': self._version,
+                'age': time.monotonic() - self._stored_at if self._catalog is not None else None,
+                'hits': self._hits,
+                'stale_hits': self._stale_hits,
+                'misses': self._misses,
+                'revalidations': self._revalidations,
+                'not_modified': self._not_modified
+            }
@@ -0,0 +1,215 @@
+"""
+Catalog Encoding for the LLM
+
+Encodes the product catalog returned by the list_products tool for the
+model. The seller's catalog carries long descriptions, image URLs and
+origins the model does not need to answer "what drinks do you have"; every
+one of those characters is paid for in prompt tokens and prefill latency on
+each turn that browses the catalog and on every later turn that still
+carries the result.
+
+The encoder projects each product onto a configurable set of fields and
+writes a dense table, one header line and one line per product:
+
+    products (price in cents)
+    id|name|price|available|tag
+    item_001|Glass of wine|500|yes|wine
+
+The encoded text is cached per catalog version, so a catalog served from the
+catalog cache is only serialized again once its content changes.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+# Encoding formats
+FORMAT_TABLE: str = 'table'
+FORMAT_JSON: str = 'json'
+FORMAT_RAW: str = 'raw'
+
+CATALOG_TOOL_FORMAT: str = os.getenv('CATALOG_TOOL_FORMAT', FORMAT_TABLE).lower()
+CATALOG_TOOL_FIELDS: Tuple[str, ...] = tuple(
+    field.strip()
+    for field in os.getenv('CATALOG_TOOL_FIELDS', 'id,name,price,available,tag').split(',')
+    if field.strip()
+)
+
+TABLE_TITLE: str = 'products (price in cents)'
+TABLE_SEPARATOR: str = '|'
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def _field_value(product: Dict[str, Any], field: str) -> Any:
+    """
+    Read one projected field of a product. "available" is derived from the
+    stock level when the seller does not report it.
+    """
+    if field == 'available' and 'available' not in product:
+        stock = product.get('stock')
+        return None if stock is None else stock > 0
+    return product.get(field)
+
+
+def project_product(product: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Keep only the given fields of a product.
+
+    Args:
+        product: Product as returned by the seller backend
+        fields: Field names to keep, in order
+
+    Returns:
+        Dictionary with the fields the product has a value for
+    """
+    projected = {}
+    for field in fields:
+        value = _field_value(product, field)
+        if value is not None:
+            projected[field] = value
+    return projected
+
+
+def _table_cell(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, separators=(',', ':'))
+    return str(value).replace(TABLE_SEPARATOR, '/').replace('\n', ' ')
+
+
+def encode_table(products: List[Dict[str, Any]], fields: Tuple[str, ...]) -> str:
+    """
+    Encode products as a header line plus one separator-delimited line per product.
+
+    Args:
+        products: Products as returned by the seller backend
+        fields: Columns, in order
+
+    Returns:
+        Table text
+    """
+    lines = [TABLE_TITLE, TABLE_SEPARATOR.join(fields)]
+    for product in products:
+        lines.append(TABLE_SEPARATOR.join(_table_cell(_field_value(product, field)) for field in fields))
+    return '\n'.join(lines)
+
+
+def decode_table(text: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Read a table written by encode_table back into rows.
+
+    Args:
+        text: Tool result text
+
+    Returns:
+        List of rows keyed by column name, or None if the text is not a catalog table
+    """
+    lines = text.split('\n')
+    if len(lines) < 2 or lines[0] != TABLE_TITLE:
+        return None
+    columns = lines[1].split(TABLE_SEPARATOR)
+    return [dict(zip(columns, line.split(TABLE_SEPARATOR))) for line in lines[2:]]
+
+
+# ============================================================================
+# CATALOG ENCODER CLASS
+# ============================================================================
+
+class CatalogEncoder:
+    """
+    Thread-safe list_products result encoder caching the last encoding.
+    """
+
+    def __init__(self, output_format: str = CATALOG_TOOL_FORMAT, fields: Tuple[str, ...] = CATALOG_TOOL_FIELDS) -> None:
+        """
+        Args:
+            output_format: FORMAT_TABLE, FORMAT_JSON (projected, compact JSON) or
+                FORMAT_RAW (the seller's response as it is)
+            fields: Product fields to keep for the table and JSON formats
+
+        Raises:
+            ValueError: If the format is unknown
+        """
+        if output_format not in (FORMAT_TABLE, FORMAT_JSON, FORMAT_RAW):
+            raise ValueError(f"Unknown catalog tool format: {output_format}")
+        self.output_format = output_format
+        self.fields = fields
+
+        self._lock = threading.Lock()
+        # (catalog version, catalog object, encoded text) of the last encoding
+        self._cached: Optional[Tuple[int, Dict[str, Any], str]] = None
+
+        self._hits = 0
+        self._encodings = 0
+
+    def _encode(self, catalog: Dict[str, Any]) -> str:
+        products = catalog.get('products')
+        if self.output_format == FORMAT_RAW or not isinstance(products, list):
+            return json.dumps(catalog)
+        if self.output_format == FORMAT_JSON:
+            return json.dumps(
+                {'products': [project_product(product, self.fields) for product in products]},
+                separators=(',', ':')
+            )
+        return encode_table(products, self.fields)
+
+    def encode(self, catalog: Dict[str, Any], version: Optional[int] = None) -> str:
+        """
+        Encode a list_products result for the model.
+
+        Args:
+            catalog: Response of ACPClient.list_products; error dictionaries are
+                passed through as JSON
+            version: Catalog cache version the catalog belongs to, or None if
+                it is not cached
+
+        Returns:
+            Encoded tool result
+        """
+        if 'error' in catalog:
+            return json.dumps(catalog)
+
+        if version is not None:
+            with self._lock:
+                # The object check guards against a refresh between reading the catalog and its version
+                if self._cached is not None and self._cached[0] == version and self._cached[1] is catalog:
+                    self._hits += 1
+                    return self._cached[2]
+
+        encoded = self._encode(catalog)
+        with self._lock:
+            self._encodings += 1
+            if version is not None:
+                self._cached = (version, catalog, encoded)
+        return encoded
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the format and how often the cached encoding was reused.
+
+        Returns:
+            Dictionary of encoder statistics
+        """
+        with self._lock:
+            return {
+                'format': self.output_format,
+                'hits': self._hits,
+                'encodings': self._encodings,
+                'encoded_chars': len(self._cached[2]) if self._cached is not None else 0
+            }
@@ -0,0 +1,361 @@
+"""
+LLM Completion Cache
+
+Caches chat completions so common turns ("show me drinks", "what's for
+sale") skip the LLM round trip. The key is a hash of the normalized request:
+model, tools, temperature and the messages actually sent (after history
+compaction), with whitespace collapsed and user text case-folded. Tool
+results are part of the messages, so a follow-up completion is only reused
+while the tool returned the same data (e.g. the same catalog).
+
+Only safe turns are cached. A prompt whose current turn involves a payment
+tool is neither looked up nor stored, and neither is a completion that asks
+for a payment tool, so a cached answer never replays or describes a payment.
+Cached answers are deterministic: the same prompt gets the same answer for
+the entry's TTL even though completions are sampled with a temperature.
+
+Entries live in a pluggable backend: a bounded in-memory LRU (default), or
+an SQLite file shared by worker processes and kept across restarts. Both
+evict by TTL and least recent use.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+COMPLETION_CACHE_ENABLED: bool = os.getenv('COMPLETION_CACHE_ENABLED', 'False').lower() == 'true'
+COMPLETION_CACHE_BACKEND: str = os.getenv('COMPLETION_CACHE_BACKEND', 'memory').lower()
+COMPLETION_CACHE_TTL: float = float(os.getenv('COMPLETION_CACHE_TTL', '600'))
+COMPLETION_CACHE_MAX_ENTRIES: int = int(os.getenv('COMPLETION_CACHE_MAX_ENTRIES', '1000'))
+COMPLETION_CACHE_MAX_BYTES: int = int(os.getenv('COMPLETION_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+COMPLETION_CACHE_PATH: str = os.getenv('COMPLETION_CACHE_PATH', 'completion_cache.sqlite3')
+
+# Backends
+BACKEND_MEMORY: str = 'memory'
+BACKEND_DISK: str = 'disk'
+
+# Tools whose turns must never be served from or stored in the cache
+PAYMENT_TOOLS = ('complete_checkout',)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def _normalize_text(text: Any, fold_case: bool) -> Any:
+    if not isinstance(text, str):
+        return text
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    return text.casefold() if fold_case else text
+
+
+def _normalize_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    normalized = {key: value for key, value in message.items() if value is not None}
+    if 'content' in normalized:
+        normalized['content'] = _normalize_text(normalized['content'], message.get('role') == 'user')
+    return normalized
+
+
+def completion_key(payload: Dict[str, Any]) -> str:
+    """
+    Hash a chat completion request into a cache key.
+
+    Args:
+        payload: Request body with model, messages, tools and temperature
+
+    Returns:
+        Hex digest of the normalized request
+    """
+    normalized = {
+        'model': payload.get('model'),
+        'temperature': payload.get('temperature'),
+        'tools': payload.get('tools'),
+        'messages': [_normalize_message(message) for message in payload.get('messages') or []]
+    }
+    encoded = json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _calls_payment_tool(message: Dict[str, Any]) -> bool:
+    if message.get('role') == 'tool':
+        return message.get('name') in PAYMENT_TOOLS
+    return any(
+        (tool_call.get('function') or {}).get('name') in PAYMENT_TOOLS
+        for tool_call in message.get('tool_calls') or []
+    )
+
+
+def is_cacheable_prompt(messages: List[Dict[str, Any]]) -> bool:
+    """
+    Tell whether a prompt may be answered from the cache: its current turn
+    (everything after the last user message) must not involve a payment tool.
+    """
+    for message in reversed(messages):
+        if message.get('role') == 'user':
+            return True
+        if _calls_payment_tool(message):
+            return False
+    return True
+
+
+def is_cacheable_completion(message: Dict[str, Any]) -> bool:
+    """
+    Tell whether a completion may be stored: it must not ask for a payment tool.
+    """
+    return not _calls_payment_tool(message)
+
+
+# ============================================================================
+# BACKEND CLASSES
+# ============================================================================
+
+class MemoryBackend:
+    """
+    In-memory LRU store bounded by entry count and total size.
+    Callers hold the cache lock.
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (stored_at, encoded completion)
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str, min_stored_at: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < min_stored_at:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, value: str, stored_at: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (stored_at, value)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def size(self) -> Tuple[int, int]:
+        return len(self._entries), self._bytes
+
+
+class SQLiteBackend:
+    """
+    On-disk store in an SQLite file, safe to share between worker processes.
+    Least recently used entries are evicted past the entry and size limits.
+    Callers hold the cache lock.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int, max_bytes: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._connection = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS completions ('
+            ' key TEXT PRIMARY KEY, value TEXT NOT NULL,'
+            ' stored_at REAL NOT NULL, used_at REAL NOT NULL, size INTEGER NOT NULL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS completions_used_at ON completions (used_at)')
+
+    def get(self, key: str, min_stored_at: float) -> Optional[str]:
+        row = self._connection.execute(
+            'SELECT value, stored_at FROM completions WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < min_stored_at:
+            self._connection.execute('DELETE FROM completions WHERE key = ?', (key,))
+            return None
+        self._connection.execute('UPDATE completions SET used_at = ? WHERE key = ?', (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, value: str, stored_at: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO completions (key, value, stored_at, used_at, size) VALUES (?, ?, ?, ?, ?)',
+                (key, value, stored_at, stored_at, len(value))
+            )
+            count, size = self.size()
+            while count > self.max_entries or size > self.max_bytes:
+                # Drop the least recently used tenth at once rather than one row per insert
+                self._connection.execute(
+                    'DELETE FROM completions WHERE key IN '
+                    '(SELECT key FROM completions ORDER BY used_at LIMIT ?)', (max(1, count // 10),)
+                )
+                count, size = self.size()
+            self._connection.execute('COMMIT')
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+
+    def clear(self) -> None:
+        self._connection.execute('DELETE FROM completions')
+
+    def size(self) -> Tuple[int, int]:
+        count, size = self._connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions').fetchone()
+        return count, size
+
+
+# ============================================================================
+# COMPLETION CACHE CLASS
+# ============================================================================
+
+class CompletionCache:
+    """
+    Thread-safe completion cache with TTL over a pluggable backend.
+    """
+
+    def __init__(
+        self,
+        backend: str = COMPLETION_CACHE_BACKEND,
+        ttl: float = COMPLETION_CACHE_TTL,
+        max_entries: int = COMPLETION_CACHE_MAX_ENTRIES,
+        max_bytes: int = COMPLETION_CACHE_MAX_BYTES,
+        path: str = COMPLETION_CACHE_PATH
+    ) -> None:
+        """
+        Args:
+            backend: BACKEND_MEMORY or BACKEND_DISK
+            ttl: Seconds a completion is reused
+            max_entries: Maximum number of completions kept
+            max_bytes: Maximum total size of the encoded completions
+            path: SQLite file for the disk backend
+
+        Raises:
+            ValueError: If the backend is unknown
+        """
+        if backend == BACKEND_MEMORY:
+            self._backend: Any = MemoryBackend(max_entries, max_bytes)
+        elif backend == BACKEND_DISK:
+            self._backend = SQLiteBackend(path, max_entries, max_bytes)
+        else:
+            raise ValueError(f"Unknown completion cache backend: {backend}")
+        self.backend = backend
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._bypassed = 0
+
+    @property
+    def blocking(self) -> bool:
+        """Whether lookups do disk I/O and should be kept off an event loop"""
+        return self._backend.blocking
+
+    def key_for(self, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Return the cache key of a completion request, or None if the request
+        must not be served from the cache.
+
+        Args:
+            payload: Chat completion request body
+        """
+        if not is_cacheable_prompt(payload.get('messages') or []):
+            with self._lock:
+                self._bypassed += 1
+            return None
+        return completion_key(payload)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a completion.
+
+        Args:
+            key: Key returned by key_for()
+
+        Returns:
+            A fresh copy of the cached assistant message, or None
+        """
+        with self._lock:
+            value = self._backend.get(key, time.time() - self.ttl)
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        return json.loads(value)
+
+    def put(self, key: str, message: Dict[str, Any]) -> None:
+        """
+        Store a completion unless it asks for a payment tool.
+
+        Args:
+            key: Key returned by key_for()
+            message: Assistant message returned by the LLM
+        """
+        if not is_cacheable_completion(message):
+            return
+        value = json.dumps(message, separators=(',', ':'))
+        with self._lock:
+            self._backend.put(key, value, time.time())
+            self._stores += 1
+
+    def clear(self) -> None:
+        """
+        Drop every cached completion.
+        """
+        with self._lock:
+            self._backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache size and hit/miss counters.
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        with self._lock:
+            entries, size = self._backend.size()
+            return {
+                'backend': self.backend,
+                'ttl': self.ttl,
+                'entries': entries,
+                'bytes': size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'stores': self._stores,
+                'bypassed': self._bypassed
+            }
@@ -0,0 +1,231 @@
+"""
+Concurrency Limiter
+
+Admission control for LLM completions. At most max_concurrency calls run at
+once; up to max_queue more wait for a slot, each for at most queue_timeout
+seconds. A call arriving when the queue is full, or still waiting when its
+timeout runs out, is rejected with LLMOverloaded right away, so a burst is
+shed with a clear error instead of piling up behind the provider's rate
+limit with latency growing without bound.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+LLM_LIMITER_ENABLED: bool = os.getenv('LLM_LIMITER_ENABLED', 'True').lower() == 'true'
+LLM_MAX_CONCURRENCY: int = int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+LLM_MAX_QUEUE: int = int(os.getenv('LLM_MAX_QUEUE', '32'))
+LLM_QUEUE_TIMEOUT: float = float(os.getenv('LLM_QUEUE_TIMEOUT', '10'))
+
+OVERLOADED_STATUS_CODE: int = 503
+# Seconds clients are asked to wait before retrying, sent as Retry-After
+OVERLOADED_RETRY_AFTER: int = int(os.getenv('LLM_OVERLOADED_RETRY_AFTER', '2'))
+
+
+# ============================================================================
+# EXCEPTIONS
+# ============================================================================
+
+class LLMOverloaded(Exception):
+    """
+    Raised when an LLM call is rejected because too many are running or waiting.
+    """
+
+    def __init__(self, message: str, retry_after: int = OVERLOADED_RETRY_AFTER) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ============================================================================
+# LIMITER CLASSES
+# ============================================================================
+
+class _LimiterState:
+    """
+    Slot and queue accounting shared by the threaded and asyncio limiters.
+    Subclasses call the helpers while holding their condition's lock.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+
+        self._in_flight = 0
+        self._waiting = 0
+        self._peak_in_flight = 0
+        self._admitted = 0
+        self._queued = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    def _has_free_slot(self) -> bool:
+        return self._in_flight < self.max_concurrency
+
+    def _admit(self) -> None:
+        self._in_flight += 1
+        self._admitted += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+    def _enqueue(self) -> None:
+        """
+        Join the queue.
+
+        Raises:
+            LLMOverloaded: If the queue is full
+        """
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise LLMOverloaded(
+                f"LLM is at capacity ({self._in_flight} running, {self._waiting} waiting), try again shortly"
+            )
+        self._waiting += 1
+        self._queued += 1
+
+    def _timeout(self) -> LLMOverloaded:
+        self._timed_out += 1
+        return LLMOverloaded(f"Timed out after {self.queue_timeout}s waiting for LLM capacity, try again shortly")
+
+    def _stats(self) -> Dict[str, Any]:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'in_flight': self._in_flight,
+            'waiting': self._waiting,
+            'peak_in_flight': self._peak_in_flight,
+            'admitted': self._admitted,
+            'queued': self._queued,
+            'rejected': self._rejected,
+            'timed_out': self._timed_out
+        }
+
+
+class ConcurrencyLimiter(_LimiterState):
+    """
+    Concurrency limiter for threaded servers; share one instance per process.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT
+    ) -> None:
+        """
+        Args:
+            max_concurrency: Calls allowed to run at once
+            max_queue: Calls allowed to wait for a slot; more are rejected
+            queue_timeout: Seconds a call waits for a slot before it is rejected
+        """
+        super().__init__(max_concurrency, max_queue, queue_timeout)
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Hold a slot for the duration of the block.
+
+        Raises:
+            LLMOverloaded: If the queue is full or no slot frees up in time
+        """
+        with self._condition:
+            if not self._has_free_slot() or self._waiting:
+                self._enqueue()
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while not self._has_free_slot():
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._timeout()
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._admit()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report slot usage, queue length and rejection counters.
+
+        Returns:
+            Dictionary of limiter statistics
+        """
+        with self._condition:
+            return self._stats()
+
+
+class AsyncConcurrencyLimiter(_LimiterState):
+    """
+    Concurrency limiter for asyncio servers; one instance per event loop.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT
+    ) -> None:
+        """
+        Args:
+            max_concurrency: Calls allowed to run at once
+            max_queue: Calls allowed to wait for a slot; more are rejected
+            queue_timeout: Seconds a call waits for a slot before it is rejected
+        """
+        super().__init__(max_concurrency, max_queue, queue_timeout)
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold a slot for the duration of the block.
+
+        Raises:
+            LLMOverloaded: If the queue is full or no slot frees up in time
+        """
+        async with self._condition:
+            if not self._has_free_slot() or self._waiting:
+                self._enqueue()
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(self._has_free_slot), timeout=self.queue_timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise self._timeout() from None
+                finally:
+                    self._waiting -= 1
+            self._admit()
+
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report slot usage, queue length and rejection counters.
+
+        Returns:
+            Dictionary of limiter statistics
+        """
+        return self._stats()
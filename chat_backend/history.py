@@ -0,0 +1,331 @@
+"""
+Conversation History Compaction
+
+Keeps the prompt sent to the LLM within a token budget however long the
+session runs. The client sends the whole conversation every turn; before
+each LLM call the history is compacted into a new list (the client's list
+is left alone):
+
+1. Messages are reduced to the fields the chat completions API reads, which
+   drops extras the frontend echoes back, such as original_tool_calls.
+2. Tool results from earlier turns are stale: the latest old list_products
+   dump is replaced by a compact id -> name reference, earlier ones (and all
+   of them once the current turn lists products again) by a one-line note,
+   and other large results by a short excerpt. The current turn's results
+   are kept in full.
+3. If the history is still over budget, the oldest turns are dropped whole
+   (a user message with everything up to the next one, so tool calls and
+   their results stay paired) and replaced by a short extractive summary.
+   System messages and the most recent turns are always kept.
+4. If the kept turns alone are over budget, long messages in them are cut
+   to an excerpt, except in the current turn.
+
+Tokens are estimated from the character count; no tokenizer is needed.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from catalog_encoding import decode_table
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+HISTORY_COMPACTION_ENABLED: bool = os.getenv('HISTORY_COMPACTION_ENABLED', 'True').lower() == 'true'
+HISTORY_TOKEN_BUDGET: int = int(os.getenv('HISTORY_TOKEN_BUDGET', '6000'))
+HISTORY_KEEP_RECENT_TURNS: int = int(os.getenv('HISTORY_KEEP_RECENT_TURNS', '4'))
+HISTORY_TOOL_RESULT_MAX_CHARS: int = int(os.getenv('HISTORY_TOOL_RESULT_MAX_CHARS', '400'))
+HISTORY_SUMMARY_MAX_CHARS: int = int(os.getenv('HISTORY_SUMMARY_MAX_CHARS', '1200'))
+
+# Rough average for English text and JSON with common tokenizers
+CHARS_PER_TOKEN: float = 4.0
+# Role, separators and other per-message framing
+MESSAGE_OVERHEAD_TOKENS: int = 4
+
+# Fields of a message the chat completions API reads
+MESSAGE_FIELDS = ('role', 'content', 'name', 'tool_calls', 'tool_call_id')
+
+SUMMARY_PREFIX: str = 'Summary of the earlier conversation (older messages were removed):'
+SUMMARY_LINE_MAX_CHARS: int = 160
+
+Message = Dict[str, Any]
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def _content_text(content: Any) -> str:
+    if content is None:
+        return ''
+    if isinstance(content, str):
+        return content
+    return json.dumps(content)
+
+
+def estimate_tokens(message: Message) -> int:
+    """
+    Estimate the prompt tokens a message costs.
+
+    Args:
+        message: Chat message
+
+    Returns:
+        Estimated token count
+    """
+    chars = len(_content_text(message.get('content')))
+    if message.get('tool_calls'):
+        chars += len(json.dumps(message['tool_calls']))
+    return int(chars / CHARS_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS
+
+
+def estimate_history_tokens(messages: List[Message]) -> int:
+    """
+    Estimate the prompt tokens of a whole history.
+    """
+    return sum(estimate_tokens(message) for message in messages)
+
+
+def _clean_message(message: Message) -> Message:
+    return {key: message[key] for key in MESSAGE_FIELDS if key in message}
+
+
+def _split_turns(messages: List[Message]) -> Tuple[List[Message], List[List[Message]]]:
+    """
+    Split a history into its leading system messages and its turns.
+    A turn starts at a user message and runs until the next one.
+    """
+    start = 0
+    while start < len(messages) and messages[start].get('role') == 'system':
+        start += 1
+
+    turns: List[List[Message]] = []
+    for message in messages[start:]:
+        if message.get('role') == 'user' or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return messages[:start], turns
+
+
+def _compact_products(content: str) -> Optional[str]:
+    """
+    Reduce a list_products result, JSON or catalog table, to an id -> name map.
+    """
+    try:
+        products = json.loads(content)
+    except ValueError:
+        items: Any = decode_table(content)
+    else:
+        items = products.get('products') if isinstance(products, dict) else None
+    if not isinstance(items, list):
+        return None
+    return json.dumps({
+        'compacted': 'list_products',
+        'products': {
+            str(item.get('id')): item.get('name')
+            for item in items if isinstance(item, dict)
+        },
+        'note': 'Earlier catalog listing; call list_products for prices and details'
+    })
+
+
+def _compact_tool_result(message: Message, max_chars: int, superseded: bool) -> Optional[Message]:
+    """
+    Replace a stale tool result by a compact reference.
+
+    Args:
+        message: Tool result message from an earlier turn
+        max_chars: Results up to this size are kept as they are
+        superseded: Whether a later result of the same tool is in the history
+
+    Returns:
+        The compacted message, or None if the result is already small
+    """
+    content = _content_text(message.get('content'))
+    if len(content) <= max_chars:
+        return None
+
+    compacted: Optional[str] = None
+    if superseded:
+        compacted = json.dumps({
+            'compacted': message.get('name') or 'tool',
+            'note': 'Superseded by a later call of the same tool'
+        })
+    elif message.get('name') == 'list_products':
+        compacted = _compact_products(content)
+
+    if compacted is None or len(compacted) >= len(content):
+        compacted = json.dumps({
+            'compacted': message.get('name') or 'tool',
+            'excerpt': content[:max_chars]
+        })
+    return {**message, 'content': compacted}
+
+
+def _summary_lines(turn: List[Message]) -> List[str]:
+    """
+    Describe a dropped turn in a few short lines: what the user asked, which
+    tools were called and what the assistant answered.
+    """
+    lines: List[str] = []
+    for message in turn:
+        role = message.get('role')
+        content = _content_text(message.get('content')).strip().replace('\n', ' ')
+        if role == 'user' and content:
+            lines.append(f"- User: {content}")
+        elif role == 'assistant':
+            for tool_call in message.get('tool_calls') or []:
+                function = tool_call.get('function') or {}
+                lines.append(f"- Assistant called {function.get('name')}({function.get('arguments') or ''})")
+            if content:
+                lines.append(f"- Assistant: {content}")
+    return [line[:SUMMARY_LINE_MAX_CHARS] for line in lines]
+
+
+def _summary_message(lines: List[str], max_chars: int) -> Message:
+    # Keep the most recent lines that fit
+    kept: List[str] = []
+    size = len(SUMMARY_PREFIX)
+    for line in reversed(lines):
+        if size + len(line) + 1 > max_chars:
+            break
+        kept.append(line)
+        size += len(line) + 1
+    return {'role': 'system', 'content': '\n'.join([SUMMARY_PREFIX, *reversed(kept)])}
+
+
+# ============================================================================
+# HISTORY MANAGER CLASS
+# ============================================================================
+
+class HistoryManager:
+    """
+    Thread-safe history compactor with a token budget; one instance is
+    shared by all requests of an LLM service.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        keep_recent_turns: int = HISTORY_KEEP_RECENT_TURNS,
+        tool_result_max_chars: int = HISTORY_TOOL_RESULT_MAX_CHARS,
+        summary_max_chars: int = HISTORY_SUMMARY_MAX_CHARS
+    ) -> None:
+        """
+        Args:
+            token_budget: Estimated prompt tokens the history may use
+            keep_recent_turns: Most recent turns never dropped, including the current one
+            tool_result_max_chars: Stale tool results longer than this are compacted
+            summary_max_chars: Maximum size of the summary of dropped turns
+        """
+        self.token_budget = token_budget
+        self.keep_recent_turns = max(1, keep_recent_turns)
+        self.tool_result_max_chars = tool_result_max_chars
+        self.summary_max_chars = summary_max_chars
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._compacted_calls = 0
+        self._turns_dropped = 0
+        self._tool_results_compacted = 0
+        self._messages_truncated = 0
+        self._tokens_in = 0
+        self._tokens_out = 0
+
+    def compact(self, messages: List[Message]) -> List[Message]:
+        """
+        Build the history to send to the LLM.
+
+        Args:
+            messages: Full conversation history; not modified
+
+        Returns:
+            New list of messages within the token budget where possible; only
+            system messages and the current turn can keep it above
+        """
+        system_messages, turns = _split_turns([_clean_message(message) for message in messages])
+        tokens_in = estimate_history_tokens(messages)
+
+        # Tool results of finished turns are stale; walk them newest first so
+        # only the latest result of each tool keeps a reference
+        seen_tools = {message.get('name') for message in turns[-1] if message.get('role') == 'tool'} if turns else set()
+        tool_results_compacted = 0
+        for turn in reversed(turns[:-1]):
+            for index in reversed(range(len(turn))):
+                message = turn[index]
+                if message.get('role') != 'tool':
+                    continue
+                compacted = _compact_tool_result(
+                    message, self.tool_result_max_chars, message.get('name') in seen_tools
+                )
+                seen_tools.add(message.get('name'))
+                if compacted is not None:
+                    turn[index] = compacted
+                    tool_results_compacted += 1
+
+        turn_tokens = [estimate_history_tokens(turn) for turn in turns]
+        total = estimate_history_tokens(system_messages) + sum(turn_tokens)
+
+        dropped = 0
+        if total > self.token_budget:
+            # Leave room for the summary replacing the dropped turns
+            target = self.token_budget - int(self.summary_max_chars / CHARS_PER_TOKEN) - MESSAGE_OVERHEAD_TOKENS
+            while total > target and len(turns) - dropped > self.keep_recent_turns:
+                total -= turn_tokens[dropped]
+                dropped += 1
+
+        messages_truncated = 0
+        if total > self.token_budget:
+            for turn in turns[dropped:-1]:
+                for index, message in enumerate(turn):
+                    content = message.get('content')
+                    if isinstance(content, str) and len(content) > self.tool_result_max_chars:
+                        turn[index] = {**message, 'content': f"{content[:self.tool_result_max_chars]} [...]"}
+                        messages_truncated += 1
+
+        compacted_history = list(system_messages)
+        if dropped:
+            summary_lines = [line for turn in turns[:dropped] for line in _summary_lines(turn)]
+            compacted_history.append(_summary_message(summary_lines, self.summary_max_chars))
+        for turn in turns[dropped:]:
+            compacted_history.extend(turn)
+
+        tokens_out = estimate_history_tokens(compacted_history)
+        with self._lock:
+            self._calls += 1
+            self._compacted_calls += 1 if dropped or tool_results_compacted or messages_truncated else 0
+            self._turns_dropped += dropped
+            self._tool_results_compacted += tool_results_compacted
+            self._messages_truncated += messages_truncated
+            self._tokens_in += tokens_in
+            self._tokens_out += tokens_out
+
+        return compacted_history
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the budget and how much history was compacted.
+
+        Returns:
+            Dictionary of compaction statistics
+        """
+        with self._lock:
+            return {
+                'token_budget': self.token_budget,
+                'keep_recent_turns': self.keep_recent_turns,
+                'calls': self._calls,
+                'compacted_calls': self._compacted_calls,
+                'turns_dropped': self._turns_dropped,
+                'tool_results_compacted': self._tool_results_compacted,
+                'messages_truncated': self._messages_truncated,
+                'estimated_tokens_in': self._tokens_in,
+                'estimated_tokens_out': self._tokens_out
+            }
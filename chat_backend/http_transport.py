@@ -0,0 +1,255 @@
+"""
+HTTP Transport
+
+Pooled, keep-alive HTTP transport shared by the chat backend's outbound clients.
+Wraps a requests.Session with a bounded connection pool, per-operation
+connect/read timeouts and pool usage statistics.
+"""
+
+import os
+import threading
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from metrics import upstream_timer
+from tracing import client_span, record_status
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+HTTP_POOL_CONNECTIONS: int = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))
+HTTP_POOL_MAXSIZE: int = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+HTTP_POOL_BLOCK: bool = os.getenv('HTTP_POOL_BLOCK', 'False').lower() == 'true'
+HTTP_KEEP_ALIVE: bool = os.getenv('HTTP_KEEP_ALIVE', 'True').lower() == 'true'
+HTTP_CONNECT_TIMEOUT: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT: float = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+
+# (connect timeout, read timeout) in seconds
+Timeout = Tuple[float, float]
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def parse_timeout(value: Optional[str], default: Timeout) -> Timeout:
+    """
+    Parse a timeout setting of the form "<connect>,<read>" or "<seconds>".
+
+    Args:
+        value: Raw setting, typically read from an environment variable
+        default: Timeout to use when value is empty
+
+    Returns:
+        Tuple of (connect timeout, read timeout) in seconds
+
+    Raises:
+        ValueError: If the setting cannot be parsed
+    """
+    if not value:
+        return default
+
+    parts = [part.strip() for part in value.split(',')]
+    if len(parts) == 1:
+        return (float(parts[0]), float(parts[0]))
+    if len(parts) == 2:
+        return (float(parts[0]), float(parts[1]))
+
+    raise ValueError(f"Invalid timeout setting: {value}")
+
+
+def operation_timeouts_from_env(
+    defaults: Dict[str, Timeout],
+    prefix: str
+) -> Dict[str, Timeout]:
+    """
+    Apply per-operation timeout overrides from the environment.
+
+    An operation named "get_checkout" with prefix "ACP_TIMEOUT_" is
+    overridden by the ACP_TIMEOUT_GET_CHECKOUT variable.
+
+    Args:
+        defaults: Default timeout for each operation name
+        prefix: Environment variable prefix
+
+    Returns:
+        Dictionary of operation name to timeout
+    """
+    return {
+        operation: parse_timeout(os.getenv(f"{prefix}{operation.upper()}"), timeout)
+        for operation, timeout in defaults.items()
+    }
+
+
+# ============================================================================
+# HTTP TRANSPORT CLASS
+# ============================================================================
+
+class HTTPTransport:
+    """
+    Thread-safe pooled HTTP transport.
+
+    Keeps connections to upstream hosts alive between requests, bounds the
+    number of pooled connections per host and applies a connect/read timeout
+    to every request, looked up by operation name.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = HTTP_POOL_CONNECTIONS,
+        pool_maxsize: int = HTTP_POOL_MAXSIZE,
+        pool_block: bool = HTTP_POOL_BLOCK,
+        keep_alive: bool = HTTP_KEEP_ALIVE,
+        default_timeout: Timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+        operation_timeouts: Optional[Dict[str, Timeout]] = None
+    ) -> None:
+        """
+        Initialize the transport and its connection pool.
+
+        Args:
+            pool_connections: Number of per-host pools to keep
+            pool_maxsize: Maximum number of connections kept per host
+            pool_block: Wait for a free connection instead of opening an
+                extra, non-pooled one when the pool is exhausted
+            keep_alive: Reuse connections between requests
+            default_timeout: Timeout for operations without a specific entry
+            operation_timeouts: Timeout per operation name
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.default_timeout = default_timeout
+        self.operation_timeouts: Dict[str, Timeout] = dict(operation_timeouts or {})
+
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests_total = 0
+        self._errors_total = 0
+        self._timeouts_total = 0
+
+    def timeout_for(self, operation: Optional[str]) -> Timeout:
+        """
+        Look up the timeout to use for an operation.
+
+        Args:
+            operation: Operation name, or None for the default timeout
+
+        Returns:
+            Tuple of (connect timeout, read timeout) in seconds
+        """
+        if operation is None:
+            return self.default_timeout
+        return self.operation_timeouts.get(operation, self.default_timeout)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        operation: Optional[str] = None,
+        **kwargs: Any
+    ) -> requests.Response:
+        """
+        Send an HTTP request over the pooled session, as a child span of the
+        current trace with its traceparent header.
+
+        Args:
+            method: HTTP method
+            url: Absolute request URL
+            operation: Operation name used to select the timeout
+            **kwargs: Extra arguments passed to requests.Session.request
+
+        Returns:
+            The HTTP response
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails or times out
+        """
+        kwargs.setdefault('timeout', self.timeout_for(operation))
+        headers = kwargs['headers'] = dict(kwargs.get('headers') or {})
+
+        with self._lock:
+            self._in_flight += 1
+            self._requests_total += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        try:
+            with upstream_timer(urlsplit(url).netloc, operation) as outcome, \
+                    client_span(operation, method, url, headers) as span:
+                response = self.session.request(method, url, **kwargs)
+                outcome.record_status(response.status_code)
+                record_status(span, response.status_code)
+            return response
+        except requests.exceptions.Timeout:
+            with self._lock:
+                self._errors_total += 1
+                self._timeouts_total += 1
+            raise
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors_total += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report pool configuration and usage statistics.
+
+        Returns:
+            Dictionary with request counters and per-host pool usage
+        """
+        hosts: Dict[str, Dict[str, int]] = {}
+        for pool_key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(pool_key)
+            if pool is None:
+                continue
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests,
+                'connections_in_use': (
+                    pool.pool.maxsize - pool.pool.qsize() if pool.pool is not None else 0
+                )
+            }
+
+        with self._lock:
+            return {
+                'pool_connections': self.pool_connections,
+                'pool_maxsize': self.pool_maxsize,
+                'pool_block': self.pool_block,
+                'keep_alive': self.keep_alive,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'requests_total': self._requests_total,
+                'errors_total': self._errors_total,
+                'timeouts_total': self._timeouts_total,
+                'hosts': hosts
+            }
+
+    def close(self) -> None:
+        """
+        Close all pooled connections.
+        """
+        self.session.close()
@@ -0,0 +1,295 @@
+"""
+Idempotency Keys
+
+Response store for requests carrying an Idempotency-Key header. The first
+request with a key does the work; a duplicate arriving while it runs waits
+for it, and a duplicate arriving later gets the stored response, so a
+retried create or complete never reaches the seller backend (or mints a
+Shared Payment Token) twice. Responses are kept for a TTL in a size-bounded
+store. Only final responses are stored: successes, and 4xx rejections
+reported by the seller backend. Anything else (5xx, timeouts and connection
+errors that carry no upstream status code, local validation errors) is
+handed to the waiting duplicates but not stored, so a later retry does the
+work again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+IDEMPOTENCY_ENABLED: bool = os.getenv('IDEMPOTENCY_ENABLED', 'True').lower() == 'true'
+IDEMPOTENCY_TTL: float = float(os.getenv('IDEMPOTENCY_TTL', '3600'))
+IDEMPOTENCY_MAX_ENTRIES: int = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+IDEMPOTENCY_WAIT_TIMEOUT: float = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '60'))
+
+IDEMPOTENCY_KEY_HEADER: str = 'Idempotency-Key'
+IDEMPOTENT_REPLAYED_HEADER: str = 'Idempotent-Replayed'
+
+# (JSON body, HTTP status code)
+StoredResponse = Tuple[Any, int]
+
+# Upstream 4xx statuses that may succeed when retried
+TRANSIENT_STATUS_CODES = (408, 429)
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def is_final_response(body: Any, status_code: int) -> bool:
+    """
+    Tell whether a response may be replayed for the rest of the TTL.
+
+    Args:
+        body: JSON response body; error bodies carry the upstream 'status_code',
+            None when the seller backend could not be reached
+        status_code: HTTP status code of the response
+
+    Returns:
+        True for 2xx responses and for 4xx rejections that came from the seller backend
+    """
+    if 200 <= status_code < 300:
+        return True
+    if not 400 <= status_code < 500 or status_code in TRANSIENT_STATUS_CODES:
+        return False
+    return isinstance(body, dict) and body.get('status_code') is not None
+
+
+def request_fingerprint(data: Any) -> str:
+    """
+    Fingerprint a request body so a key reused for a different request can be told apart.
+
+    Args:
+        data: Parsed JSON request body, or None
+
+    Returns:
+        Hex digest of the canonical JSON encoding of the body
+    """
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# ============================================================================
+# EXCEPTIONS
+# ============================================================================
+
+class IdempotencyKeyReused(ValueError):
+    """
+    Raised when an Idempotency-Key is sent again with a different request body.
+    """
+
+
+# ============================================================================
+# STORE CLASSES
+# ============================================================================
+
+class _IdempotencyRecord:
+    """
+    One idempotent request: its fingerprint, its response once known, and
+    the signal its duplicates wait on.
+    """
+
+    __slots__ = ('fingerprint', 'created_at', 'response', 'done')
+
+    def __init__(self, fingerprint: str, created_at: float, done: Any) -> None:
+        self.fingerprint = fingerprint
+        self.created_at = created_at
+        self.response: Optional[StoredResponse] = None
+        self.done = done
+
+
+class _IdempotencyTable:
+    """
+    Thread-safe, TTL-evicted, size-bounded table of idempotency records.
+    Subclasses provide the signal duplicates wait on.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, wait_timeout: float) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._records: 'OrderedDict[str, _IdempotencyRecord]' = OrderedDict()
+
+        self._executed = 0
+        self._replayed = 0
+        self._conflicts = 0
+
+    def _new_signal(self) -> Any:
+        raise NotImplementedError
+
+    def _evict(self, now: float) -> None:
+        # Records are kept in creation order and share one TTL, so expired ones are at the front
+        while self._records:
+            key, record = next(iter(self._records.items()))
+            if now - record.created_at <= self.ttl and len(self._records) <= self.max_entries:
+                break
+            del self._records[key]
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[_IdempotencyRecord, bool]:
+        """
+        Claim a key, or join the request that already claimed it.
+
+        Args:
+            key: Idempotency key, scoped to the endpoint
+            fingerprint: Fingerprint of the request body
+
+        Returns:
+            Tuple of (record, owner); the owner must call finish() or abandon(),
+            everybody else waits for the record's response
+
+        Raises:
+            IdempotencyKeyReused: If the key was used for a different request body
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+
+            record = self._records.get(key)
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    self._conflicts += 1
+                    raise IdempotencyKeyReused(
+                        f"{IDEMPOTENCY_KEY_HEADER} was already used for a different request"
+                    )
+                self._replayed += 1
+                return record, False
+
+            record = _IdempotencyRecord(fingerprint, now, self._new_signal())
+            self._records[key] = record
+            self._executed += 1
+            return record, True
+
+    def finish(self, key: str, record: _IdempotencyRecord, body: Any, status_code: int) -> None:
+        """
+        Publish the owner's response to its duplicates, and store it for later
+        ones if it is final (see is_final_response).
+
+        Args:
+            key: Idempotency key passed to begin()
+            record: Record returned by begin()
+            body: JSON response body
+            status_code: HTTP status code of the response
+        """
+        record.response = (body, status_code)
+        if not is_final_response(body, status_code):
+            self._drop(key, record)
+        record.done.set()
+
+    def abandon(self, key: str, record: _IdempotencyRecord) -> None:
+        """
+        Release a key whose owner failed without a response; waiting duplicates get None.
+        """
+        self._drop(key, record)
+        record.done.set()
+
+    def _drop(self, key: str, record: _IdempotencyRecord) -> None:
+        with self._lock:
+            if self._records.get(key) is record:
+                del self._records[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report store size and how many requests were executed or replayed.
+
+        Returns:
+            Dictionary of idempotency statistics
+        """
+        with self._lock:
+            return {
+                'entries': len(self._records),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'executed': self._executed,
+                'replayed': self._replayed,
+                'conflicts': self._conflicts
+            }
+
+
+class IdempotencyStore(_IdempotencyTable):
+    """
+    Idempotency store for threaded servers.
+    """
+
+    def __init__(
+        self,
+        ttl: float = IDEMPOTENCY_TTL,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+        wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT
+    ) -> None:
+        """
+        Args:
+            ttl: Seconds a response is kept for replay
+            max_entries: Maximum number of keys kept; oldest go first
+            wait_timeout: Seconds a duplicate waits for the request in flight
+        """
+        super().__init__(ttl, max_entries, wait_timeout)
+
+    def _new_signal(self) -> threading.Event:
+        return threading.Event()
+
+    def wait(self, record: _IdempotencyRecord) -> Optional[StoredResponse]:
+        """
+        Wait for the owner of a key to respond.
+
+        Args:
+            record: Record returned by begin()
+
+        Returns:
+            The owner's (body, status code), or None if it failed or is still running after wait_timeout
+        """
+        record.done.wait(self.wait_timeout)
+        return record.response
+
+
+class AsyncIdempotencyStore(_IdempotencyTable):
+    """
+    Idempotency store for asyncio servers; one instance per event loop.
+    """
+
+    def __init__(
+        self,
+        ttl: float = IDEMPOTENCY_TTL,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+        wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT
+    ) -> None:
+        """
+        Args:
+            ttl: Seconds a response is kept for replay
+            max_entries: Maximum number of keys kept; oldest go first
+            wait_timeout: Seconds a duplicate waits for the request in flight
+        """
+        super().__init__(ttl, max_entries, wait_timeout)
+
+    def _new_signal(self) -> asyncio.Event:
+        return asyncio.Event()
+
+    async def wait(self, record: _IdempotencyRecord) -> Optional[StoredResponse]:
+        """
+        Wait for the owner of a key to respond.
+
+        Args:
+            record: Record returned by begin()
+
+        Returns:
+            The owner's (body, status code), or None if it failed or is still running after wait_timeout
+        """
+        try:
+            await asyncio.wait_for(record.done.wait(), timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            pass
+        return record.response
@@ -1,10 +1,20 @@
 import os
-import requests
+import time
 import json
-from typing import List, Dict, Any, Optional
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from dotenv import load_dotenv
 
 from acp_client import ACPClient
+from catalog_encoding import CatalogEncoder
+from completion_cache import CompletionCache, COMPLETION_CACHE_ENABLED
+from concurrency_limiter import ConcurrencyLimiter, LLMOverloaded, LLM_LIMITER_ENABLED, LLM_MAX_CONCURRENCY
+from history import HistoryManager, HISTORY_COMPACTION_ENABLED
+from http_transport import HTTPTransport, Timeout, operation_timeouts_from_env
+from metrics import upstream_timer, tool_timer, record_tool_timeout
+from tracing import bind_context, client_span, span
 
 load_dotenv()
 
@@ -14,6 +24,281 @@ load_dotenv()
 # ============================================================================
 
 DAT1_API_KEY: Optional[str] = os.getenv('DAT1_API_KEY')
+# Any OpenAI-compatible endpoint; point at mock_llm (http://localhost:8002/v1/chat/completions) to run offline
+LLM_API_URL: str = os.getenv('LLM_API_URL', 'https://api.dat1.co/api/v1/collection/open-ai/chat/completions')
+LLM_MODEL: str = os.getenv('LLM_MODEL', 'gpt-120-oss')
+LLM_TEMPERATURE: float = 0.7
+
+# A completion may take a while to start, but must never hang a request thread;
+# for streamed completions the read timeout bounds the gap between two chunks
+LLM_CONNECT_TIMEOUT: float = float(os.getenv('LLM_CONNECT_TIMEOUT', '3.05'))
+LLM_READ_TIMEOUT: float = float(os.getenv('LLM_READ_TIMEOUT', '120'))
+LLM_OPERATION_TIMEOUTS: Dict[str, Timeout] = operation_timeouts_from_env({
+    'chat_completions': (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT),
+    'chat_completions_stream': (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+}, 'LLM_TIMEOUT_')
+
+# Tool calls that need a backend round trip run concurrently on a bounded pool
+LLM_TOOL_WORKERS: int = int(os.getenv('LLM_TOOL_WORKERS', '8'))
+LLM_TOOL_TIMEOUT: float = float(os.getenv('LLM_TOOL_TIMEOUT', '15'))
+
+# complete_checkout chains three upstream calls (checkout, SPT, complete); its budget
+# stays above their combined transport timeouts so a payment is never reported as
+# timed out while it can still succeed
+LLM_TOOL_TIMEOUTS: Dict[str, float] = {
+    'complete_checkout': float(os.getenv('LLM_TOOL_TIMEOUT_COMPLETE_CHECKOUT', '60'))
+}
+
+# Tools that only signal the frontend; they are answered inline
+FRONTEND_TOOLS = ("add_to_cart", "start_checkout")
+
+MISSING_API_KEY_MESSAGE: Dict[str, Any] = {
+    "role": "assistant",
+    "content": "Error: DAT1_API_KEY is not configured in the backend."
+}
+LLM_UNAVAILABLE_MESSAGE: Dict[str, Any] = {
+    "role": "assistant",
+    "content": "I apologize, but I'm having trouble connecting to my brain right now."
+}
+LLM_OVERLOADED_MESSAGE: Dict[str, Any] = {
+    "role": "assistant",
+    "content": "Your request was processed, but I'm too busy right now to describe the result. Please ask me again in a moment."
+}
+
+# Tools available to the LLM
+LLM_TOOLS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "list_products",
+            "description": "Get a list of available drinks from the catalog. Use this when the user asks to see drinks or what is for sale.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "add_to_cart",
+            "description": "Add a product to the user's shopping cart. Use this when the user explicitly wants to buy a specific item.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "item_id": {
+                        "type": "string",
+                        "description": "The ID of the product to add to cart (e.g., 'item_1')"
+                    }
+                },
+                "required": ["item_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "start_checkout",
+            "description": "Initiate the checkout process. Use this when the user says they are ready to checkout or buy the items in their cart.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "complete_checkout",
+            "description": "Complete the checkout process using a payment token. Use this ONLY when the user provides a payment token and checkout ID.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "checkout_id": {
+                        "type": "string",
+                        "description": "The ID of the checkout session"
+                    },
+                    "payment_token": {
+                        "type": "string",
+                        "description": "The payment token provided by the user/frontend"
+                    }
+                },
+                "required": ["checkout_id", "payment_token"]
+            }
+        }
+    }
+]
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def _build_llm_headers() -> Dict[str, str]:
+    """Build headers for the LLM API"""
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {DAT1_API_KEY}"
+    }
+
+
+def _build_llm_payload(model: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the chat completion request body"""
+    return {
+        "model": model,
+        "messages": messages,
+        "tools": LLM_TOOLS,
+        "temperature": LLM_TEMPERATURE
+    }
+
+
+def _prompt_messages(history: Optional[HistoryManager], messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Return the messages to send to the LLM, compacted to the token budget when enabled"""
+    return history.compact(messages) if history is not None else messages
+
+
+def _message_as_delta(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Express a complete assistant message as a single stream delta"""
+    delta: Dict[str, Any] = {"content": message.get('content')}
+    if message.get('tool_calls'):
+        delta['tool_calls'] = [
+            {**tool_call, 'index': index} for index, tool_call in enumerate(message['tool_calls'])
+        ]
+    return delta
+
+
+def _catalog_version(acp_client: Any) -> Optional[int]:
+    """Version of the client's cached catalog, or None when the catalog is not cached"""
+    return acp_client.catalog_cache.version if acp_client.catalog_cache is not None else None
+
+
+def _parse_tool_call(tool_call: Dict[str, Any]) -> Tuple[str, Dict[str, Any], str]:
+    """Return (function name, parsed arguments, tool call id) for a tool call"""
+    function_name = tool_call['function']['name']
+    function_args = json.loads(tool_call['function']['arguments'] or '{}')
+    return function_name, function_args, tool_call['id']
+
+
+def _frontend_tool_result(function_name: str, function_args: Dict[str, Any]) -> str:
+    """
+    Result for tools that are just signals for the frontend.
+    We still need to provide a result to the LLM so it knows what happened.
+    """
+    if function_name == "add_to_cart":
+        return json.dumps({"status": "success", "message": f"Added {function_args.get('item_id')} to cart"})
+
+    if function_name == "start_checkout":
+        return json.dumps({"status": "success", "message": "Checkout started"})
+
+    return json.dumps({"error": "Unknown tool"})
+
+
+def _tool_timeout(function_name: str) -> float:
+    """Time budget in seconds for one tool call"""
+    return LLM_TOOL_TIMEOUTS.get(function_name, LLM_TOOL_TIMEOUT)
+
+
+def _tool_timeout_result(function_name: str) -> str:
+    """Result reported to the LLM when a tool call runs out of time"""
+    return json.dumps({"error": f"Tool {function_name} timed out"})
+
+
+def _tool_message(tool_call_id: str, function_name: str, tool_result: str) -> Dict[str, Any]:
+    """Build the history entry carrying a tool result"""
+    return {
+        "role": "tool",
+        "tool_call_id": tool_call_id,
+        "name": function_name,
+        "content": tool_result
+    }
+
+
+def _parse_stream_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse one line of a streamed completion into the choice delta.
+    Returns None for keep-alives, non-data lines and the final [DONE] marker.
+    """
+    if not line.startswith('data:'):
+        return None
+
+    data = line[len('data:'):].strip()
+    if not data or data == '[DONE]':
+        return None
+
+    choices = json.loads(data).get('choices') or []
+    if not choices:
+        return None
+    return choices[0].get('delta') or {}
+
+
+def format_sse_event(event: str, data: Any) -> str:
+    """Encode an event as a Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# ============================================================================
+# STREAM ACCUMULATOR CLASS
+# ============================================================================
+
+class StreamAccumulator:
+    """
+    Rebuilds an assistant message from streamed completion deltas.
+
+    Content deltas are passed through as 'token' events. Tool call deltas are
+    merged by index; a tool call is emitted as a 'tool_call' event once the next
+    one starts or the stream ends, i.e. as soon as its arguments are complete.
+    """
+
+    def __init__(self) -> None:
+        self.content_parts: List[str] = []
+        self.tool_calls: List[Dict[str, Any]] = []
+        self._emitted = 0
+
+    def add(self, delta: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        """Merge one delta and return the events it completes"""
+        events: List[Tuple[str, Any]] = []
+
+        content = delta.get('content')
+        if content:
+            self.content_parts.append(content)
+            events.append(('token', {'content': content}))
+
+        for tool_call_delta in delta.get('tool_calls') or []:
+            index = tool_call_delta.get('index', len(self.tool_calls) - 1)
+            while len(self.tool_calls) <= index:
+                self.tool_calls.append({"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+
+            tool_call = self.tool_calls[index]
+            if tool_call_delta.get('id'):
+                tool_call['id'] = tool_call_delta['id']
+            function_delta = tool_call_delta.get('function') or {}
+            tool_call['function']['name'] += function_delta.get('name') or ''
+            tool_call['function']['arguments'] += function_delta.get('arguments') or ''
+
+        # Every tool call before the last one is complete
+        events.extend(self._emit_tool_calls(len(self.tool_calls) - 1))
+        return events
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        """Return the events for tool calls still pending at the end of the stream"""
+        return self._emit_tool_calls(len(self.tool_calls))
+
+    def message(self) -> Dict[str, Any]:
+        """Return the assembled assistant message"""
+        message: Dict[str, Any] = {
+            "role": "assistant",
+            "content": ''.join(self.content_parts) or None
+        }
+        if self.tool_calls:
+            message['tool_calls'] = self.tool_calls
+        return message
+
+    def _emit_tool_calls(self, upto: int) -> List[Tuple[str, Any]]:
+        events = [('tool_call', tool_call) for tool_call in self.tool_calls[self._emitted:upto]]
+        self._emitted = max(self._emitted, upto)
+        return events
 
 
 # ============================================================================
@@ -21,112 +306,186 @@ DAT1_API_KEY: Optional[str] = os.getenv('DAT1_API_KEY')
 # ============================================================================
 
 class LLMService:
-    def __init__(self, acp_client: ACPClient):
+    def __init__(
+        self,
+        acp_client: ACPClient,
+        tool_workers: int = LLM_TOOL_WORKERS,
+        history: Optional[HistoryManager] = None,
+        completion_cache: Optional[CompletionCache] = None,
+        transport: Optional[HTTPTransport] = None,
+        limiter: Optional[ConcurrencyLimiter] = None
+    ):
         self.acp_client = acp_client
-        self.api_url = 'https://api.dat1.co/api/v1/collection/open-ai/chat/completions'
-        self.model = 'gpt-120-oss'
-        
-        # Define tools available to the LLM
-        self.tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_products",
-                    "description": "Get a list of available drinks from the catalog. Use this when the user asks to see drinks or what is for sale.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "add_to_cart",
-                    "description": "Add a product to the user's shopping cart. Use this when the user explicitly wants to buy a specific item.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "item_id": {
-                                "type": "string",
-                                "description": "The ID of the product to add to cart (e.g., 'item_1')"
-                            }
-                        },
-                        "required": ["item_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "start_checkout",
-                    "description": "Initiate the checkout process. Use this when the user says they are ready to checkout or buy the items in their cart.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "complete_checkout",
-                    "description": "Complete the checkout process using a payment token. Use this ONLY when the user provides a payment token and checkout ID.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "checkout_id": {
-                                "type": "string",
-                                "description": "The ID of the checkout session"
-                            },
-                            "payment_token": {
-                                "type": "string",
-                                "description": "The payment token provided by the user/frontend"
-                            }
-                        },
-                        "required": ["checkout_id", "payment_token"]
-                    }
-                }
-            }
-        ]
+        self.tool_executor = ThreadPoolExecutor(max_workers=tool_workers, thread_name_prefix='llm-tool')
+        self.api_url = LLM_API_URL
+        self.model = LLM_MODEL
+        self.tools = LLM_TOOLS
+
+        if history is None and HISTORY_COMPACTION_ENABLED:
+            history = HistoryManager()
+        self.history = history
+        self.catalog_encoder = CatalogEncoder()
+
+        if completion_cache is None and COMPLETION_CACHE_ENABLED:
+            completion_cache = CompletionCache()
+        self.completion_cache = completion_cache
+
+        # One pooled session for every completion, with a connection per admitted call
+        if transport is None:
+            transport = HTTPTransport(pool_maxsize=LLM_MAX_CONCURRENCY, operation_timeouts=LLM_OPERATION_TIMEOUTS)
+        self.transport = transport
+
+        if limiter is None and LLM_LIMITER_ENABLED:
+            limiter = ConcurrencyLimiter()
+        self.limiter = limiter
+
+    def _llm_slot(self) -> Any:
+        """Context manager holding a concurrency slot for one LLM call (raises LLMOverloaded)"""
+        return self.limiter.slot() if self.limiter is not None else nullcontext()
+
+    def _cache_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Completion cache key of a request, or None when it must go to the LLM"""
+        return self.completion_cache.key_for(payload) if self.completion_cache is not None else None
 
     def _call_llm(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Call the LLM API"""
+        """
+        Call the LLM API, answering from the completion cache when possible.
+
+        Raises:
+            LLMOverloaded: If no concurrency slot is available
+        """
         if not DAT1_API_KEY:
-            return {
-                "role": "assistant",
-                "content": "Error: DAT1_API_KEY is not configured in the backend."
-            }
+            return dict(MISSING_API_KEY_MESSAGE)
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {DAT1_API_KEY}"
-        }
+        payload = _build_llm_payload(self.model, _prompt_messages(self.history, messages))
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = self.completion_cache.get(cache_key)
+            if cached is not None:
+                return cached
 
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "tools": self.tools,
-            "temperature": 0.7
-        }
+        with self._llm_slot():
+            try:
+                response = self.transport.request(
+                    'POST', self.api_url, operation='chat_completions', headers=_build_llm_headers(), json=payload
+                )
+                response.raise_for_status()
+                message = response.json()['choices'][0]['message']
+                if cache_key is not None:
+                    self.completion_cache.put(cache_key, message)
+                return message
+            except Exception as e:
+                print(f"LLM API Error: {e}")
+                return dict(LLM_UNAVAILABLE_MESSAGE)
 
-        try:
-            response = requests.post(self.api_url, headers=headers, json=payload)
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']
-        except Exception as e:
-            print(f"LLM API Error: {e}")
-            return {
-                "role": "assistant",
-                "content": "I apologize, but I'm having trouble connecting to my brain right now."
-            }
+    def _execute_tool(self, function_name: str, function_args: Dict[str, Any]) -> str:
+        """Execute a single tool call and return its JSON-encoded result"""
+        # Handle tools that need backend execution
+        if function_name == "list_products":
+            with tool_timer(function_name) as outcome, span(f"tool.{function_name}"):
+                products = self.acp_client.list_products()
+                outcome.error = 'error' in products
+            return self.catalog_encoder.encode(products, _catalog_version(self.acp_client))
+
+        if function_name == "complete_checkout":
+            with tool_timer(function_name) as outcome, span(f"tool.{function_name}"):
+                result = self.acp_client.complete_checkout(
+                    checkout_id=function_args['checkout_id'],
+                    payment_token=function_args['payment_token']
+                )
+                outcome.error = 'error' in result
+            return json.dumps(result)
+
+        # Handle tools that are just signals for the frontend
+        return _frontend_tool_result(function_name, function_args)
+
+    def _stream_llm(self, messages: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Call the LLM API with streaming enabled and yield the choice deltas.
+        A cached completion is yielded as a single delta. The concurrency slot
+        is held until the stream ends.
+
+        Raises:
+            LLMOverloaded: If no concurrency slot is available
+        """
+        if not DAT1_API_KEY:
+            yield {"content": MISSING_API_KEY_MESSAGE['content']}
+            return
+
+        payload = _build_llm_payload(self.model, _prompt_messages(self.history, messages))
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = self.completion_cache.get(cache_key)
+            if cached is not None:
+                yield _message_as_delta(cached)
+                return
+        payload['stream'] = True
+
+        # Rebuild the streamed message so it can be cached once complete
+        accumulator = StreamAccumulator() if cache_key is not None else None
+        received = False
+        with self._llm_slot():
+            try:
+                headers = _build_llm_headers()
+                # Timed and traced here rather than by the transport so the whole stream is measured
+                with upstream_timer(urlsplit(self.api_url).netloc, 'chat_completions_stream'), \
+                        client_span('chat_completions_stream', 'POST', self.api_url, headers), \
+                        self.transport.session.post(
+                            self.api_url, headers=headers, json=payload, stream=True,
+                            timeout=self.transport.timeout_for('chat_completions_stream')
+                        ) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines(decode_unicode=True):
+                        delta = _parse_stream_line(line or '')
+                        if delta is not None:
+                            received = True
+                            if accumulator is not None:
+                                accumulator.add(delta)
+                            yield delta
+                if accumulator is not None and received:
+                    self.completion_cache.put(cache_key, accumulator.message())
+            except Exception as e:
+                print(f"LLM API Error: {e}")
+                if not received:
+                    yield {"content": LLM_UNAVAILABLE_MESSAGE['content']}
+
+    def _run_tool_calls(self, tool_calls: List[Dict[str, Any]], messages: List[Dict[str, Any]]) -> None:
+        """
+        Execute the tool calls and append their results to the history.
+        Backend tools run concurrently, each against its own deadline; results are
+        appended in the original tool_call order so the conversation stays deterministic.
+        """
+        parsed_calls = [_parse_tool_call(tool_call) for tool_call in tool_calls]
+        started_at = time.monotonic()
+
+        pending: List[Optional[Future]] = []
+        for function_name, function_args, _ in parsed_calls:
+            if function_name in FRONTEND_TOOLS:
+                pending.append(None)
+            else:
+                pending.append(self.tool_executor.submit(bind_context(self._execute_tool), function_name, function_args))
+
+        for (function_name, function_args, tool_call_id), future in zip(parsed_calls, pending):
+            if future is None:
+                tool_result = _frontend_tool_result(function_name, function_args)
+            else:
+                remaining = _tool_timeout(function_name) - (time.monotonic() - started_at)
+                try:
+                    tool_result = future.result(timeout=max(remaining, 0))
+                except FutureTimeoutError:
+                    print(f"Tool {function_name} timed out")
+                    record_tool_timeout(function_name)
+                    tool_result = _tool_timeout_result(function_name)
+
+            # Append tool result to history
+            messages.append(_tool_message(tool_call_id, function_name, tool_result))
 
     def process_message(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Process a chat message history, execute tools if needed, and return the final response.
         Returns a dict with 'role' and 'content', and optionally 'tool_calls' if the frontend needs to act.
+        Raises LLMOverloaded if the first LLM call is rejected; once tools have run, an overloaded
+        follow-up call is answered with a short notice so their effects still reach the frontend.
         """
         
         # First call to LLM
@@ -138,47 +497,13 @@ class LLMService:
             messages.append(response_message)
             
             tool_calls = response_message['tool_calls']
-            
-            for tool_call in tool_calls:
-                function_name = tool_call['function']['name']
-                function_args = json.loads(tool_call['function']['arguments'])
-                tool_call_id = tool_call['id']
-                
-                tool_result = None
-                
-                # Handle tools that need backend execution
-                if function_name == "list_products":
-                    products = self.acp_client.list_products()
-                    tool_result = json.dumps(products)
-                
-                elif function_name == "complete_checkout":
-                    result = self.acp_client.complete_checkout(
-                        checkout_id=function_args['checkout_id'],
-                        payment_token=function_args['payment_token']
-                    )
-                    tool_result = json.dumps(result)
-                
-                # Handle tools that are just signals for the frontend
-                # For these, we still need to provide a result to the LLM so it knows what happened
-                elif function_name == "add_to_cart":
-                    tool_result = json.dumps({"status": "success", "message": f"Added {function_args.get('item_id')} to cart"})
-                    
-                elif function_name == "start_checkout":
-                    tool_result = json.dumps({"status": "success", "message": "Checkout started"})
-                
-                else:
-                    tool_result = json.dumps({"error": "Unknown tool"})
-
-                # Append tool result to history
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call_id,
-                    "name": function_name,
-                    "content": tool_result
-                })
+            self._run_tool_calls(tool_calls, messages)
 
             # Call LLM again with tool results
-            final_response = self._call_llm(messages)
+            try:
+                final_response = self._call_llm(messages)
+            except LLMOverloaded:
+                final_response = dict(LLM_OVERLOADED_MESSAGE)
             
             # If the tool was a frontend action (add_to_cart, start_checkout), 
             # we might want to include that info in the response so the frontend knows what to do.
@@ -190,3 +515,39 @@ class LLMService:
             return final_response
             
         return response_message
+
+    def stream_message(self, messages: List[Dict[str, Any]]) -> Iterator[Tuple[str, Any]]:
+        """
+        Streaming variant of process_message.
+        Yields (event, data) pairs: 'token' for each content delta, 'tool_call' as soon as
+        a tool call is fully parsed, and a final 'done' carrying the same message
+        process_message would return. Raises LLMOverloaded like process_message.
+        """
+        accumulator = StreamAccumulator()
+        for delta in self._stream_llm(messages):
+            yield from accumulator.add(delta)
+        yield from accumulator.finish()
+
+        response_message = accumulator.message()
+        if not response_message.get('tool_calls'):
+            yield ('done', response_message)
+            return
+
+        messages.append(response_message)
+        tool_calls = response_message['tool_calls']
+        self._run_tool_calls(tool_calls, messages)
+
+        # Stream the follow-up answer
+        final_accumulator = StreamAccumulator()
+        try:
+            for delta in self._stream_llm(messages):
+                for event in final_accumulator.add(delta):
+                    if event[0] == 'token':
+                        yield event
+            final_response = final_accumulator.message()
+        except LLMOverloaded:
+            final_response = dict(LLM_OVERLOADED_MESSAGE)
+            yield ('token', {'content': final_response['content']})
+        final_response['original_tool_calls'] = tool_calls
+
+        yield ('done', final_response)
@@ -0,0 +1,263 @@
+"""
+Prometheus Metrics
+
+Request counts, error counts and latency histograms for the chat backend,
+broken down by served route, by upstream call (host and operation, e.g.
+localhost:3000 / get_checkout) and by LLM tool. Connection pool, cache and
+breaker statistics are read from the components' stats() methods at scrape
+time and exposed as gauges. Served in the Prometheus text format on /metrics.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to a writable
+directory shared by the workers so counters and histograms are aggregated;
+the stats gauges then describe the worker that answered the scrape.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+METRICS_NAMESPACE: str = 'chat_backend'
+PROMETHEUS_MULTIPROC_DIR: Optional[str] = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# Spans fast cache hits up to slow LLM turns and payment completions
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+OUTCOME_OK: str = 'ok'
+OUTCOME_ERROR: str = 'error'
+OUTCOME_TIMEOUT: str = 'timeout'
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+ROUTE_REQUESTS = Counter(
+    'requests_total', 'HTTP requests served, by route, method and status code',
+    ['route', 'method', 'status'], namespace=METRICS_NAMESPACE
+)
+ROUTE_LATENCY = Histogram(
+    'request_duration_seconds', 'Time to serve an HTTP request, by route and method',
+    ['route', 'method'], namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS
+)
+UPSTREAM_REQUESTS = Counter(
+    'upstream_requests_total', 'Outbound requests, by upstream host, operation and outcome',
+    ['upstream', 'operation', 'outcome'], namespace=METRICS_NAMESPACE
+)
+UPSTREAM_LATENCY = Histogram(
+    'upstream_request_duration_seconds', 'Time spent on outbound requests, by upstream host and operation',
+    ['upstream', 'operation'], namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS
+)
+TOOL_CALLS = Counter(
+    'llm_tool_calls_total', 'LLM tool executions, by tool name and outcome',
+    ['tool', 'outcome'], namespace=METRICS_NAMESPACE
+)
+TOOL_LATENCY = Histogram(
+    'llm_tool_duration_seconds', 'Time to execute an LLM tool call, by tool name',
+    ['tool'], namespace=METRICS_NAMESPACE, buckets=LATENCY_BUCKETS
+)
+
+
+# ============================================================================
+# RECORDING HELPERS
+# ============================================================================
+
+class Outcome:
+    """
+    Outcome of a timed operation; the timed block marks it as failed.
+    """
+
+    __slots__ = ('error',)
+
+    def __init__(self) -> None:
+        self.error = False
+
+    def record_status(self, status_code: int) -> None:
+        """
+        Mark the operation failed if the HTTP status code is an error.
+        """
+        self.error = status_code >= 400
+
+
+def observe_route(route: str, method: str, status_code: int, seconds: float) -> None:
+    """
+    Record one served HTTP request.
+
+    Args:
+        route: Route name (the endpoint function's name)
+        method: HTTP method
+        status_code: Response status code
+        seconds: Time taken to serve the request
+    """
+    ROUTE_REQUESTS.labels(route, method, str(status_code)).inc()
+    ROUTE_LATENCY.labels(route, method).observe(seconds)
+
+
+@contextmanager
+def upstream_timer(upstream: str, operation: Optional[str]) -> Iterator[Outcome]:
+    """
+    Time an outbound request; exceptions and outcomes marked as errors count as errors.
+
+    Args:
+        upstream: Upstream host, e.g. "localhost:3000"
+        operation: Operation name, e.g. "get_checkout"
+
+    Yields:
+        Outcome the caller marks as failed when the response is an error
+    """
+    outcome = Outcome()
+    started_at = time.perf_counter()
+    try:
+        yield outcome
+    except BaseException:
+        outcome.error = True
+        raise
+    finally:
+        operation = operation or 'default'
+        UPSTREAM_LATENCY.labels(upstream, operation).observe(time.perf_counter() - started_at)
+        UPSTREAM_REQUESTS.labels(upstream, operation, OUTCOME_ERROR if outcome.error else OUTCOME_OK).inc()
+
+
+@contextmanager
+def tool_timer(tool: str) -> Iterator[Outcome]:
+    """
+    Time an LLM tool execution; exceptions and outcomes marked as errors count as errors.
+
+    Args:
+        tool: Tool name, e.g. "list_products"
+
+    Yields:
+        Outcome the caller marks as failed when the tool result is an error
+    """
+    outcome = Outcome()
+    started_at = time.perf_counter()
+    try:
+        yield outcome
+    except BaseException:
+        outcome.error = True
+        raise
+    finally:
+        TOOL_LATENCY.labels(tool).observe(time.perf_counter() - started_at)
+        TOOL_CALLS.labels(tool, OUTCOME_ERROR if outcome.error else OUTCOME_OK).inc()
+
+
+def record_tool_timeout(tool: str) -> None:
+    """
+    Count a tool call whose result was abandoned because it ran out of time.
+    """
+    TOOL_CALLS.labels(tool, OUTCOME_TIMEOUT).inc()
+
+
+# ============================================================================
+# STATS COLLECTOR
+# ============================================================================
+
+def _metric_name(*parts: str) -> str:
+    return '_'.join(part.strip('_') for part in parts if part).replace('.', '_').replace('-', '_')
+
+
+def _flatten_stats(
+    name: str,
+    stats: Dict[str, Any],
+    labels: Dict[str, str],
+    samples: Dict[str, List[Tuple[Dict[str, str], float]]]
+) -> None:
+    """
+    Turn a stats() dictionary into gauge samples.
+
+    Numbers and booleans become gauges named after their key path. A dictionary
+    whose values are all dictionaries (per host, per endpoint, ...) becomes a
+    "key" label. A string value becomes a label on a gauge of value 1, e.g.
+    state="open".
+    """
+    for key, value in stats.items():
+        metric = _metric_name(name, key)
+        if isinstance(value, (int, float)):
+            samples.setdefault(metric, []).append((labels, float(value)))
+        elif isinstance(value, str):
+            samples.setdefault(metric, []).append(({**labels, key: value}, 1.0))
+        elif isinstance(value, dict):
+            if value and all(isinstance(item, dict) for item in value.values()):
+                for item_key, item in value.items():
+                    _flatten_stats(metric, item, {**labels, 'key': str(item_key)}, samples)
+            else:
+                _flatten_stats(metric, value, labels, samples)
+
+
+class StatsCollector:
+    """
+    Prometheus collector exposing components' stats() dictionaries as gauges.
+    """
+
+    def __init__(self, sources: Dict[str, Callable[[], Optional[Dict[str, Any]]]]) -> None:
+        """
+        Args:
+            sources: Metric name prefix to a function returning stats, or None when disabled
+        """
+        self.sources = sources
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        samples: Dict[str, List[Tuple[Dict[str, str], float]]] = {}
+        for name, source in self.sources.items():
+            stats = source()
+            if stats:
+                _flatten_stats(_metric_name(METRICS_NAMESPACE, name), stats, {}, samples)
+
+        for metric, values in samples.items():
+            label_names = sorted({label for labels, _ in values for label in labels})
+            family = GaugeMetricFamily(metric, f"{metric} from stats()", labels=label_names)
+            for labels, value in values:
+                family.add_metric([labels.get(label, '') for label in label_names], value)
+            yield family
+
+
+_stats_collector: Optional[StatsCollector] = None
+
+
+def register_stats(sources: Dict[str, Callable[[], Optional[Dict[str, Any]]]]) -> None:
+    """
+    Expose components' stats on /metrics; replaces any earlier registration.
+
+    Args:
+        sources: Metric name prefix to a function returning stats, or None when disabled
+    """
+    global _stats_collector
+    if _stats_collector is not None:
+        REGISTRY.unregister(_stats_collector)
+    _stats_collector = StatsCollector(sources)
+    REGISTRY.register(_stats_collector)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format.
+
+    Returns:
+        Tuple of (body, content type)
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    if _stats_collector is not None:
+        registry.register(_stats_collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
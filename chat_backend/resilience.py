@@ -0,0 +1,398 @@
+"""
+Resilience for Seller Backend Calls
+
+Bounded retries with jittered exponential backoff for idempotent requests,
+and a circuit breaker per endpoint that fails fast while the seller backend
+keeps failing. Calls are expected to return the ACP client's result
+dictionaries: an error dictionary whose status code is missing (connection
+error, timeout), 429 or 5xx counts as an upstream failure; anything else,
+including 4xx errors, counts as the upstream being healthy.
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+RESILIENCE_ENABLED: bool = os.getenv('RESILIENCE_ENABLED', 'True').lower() == 'true'
+RETRY_MAX_ATTEMPTS: int = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+RETRY_BASE_DELAY: float = float(os.getenv('RETRY_BASE_DELAY', '0.1'))
+RETRY_MAX_DELAY: float = float(os.getenv('RETRY_MAX_DELAY', '2'))
+BREAKER_FAILURE_THRESHOLD: int = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT: float = float(os.getenv('BREAKER_RESET_TIMEOUT', '30'))
+
+# Breaker states
+BREAKER_CLOSED: str = 'closed'
+BREAKER_OPEN: str = 'open'
+BREAKER_HALF_OPEN: str = 'half_open'
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+CIRCUIT_OPEN_STATUS_CODE: int = 503
+
+Result = Dict[str, Any]
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def endpoint_key(method: str, endpoint: str) -> str:
+    """
+    Name the endpoint a request belongs to, with checkout IDs replaced by a placeholder.
+
+    Args:
+        method: HTTP method
+        endpoint: Request path, e.g. /checkout_sessions/cs_123/cancel
+
+    Returns:
+        Endpoint name, e.g. "POST /checkout_sessions/{id}/cancel"
+    """
+    return f"{method} {re.sub(r'/checkout_sessions/[^/]+', '/checkout_sessions/{id}', endpoint)}"
+
+
+def is_upstream_failure(result: Result) -> bool:
+    """
+    Tell whether a result means the seller backend failed rather than rejected the request.
+
+    Args:
+        result: Response or error dictionary
+
+    Returns:
+        True for connection errors, timeouts, 429 and 5xx responses
+    """
+    if 'error' not in result:
+        return False
+    status_code = result.get('status_code')
+    return status_code is None or status_code in RETRYABLE_STATUS_CODES
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Compute the wait before a retry using exponential backoff with full jitter.
+
+    Args:
+        attempt: Number of attempts made so far (1 for the first retry)
+        base_delay: Delay ceiling for the first retry, in seconds
+        max_delay: Upper bound on the delay ceiling, in seconds
+
+    Returns:
+        Seconds to wait, uniformly drawn between 0 and the ceiling
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def _circuit_open_error(key: str) -> Result:
+    return {
+        'error': f"Circuit open for {key}: seller backend is failing, try again later",
+        'status_code': CIRCUIT_OPEN_STATUS_CODE
+    }
+
+
+# ============================================================================
+# CIRCUIT BREAKER CLASS
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    Thread-safe consecutive-failure circuit breaker.
+
+    Closed: calls pass; failure_threshold consecutive failures open it.
+    Open: calls are rejected until reset_timeout has passed.
+    Half-open: one probe call is let through; its success closes the
+    breaker, its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT
+    ) -> None:
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+        self._opened_total = 0
+        self._rejected_total = 0
+
+    @property
+    def state(self) -> str:
+        """Current state: BREAKER_CLOSED, BREAKER_OPEN or BREAKER_HALF_OPEN"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = BREAKER_HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Ask whether a call may go through now.
+
+        Returns:
+            True if the call may proceed, False if it must fail fast
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == BREAKER_CLOSED:
+                return True
+            if state == BREAKER_HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._rejected_total += 1
+            return False
+
+    def rejects(self) -> bool:
+        """
+        Ask whether a call would fail fast now, without taking the half-open probe slot.
+
+        Returns:
+            True if the breaker is open
+        """
+        with self._lock:
+            if self._current_state() != BREAKER_OPEN:
+                return False
+            self._rejected_total += 1
+            return True
+
+    def record_success(self) -> None:
+        """
+        Record a call that reached a healthy upstream.
+        """
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release(self) -> None:
+        """
+        Give back a half-open probe slot for a call that ended without an outcome.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """
+        Record an upstream failure.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != BREAKER_OPEN:
+                    self._opened_total += 1
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report breaker state and counters.
+
+        Returns:
+            Dictionary of breaker statistics
+        """
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'opened_total': self._opened_total,
+                'rejected_total': self._rejected_total
+            }
+
+
+# ============================================================================
+# RESILIENCE POLICY CLASS
+# ============================================================================
+
+class Resilience:
+    """
+    Retry and circuit breaker policy shared by all calls of one client.
+
+    Each endpoint (see endpoint_key) has its own breaker. Only calls marked
+    idempotent are retried; every call is subject to its endpoint's breaker.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT
+    ) -> None:
+        """
+        Args:
+            max_attempts: Attempts per idempotent call, including the first
+            base_delay: Backoff ceiling for the first retry, in seconds
+            max_delay: Upper bound on the backoff ceiling, in seconds
+            failure_threshold: Consecutive failures that open an endpoint's breaker
+            reset_timeout: Seconds a breaker stays open before a probe is allowed
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._retries_total = 0
+
+    def breaker_for(self, key: str) -> CircuitBreaker:
+        """
+        Return the breaker of an endpoint, creating it on first use.
+        """
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[key] = breaker
+            return breaker
+
+    def check(self, method: str, endpoint: str) -> Optional[Result]:
+        """
+        Fail fast before doing work a call depends on, when its endpoint's breaker is open.
+
+        Args:
+            method: HTTP method, used to pick the breaker
+            endpoint: Request path, used to pick the breaker
+
+        Returns:
+            The error dictionary call() would return, or None if the call may be attempted
+        """
+        key = endpoint_key(method, endpoint)
+        return _circuit_open_error(key) if self.breaker_for(key).rejects() else None
+
+    def _attempt_outcome(self, breaker: CircuitBreaker, result: Result) -> bool:
+        """
+        Record an attempt's result on the breaker.
+
+        Returns:
+            True if the attempt failed upstream and may be retried
+        """
+        if is_upstream_failure(result):
+            breaker.record_failure()
+            return True
+        breaker.record_success()
+        return False
+
+    def _next_delay(self, attempt: int, retry: bool) -> Optional[float]:
+        """
+        Return the backoff before the next attempt, or None if there is none.
+        """
+        if not retry or attempt >= self.max_attempts:
+            return None
+        with self._lock:
+            self._retries_total += 1
+        return backoff_delay(attempt, self.base_delay, self.max_delay)
+
+    def call(self, method: str, endpoint: str, fn: Callable[[], Result], retry: bool = False) -> Result:
+        """
+        Run a blocking call under the endpoint's breaker, retrying upstream failures.
+
+        Args:
+            method: HTTP method, used to pick the breaker
+            endpoint: Request path, used to pick the breaker
+            fn: Zero-argument function performing one attempt
+            retry: Whether the call is idempotent and may be retried
+
+        Returns:
+            The last attempt's result, or an error dictionary with status
+            code 503 if the breaker rejected the call
+        """
+        key = endpoint_key(method, endpoint)
+        breaker = self.breaker_for(key)
+        result: Optional[Result] = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not breaker.allow():
+                return result if result is not None else _circuit_open_error(key)
+
+            try:
+                result = fn()
+            except BaseException:
+                breaker.release()
+                raise
+            if not self._attempt_outcome(breaker, result):
+                return result
+
+            delay = self._next_delay(attempt, retry)
+            if delay is None:
+                return result
+            time.sleep(delay)
+
+        return result
+
+    async def acall(
+        self,
+        method: str,
+        endpoint: str,
+        fn: Callable[[], Awaitable[Result]],
+        retry: bool = False
+    ) -> Result:
+        """
+        Await a call under the endpoint's breaker, retrying upstream failures.
+
+        Same contract as call(), for coroutine functions.
+        """
+        key = endpoint_key(method, endpoint)
+        breaker = self.breaker_for(key)
+        result: Optional[Result] = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not breaker.allow():
+                return result if result is not None else _circuit_open_error(key)
+
+            try:
+                result = await fn()
+            except BaseException:
+                breaker.release()
+                raise
+            if not self._attempt_outcome(breaker, result):
+                return result
+
+            delay = self._next_delay(attempt, retry)
+            if delay is None:
+                return result
+            await asyncio.sleep(delay)
+
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report retry counters and the state of every endpoint's breaker.
+
+        Returns:
+            Dictionary of resilience statistics
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+            retries_total = self._retries_total
+        return {
+            'max_attempts': self.max_attempts,
+            'retries_total': retries_total,
+            'breakers': {key: breaker.stats() for key, breaker in breakers.items()}
+        }
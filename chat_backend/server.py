@@ -6,13 +6,33 @@ Handles product listing, checkout operations, and chat message processing.
 """
 
 import os
-from typing import Dict, Any, Tuple, Optional
-from flask import Flask, request, jsonify, Response
+import time
+from functools import wraps
+from typing import Dict, Any, Tuple, Optional, Callable
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 from dotenv import load_dotenv
 
 from acp_client import ACPClient
-from llm_service import LLMService
+from llm_service import LLMService, format_sse_event
+from concurrency_limiter import LLMOverloaded, OVERLOADED_STATUS_CODE
+from idempotency import (
+    IdempotencyStore,
+    IdempotencyKeyReused,
+    IDEMPOTENCY_ENABLED,
+    IDEMPOTENCY_KEY_HEADER,
+    IDEMPOTENT_REPLAYED_HEADER,
+    request_fingerprint
+)
+from metrics import observe_route, register_stats, render_metrics
+from tracing import (
+    SPAN_SERVER,
+    TRACE_ID_HEADER,
+    TRACEPARENT_HEADER,
+    end_span,
+    start_span,
+    tracing_stats
+)
 
 load_dotenv()
 
@@ -34,6 +54,63 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 
 acp_client = ACPClient()
 llm_service = LLMService(acp_client)
+idempotency_store: Optional[IdempotencyStore] = IdempotencyStore() if IDEMPOTENCY_ENABLED else None
+
+# Component statistics reported on /health and exported as gauges on /metrics
+STATS_SOURCES: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {
+    'transport': acp_client.transport.stats,
+    'catalog_cache': lambda: acp_client.catalog_cache.stats() if acp_client.catalog_cache else None,
+    'single_flight': lambda: acp_client.single_flight.stats() if acp_client.single_flight else None,
+    'spt_prefetch': lambda: acp_client.spt_prefetcher.stats() if acp_client.spt_prefetcher else None,
+    'resilience': lambda: acp_client.resilience.stats() if acp_client.resilience else None,
+    'idempotency': lambda: idempotency_store.stats() if idempotency_store else None,
+    'history': lambda: llm_service.history.stats() if llm_service.history else None,
+    'catalog_encoder': lambda: llm_service.catalog_encoder.stats(),
+    'completion_cache': lambda: llm_service.completion_cache.stats() if llm_service.completion_cache else None,
+    'llm_transport': llm_service.transport.stats,
+    'llm_limiter': lambda: llm_service.limiter.stats() if llm_service.limiter else None,
+    'tracing': tracing_stats
+}
+register_stats(STATS_SOURCES)
+
+
+@app.before_request
+def _start_request_timer() -> None:
+    g.request_started_at = time.perf_counter()
+
+
+@app.before_request
+def _start_request_span() -> None:
+    # Continue the caller's trace from its traceparent header, or start a new one
+    route = request.endpoint or 'unmatched'
+    g.request_span = start_span(
+        f"{request.method} {route}",
+        SPAN_SERVER,
+        traceparent=request.headers.get(TRACEPARENT_HEADER),
+        attributes={'http.method': request.method, 'http.route': route, 'http.path': request.path}
+    )
+
+
+@app.after_request
+def _record_request_metrics(response: Response) -> Response:
+    # Streamed responses are timed until their headers are sent
+    started_at = g.pop('request_started_at', None)
+    if started_at is not None:
+        observe_route(request.endpoint or 'unmatched', request.method, response.status_code,
+                      time.perf_counter() - started_at)
+
+    span = g.get('request_span')
+    if span is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        span.error = response.status_code >= 500
+        response.headers[TRACE_ID_HEADER] = span.trace_id
+    return response
+
+
+@app.teardown_request
+def _end_request_span(error: Optional[BaseException]) -> None:
+    # Runs once a streamed response has been fully sent, so the span covers the whole stream
+    end_span(g.pop('request_span', None), error=error is not None)
 
 
 # ============================================================================
@@ -72,6 +149,67 @@ def _handle_acp_error(result: Dict[str, Any], default_status_code: int = 500) ->
     return jsonify(result), status_code
 
 
+def _handle_overloaded(error: LLMOverloaded) -> Tuple[Response, int]:
+    """
+    Build the response for a chat request shed by the LLM concurrency limiter.
+    
+    Args:
+        error: The rejection raised by the limiter.
+        
+    Returns:
+        A tuple of (JSON response with a Retry-After header, HTTP status code).
+    """
+    response = jsonify({'error': str(error), 'status_code': OVERLOADED_STATUS_CODE})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, OVERLOADED_STATUS_CODE
+
+
+def _idempotent(view: Callable[..., Tuple[Response, int]]) -> Callable[..., Tuple[Response, int]]:
+    """
+    Make a view honour the Idempotency-Key request header.
+    
+    The first request with a key runs the view; duplicates (same path and key)
+    wait for it or get its stored response, marked with Idempotent-Replayed.
+    Requests without the header run the view as usual.
+    
+    Args:
+        view: Flask view function returning (response, status code)
+        
+    Returns:
+        The wrapped view function
+    """
+    @wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Tuple[Response, int]:
+        idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if idempotency_store is None or not idempotency_key:
+            return view(*args, **kwargs)
+        
+        key = f"{request.path}:{idempotency_key}"
+        try:
+            record, owner = idempotency_store.begin(key, request_fingerprint(request.get_json(silent=True)))
+        except IdempotencyKeyReused as e:
+            return jsonify({'error': str(e)}), 422
+        
+        if not owner:
+            stored = idempotency_store.wait(record)
+            if stored is None:
+                return jsonify({'error': f'A request with this {IDEMPOTENCY_KEY_HEADER} is in progress or failed'}), 409
+            body, status_code = stored
+            response = jsonify(body)
+            response.headers[IDEMPOTENT_REPLAYED_HEADER] = 'true'
+            return response, status_code
+        
+        try:
+            response, status_code = view(*args, **kwargs)
+        except BaseException:
+            idempotency_store.abandon(key, record)
+            raise
+        idempotency_store.finish(key, record, response.get_json(), status_code)
+        return response, status_code
+    
+    return wrapper
+
+
 # ============================================================================
 # PRODUCT ENDPOINTS
 # ============================================================================
@@ -92,19 +230,36 @@ def list_products() -> Tuple[Response, int]:
     return jsonify(result), 200
 
 
+@app.route('/products/cache/invalidate', methods=['POST'])
+def invalidate_products_cache() -> Tuple[Response, int]:
+    """
+    Drop the cached product catalog, e.g. after the seller changes it.
+    
+    Returns:
+        JSON response confirming the invalidation.
+    """
+    acp_client.invalidate_catalog_cache()
+    return jsonify({'invalidated': True}), 200
+
+
 # ============================================================================
 # CHECKOUT ENDPOINTS
 # ============================================================================
 
 @app.route('/checkout/create', methods=['POST'])
+@_idempotent
 def create_checkout() -> Tuple[Response, int]:
     """
     Create a new checkout session with specified items.
     
+    Honours the Idempotency-Key header: retries of the same request are answered
+    with the first response instead of being executed again.
+    
     Request body must contain:
         - items: List of items to purchase (required)
         - buyer: Buyer information dictionary (optional)
         - fulfillment_address: Shipping address dictionary (optional)
+        - payment_token: Payment method to prefetch the Shared Payment Token for (optional)
         
     Returns:
         JSON response containing checkout session details, or error response.
@@ -117,7 +272,8 @@ def create_checkout() -> Tuple[Response, int]:
     result = acp_client.create_checkout(
         items=request_data['items'],
         buyer=request_data.get('buyer'),
-        fulfillment_address=request_data.get('fulfillment_address')
+        fulfillment_address=request_data.get('fulfillment_address'),
+        payment_token=request_data.get('payment_token')
     )
     
     if 'error' in result:
@@ -158,6 +314,7 @@ def update_checkout(checkout_id: str) -> Tuple[Response, int]:
         - buyer: Updated buyer information (optional)
         - fulfillment_address: Updated shipping address (optional)
         - fulfillment_option_id: Selected fulfillment option ID (optional)
+        - payment_token: Payment method to prefetch the Shared Payment Token for (optional)
         
     Returns:
         JSON response containing updated checkout session details, or error response.
@@ -169,7 +326,8 @@ def update_checkout(checkout_id: str) -> Tuple[Response, int]:
         items=request_data.get('items'),
         buyer=request_data.get('buyer'),
         fulfillment_address=request_data.get('fulfillment_address'),
-        fulfillment_option_id=request_data.get('fulfillment_option_id')
+        fulfillment_option_id=request_data.get('fulfillment_option_id'),
+        payment_token=request_data.get('payment_token')
     )
     
     if 'error' in result:
@@ -179,10 +337,14 @@ def update_checkout(checkout_id: str) -> Tuple[Response, int]:
 
 
 @app.route('/checkout/<checkout_id>/complete', methods=['POST'])
+@_idempotent
 def complete_checkout(checkout_id: str) -> Tuple[Response, int]:
     """
     Complete a checkout session with payment.
     
+    Honours the Idempotency-Key header: retries of the same request are answered
+    with the first response instead of being executed again.
+    
     Args:
         checkout_id: The unique identifier of the checkout session to complete.
         
@@ -248,7 +410,8 @@ def chat() -> Tuple[Response, int]:
         - messages: List of message dictionaries with 'role' and 'content' fields (required)
         
     Returns:
-        JSON response containing the LLM's response message.
+        JSON response containing the LLM's response message, or a 503 with a
+        Retry-After header when the LLM is at capacity.
     """
     request_data = _validate_request_json()
     
@@ -256,11 +419,83 @@ def chat() -> Tuple[Response, int]:
         return jsonify({'error': 'Messages are required'}), 400
     
     messages = request_data['messages']
-    response = llm_service.process_message(messages)
+    try:
+        response = llm_service.process_message(messages)
+    except LLMOverloaded as error:
+        return _handle_overloaded(error)
     
     return jsonify(response), 200
 
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream() -> Tuple[Response, int]:
+    """
+    Process chat messages through the LLM service, streaming the answer as Server-Sent Events.
+    
+    Request body must contain:
+        - messages: List of message dictionaries with 'role' and 'content' fields (required)
+        
+    Returns:
+        text/event-stream response with 'token', 'tool_call' and a final 'done' event
+        carrying the same message /chat returns, or a 503 like /chat.
+    """
+    request_data = _validate_request_json()
+    
+    if 'messages' not in request_data:
+        return jsonify({'error': 'Messages are required'}), 400
+    
+    messages = request_data['messages']
+    events = llm_service.stream_message(messages)
+    
+    # Wait for the first event so an overloaded LLM is reported with a status code
+    try:
+        first_event = next(events)
+    except LLMOverloaded as error:
+        return _handle_overloaded(error)
+    
+    def generate():
+        yield format_sse_event(*first_event)
+        for event, data in events:
+            yield format_sse_event(event, data)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response, 200
+
+
+# ============================================================================
+# HEALTH ENDPOINTS
+# ============================================================================
+
+@app.route('/health', methods=['GET'])
+def health() -> Tuple[Response, int]:
+    """
+    Health check endpoint exposing outbound connection pool and cache usage.
+    
+    Returns:
+        JSON response with service status, transport and catalog cache statistics.
+    """
+    return jsonify({
+        'status': 'healthy',
+        'service': 'chat-backend',
+        **{name: source() for name, source in STATS_SOURCES.items()}
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics() -> Tuple[Response, int]:
+    """
+    Prometheus metrics: per-route, per-upstream and per-tool counters and
+    latency histograms, plus pool and cache statistics.
+    
+    Returns:
+        Metrics in the Prometheus text exposition format.
+    """
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type), 200
+
+
 # ============================================================================
 # APPLICATION ENTRY POINT
 # ============================================================================
@@ -271,12 +506,16 @@ if __name__ == '__main__':
     print(f"Seller Backend: {acp_client.base_url}")
     print(f"\nAvailable endpoints:")
     print(f"  GET    /products                      - List products")
+    print(f"  POST   /products/cache/invalidate     - Drop cached product catalog")
     print(f"  POST   /checkout/create               - Create checkout")
     print(f"  GET    /checkout/<id>                 - Get checkout")
     print(f"  PUT    /checkout/<id>/update          - Update checkout")
     print(f"  POST   /checkout/<id>/complete        - Complete checkout")
     print(f"  POST   /checkout/<id>/cancel          - Cancel checkout")
     print(f"  POST   /chat                          - Process chat message")
+    print(f"  POST   /chat/stream                   - Process chat message (SSE stream)")
+    print(f"  GET    /health                        - Health check and pool stats")
+    print(f"  GET    /metrics                       - Prometheus metrics")
     print(f"\n")
     
     app.run(host='0.0.0.0', port=CHAT_BACKEND_PORT, debug=DEBUG)
@@ -0,0 +1,166 @@
+"""
+Request Coalescing (Single-Flight)
+
+Lets concurrent callers asking for the same thing share one upstream call.
+The first caller for a key runs the call; callers arriving while it is in
+flight wait for it and receive the same result (or exception). Nothing is
+kept once the call finishes, so errors are never reused by later callers.
+
+Results are shared between callers and must be treated as read-only.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+# ============================================================================
+# THREADED SINGLE-FLIGHT
+# ============================================================================
+
+class _Call:
+    """
+    One in-flight call and the outcome its waiters will receive.
+    """
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Thread-safe single-flight group for blocking calls.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once for all concurrent callers using the same key.
+
+        Args:
+            key: Identity of the call, e.g. (method, endpoint)
+            fn: Zero-argument function performing the call
+
+        Returns:
+            The result of fn, shared by every caller of this flight
+
+        Raises:
+            Exception: Whatever fn raised, re-raised in every caller of this flight
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the flight before releasing waiters so later callers start a new one
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report how many upstream calls ran and how many callers shared one.
+
+        Returns:
+            Dictionary with in-flight, executed and coalesced counts
+        """
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self._executed,
+                'coalesced': self._coalesced
+            }
+
+
+# ============================================================================
+# ASYNCIO SINGLE-FLIGHT
+# ============================================================================
+
+class AsyncSingleFlight:
+    """
+    Single-flight group for coroutines running on one event loop. The call
+    runs as a task of its own, so cancelling any one caller, the first
+    included, never cancels it for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn once for all concurrent callers using the same key.
+
+        Args:
+            key: Identity of the call, e.g. (method, endpoint)
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            The result of fn, shared by every caller of this flight
+
+        Raises:
+            Exception: Whatever fn raised, re-raised in every caller of this flight
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self._coalesced += 1
+        else:
+            # fn runs in its own task, so a caller that is cancelled (a client
+            # disconnect, a wait_for timeout) leaves the flight running for the others
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+            self._calls[key] = task
+            self._executed += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        """
+        Forget a completed flight, marking its outcome as retrieved even when nobody was waiting.
+        """
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report how many upstream calls ran and how many callers shared one.
+
+        Returns:
+            Dictionary with in-flight, executed and coalesced counts
+        """
+        return {
+            'in_flight': len(self._calls),
+            'executed': self._executed,
+            'coalesced': self._coalesced
+        }
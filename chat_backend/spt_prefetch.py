@@ -0,0 +1,293 @@
+"""
+Shared Payment Token Prefetching
+
+Issues the Shared Payment Token for a checkout speculatively, as soon as the
+checkout is ready for payment, instead of after the user clicks pay. Each
+checkout has one slot holding the token (or the in-flight request for it),
+the payment method and total it was issued for, and an expiry. A slot whose
+total or payment method no longer matches is replaced by a fresh issuance;
+completion takes the token out of the slot, so each token is used once.
+
+Completion waits for an in-flight issuance rather than issuing a second
+token beside it; the issue request's own timeout bounds the wait.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from tracing import bind_context
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+SPT_PREFETCH_ENABLED: bool = os.getenv('SPT_PREFETCH_ENABLED', 'False').lower() == 'true'
+SPT_PREFETCH_TTL: float = float(os.getenv('SPT_PREFETCH_TTL', '600'))
+# Optional cap on the seconds completion waits for an in-flight prefetch; past it a
+# token is issued inline and the late prefetched one is counted as abandoned
+SPT_PREFETCH_WAIT: Optional[float] = float(os.getenv('SPT_PREFETCH_WAIT')) if os.getenv('SPT_PREFETCH_WAIT') else None
+SPT_PREFETCH_MAX_SLOTS: int = int(os.getenv('SPT_PREFETCH_MAX_SLOTS', '1000'))
+SPT_PREFETCH_WORKERS: int = int(os.getenv('SPT_PREFETCH_WORKERS', '4'))
+
+
+# ============================================================================
+# SLOT TABLE
+# ============================================================================
+
+class _SPTSlot:
+    """
+    Prefetched token for one checkout: the pending or finished issuance and
+    what it was issued for.
+    """
+
+    __slots__ = ('payment_method', 'total_amount', 'expires_at', 'pending')
+
+    def __init__(self, payment_method: str, total_amount: int, expires_at: float, pending: Any) -> None:
+        self.payment_method = payment_method
+        self.total_amount = total_amount
+        self.expires_at = expires_at
+        self.pending = pending
+
+    def matches(self, payment_method: str, total_amount: int) -> bool:
+        return (
+            self.payment_method == payment_method
+            and self.total_amount == total_amount
+            and time.time() < self.expires_at
+        )
+
+
+class _SPTSlotTable:
+    """
+    Thread-safe, size-bounded table of prefetch slots keyed by checkout ID.
+    Subclasses decide how an issuance is started and awaited.
+    """
+
+    def __init__(self, ttl: float, max_slots: int) -> None:
+        self.ttl = ttl
+        self.max_slots = max_slots
+
+        self._lock = threading.Lock()
+        self._slots: 'OrderedDict[str, _SPTSlot]' = OrderedDict()
+
+        self._issued = 0
+        self._reissued = 0
+        self._used = 0
+        self._missed = 0
+        self._abandoned = 0
+
+    def _start(self, payment_method: str, total_amount: int) -> Any:
+        raise NotImplementedError
+
+    def prefetch(self, checkout_id: str, payment_method: str, total_amount: int) -> None:
+        """
+        Make sure a token for this payment method and total is issued or being issued.
+
+        Args:
+            checkout_id: ID of the checkout session
+            payment_method: Payment method the token is issued for
+            total_amount: Checkout total, used as the token's max amount
+        """
+        with self._lock:
+            slot = self._slots.get(checkout_id)
+            if slot is not None and slot.matches(payment_method, total_amount):
+                return
+
+            if slot is not None:
+                self._reissued += 1
+            self._issued += 1
+
+            self._slots[checkout_id] = _SPTSlot(
+                payment_method,
+                total_amount,
+                time.time() + self.ttl,
+                self._start(payment_method, total_amount)
+            )
+            self._slots.move_to_end(checkout_id)
+
+            while len(self._slots) > self.max_slots:
+                self._slots.popitem(last=False)
+
+    def payment_method_for(self, checkout_id: str) -> Optional[str]:
+        """
+        Return the payment method of the checkout's slot, or None if it has none.
+        """
+        with self._lock:
+            slot = self._slots.get(checkout_id)
+            return slot.payment_method if slot is not None else None
+
+    def discard(self, checkout_id: str) -> None:
+        """
+        Drop the checkout's slot, e.g. when it is no longer ready for payment.
+        """
+        with self._lock:
+            self._slots.pop(checkout_id, None)
+
+    def _pop_matching(self, checkout_id: str, payment_method: str, total_amount: int) -> Optional[_SPTSlot]:
+        """
+        Remove the checkout's slot and return it if it matches the payment.
+        """
+        with self._lock:
+            slot = self._slots.pop(checkout_id, None)
+            if slot is None or not slot.matches(payment_method, total_amount):
+                self._missed += 1
+                return None
+            self._used += 1
+            return slot
+
+    def _abandon(self, pending: Any) -> None:
+        """
+        Count the token of an issuance completion stopped waiting for, once it
+        is issued: it is never used and expires on the token server.
+        """
+        def count(done: Any) -> None:
+            if not done.cancelled() and done.exception() is None:
+                with self._lock:
+                    self._abandoned += 1
+
+        pending.add_done_callback(count)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report slot usage counters.
+
+        Returns:
+            Dictionary of prefetch statistics
+        """
+        with self._lock:
+            return {
+                'slots': len(self._slots),
+                'issued': self._issued,
+                'reissued': self._reissued,
+                'used': self._used,
+                'missed': self._missed,
+                'abandoned': self._abandoned
+            }
+
+
+# ============================================================================
+# PREFETCHER CLASSES
+# ============================================================================
+
+class SPTPrefetcher(_SPTSlotTable):
+    """
+    Prefetcher for blocking clients; issuance runs on a small thread pool.
+    """
+
+    def __init__(
+        self,
+        issue: Callable[[str, int], str],
+        ttl: float = SPT_PREFETCH_TTL,
+        max_slots: int = SPT_PREFETCH_MAX_SLOTS,
+        workers: int = SPT_PREFETCH_WORKERS
+    ) -> None:
+        """
+        Args:
+            issue: Function issuing a token for (payment_method, total_amount) and returning its ID
+            ttl: Seconds a prefetched token may be used
+            max_slots: Maximum number of checkouts holding a slot
+            workers: Threads issuing tokens in the background
+        """
+        super().__init__(ttl, max_slots)
+        self._issue = issue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='spt-prefetch')
+
+    def _start(self, payment_method: str, total_amount: int) -> Future:
+        return self._executor.submit(bind_context(self._issue), payment_method, total_amount)
+
+    def take(
+        self,
+        checkout_id: str,
+        payment_method: str,
+        total_amount: int,
+        wait: Optional[float] = SPT_PREFETCH_WAIT
+    ) -> Optional[str]:
+        """
+        Take the prefetched token for a payment, waiting if it is still being issued.
+
+        Args:
+            checkout_id: ID of the checkout session
+            payment_method: Payment method being charged
+            total_amount: Amount being charged
+            wait: Most seconds to wait for an in-flight issuance, or None to wait
+                until it finishes
+
+        Returns:
+            The token ID, or None if there is no usable token and one must be issued now
+        """
+        slot = self._pop_matching(checkout_id, payment_method, total_amount)
+        if slot is None:
+            return None
+
+        try:
+            return slot.pending.result(timeout=wait)
+        except FutureTimeoutError:
+            self._abandon(slot.pending)
+            print(f"SPT prefetch for {checkout_id} still in flight after {wait}s; issuing inline")
+            return None
+        except Exception as e:
+            print(f"SPT prefetch for {checkout_id} unusable: {e}")
+            return None
+
+
+class AsyncSPTPrefetcher(_SPTSlotTable):
+    """
+    Prefetcher for asyncio clients; issuance runs as event loop tasks.
+    """
+
+    def __init__(
+        self,
+        issue: Callable[[str, int], Awaitable[str]],
+        ttl: float = SPT_PREFETCH_TTL,
+        max_slots: int = SPT_PREFETCH_MAX_SLOTS
+    ) -> None:
+        """
+        Args:
+            issue: Coroutine function issuing a token for (payment_method, total_amount)
+            ttl: Seconds a prefetched token may be used
+            max_slots: Maximum number of checkouts holding a slot
+        """
+        super().__init__(ttl, max_slots)
+        self._issue = issue
+
+    def _start(self, payment_method: str, total_amount: int) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._issue(payment_method, total_amount))
+        # Mark failures as retrieved; take() falls back to issuing inline
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def take(
+        self,
+        checkout_id: str,
+        payment_method: str,
+        total_amount: int,
+        wait: Optional[float] = SPT_PREFETCH_WAIT
+    ) -> Optional[str]:
+        """
+        Take the prefetched token for a payment, waiting if it is still being issued.
+
+        Returns:
+            The token ID, or None if there is no usable token and one must be issued now
+        """
+        slot = self._pop_matching(checkout_id, payment_method, total_amount)
+        if slot is None:
+            return None
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(slot.pending), timeout=wait)
+        except asyncio.TimeoutError:
+            self._abandon(slot.pending)
+            print(f"SPT prefetch for {checkout_id} still in flight after {wait}s; issuing inline")
+            return None
+        except Exception as e:
+            print(f"SPT prefetch for {checkout_id} unusable: {e!r}")
+            return None
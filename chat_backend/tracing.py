@@ -0,0 +1,381 @@
+"""
+Request Tracing
+
+End-to-end tracing for chat and checkout requests. A trace ID is taken from
+the incoming W3C traceparent header (or generated) when a request enters the
+chat backend, carried in a context variable through the LLM tool loop and the
+ACP client, and forwarded as a traceparent header on every outbound request,
+so the seller backend and the mock SPT server can log the same ID.
+
+Each timed step is a span (trace ID, span ID, parent span ID, name, start
+time, duration, attributes). Finished spans are appended to a JSON-lines
+file at TRACE_EXPORT_PATH, one object per line, so the waterfall of a single
+slow request can be rebuilt offline by grouping on trace_id and ordering by
+start time. Without TRACE_EXPORT_PATH, IDs are still propagated but no spans
+are written.
+"""
+
+import contextvars
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+TRACING_ENABLED: bool = os.getenv('TRACING_ENABLED', 'True').lower() == 'true'
+TRACE_EXPORT_PATH: Optional[str] = os.getenv('TRACE_EXPORT_PATH') or None
+TRACE_SERVICE_NAME: str = os.getenv('TRACE_SERVICE_NAME', 'chat_backend')
+
+TRACEPARENT_HEADER: str = 'traceparent'
+TRACE_ID_HEADER: str = 'X-Trace-Id'
+
+# Span kinds
+SPAN_SERVER: str = 'server'
+SPAN_CLIENT: str = 'client'
+SPAN_INTERNAL: str = 'internal'
+
+# version-trace_id-parent_id-flags, see https://www.w3.org/TR/trace-context/
+_TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+_INVALID_TRACE_ID = '0' * 32
+_INVALID_SPAN_ID = '0' * 16
+
+T = TypeVar('T')
+
+
+# ============================================================================
+# TRACE CONTEXT
+# ============================================================================
+
+class Span:
+    """
+    One timed step of a trace.
+    """
+
+    __slots__ = (
+        'trace_id', 'span_id', 'parent_id', 'name', 'kind',
+        'start_time', 'duration_ms', 'attributes', 'error', '_started_at', '_token'
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        kind: str = SPAN_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_time = time.time()
+        self.duration_ms: Optional[float] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.error = False
+        self._started_at = time.perf_counter()
+        self._token: Optional[contextvars.Token] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """
+        Attach a key/value attribute to the span.
+        """
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        """
+        Record the span's duration.
+        """
+        self.duration_ms = round((time.perf_counter() - self._started_at) * 1000, 3)
+
+    @property
+    def traceparent(self) -> str:
+        """traceparent header value naming this span as the parent"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the span for export.
+        """
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'service': TRACE_SERVICE_NAME,
+            'name': self.name,
+            'kind': self.kind,
+            'start_time': self.start_time,
+            'duration_ms': self.duration_ms,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+_current_span: 'contextvars.ContextVar[Optional[Span]]' = contextvars.ContextVar(
+    'current_span', default=None
+)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Parse a W3C traceparent header.
+
+    Args:
+        value: Header value, or None
+
+    Returns:
+        Dictionary with trace_id and parent_id, or None if the header is
+        missing or malformed
+    """
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if match is None:
+        return None
+    trace_id, parent_id, _ = match.groups()
+    if trace_id == _INVALID_TRACE_ID or parent_id == _INVALID_SPAN_ID:
+        return None
+    return {'trace_id': trace_id, 'parent_id': parent_id}
+
+
+def current_span() -> Optional[Span]:
+    """
+    Return the span active in the current context, or None.
+    """
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """
+    Return the trace ID active in the current context, or None.
+    """
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+def inject(headers: Dict[str, str]) -> Dict[str, str]:
+    """
+    Add the traceparent header for the current span to outbound request headers.
+
+    Args:
+        headers: Header dictionary, modified in place
+
+    Returns:
+        The same header dictionary
+    """
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent
+    return headers
+
+
+def bind_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Bind a function to a copy of the current context, so it runs inside the
+    caller's trace when handed to a thread pool.
+
+    Args:
+        fn: Function to run later, possibly on another thread
+
+    Returns:
+        Function that runs fn in the copied context
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+# ============================================================================
+# EXPORTER
+# ============================================================================
+
+class JsonLinesExporter:
+    """
+    Thread-safe exporter appending finished spans to a JSON-lines file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: File to append spans to; created if missing
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', buffering=1, encoding='utf-8')
+        self._exported = 0
+
+    def export(self, span: Span) -> None:
+        """
+        Write one finished span.
+        """
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._exported += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report how many spans were written.
+        """
+        with self._lock:
+            return {'exported': self._exported}
+
+    def close(self) -> None:
+        """
+        Close the export file.
+        """
+        with self._lock:
+            self._file.close()
+
+
+exporter: Optional[JsonLinesExporter] = (
+    JsonLinesExporter(TRACE_EXPORT_PATH) if TRACING_ENABLED and TRACE_EXPORT_PATH else None
+)
+
+
+# ============================================================================
+# SPANS
+# ============================================================================
+
+def start_span(
+    name: str,
+    kind: str = SPAN_INTERNAL,
+    traceparent: Optional[str] = None,
+    attributes: Optional[Dict[str, Any]] = None
+) -> Optional[Span]:
+    """
+    Start a span and make it current; pair with end_span().
+
+    The span is a child of the current span. Without one, it continues the
+    trace named by traceparent, or starts a new trace.
+
+    Args:
+        name: Span name, e.g. "POST /checkout/{id}/complete"
+        kind: SPAN_SERVER, SPAN_CLIENT or SPAN_INTERNAL
+        traceparent: Incoming traceparent header, for server spans
+        attributes: Initial span attributes
+
+    Returns:
+        The span, or None when tracing is disabled
+    """
+    if not TRACING_ENABLED:
+        return None
+
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        incoming = parse_traceparent(traceparent)
+        if incoming is not None:
+            trace_id, parent_id = incoming['trace_id'], incoming['parent_id']
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+
+    span = Span(name, trace_id, parent_id, kind, attributes)
+    span._token = _current_span.set(span)
+    return span
+
+
+def end_span(span: Optional[Span], error: bool = False) -> None:
+    """
+    End a span started with start_span(), restore its parent and export it.
+
+    Args:
+        span: Span returned by start_span(), or None
+        error: Whether the step failed
+    """
+    if span is None:
+        return
+
+    span.end()
+    span.error = span.error or error
+    if span._token is not None:
+        try:
+            _current_span.reset(span._token)
+        except ValueError:
+            # Ended from a different context (e.g. a streamed response); nothing to restore
+            pass
+    if exporter is not None:
+        exporter.export(span)
+
+
+@contextmanager
+def span(
+    name: str,
+    kind: str = SPAN_INTERNAL,
+    attributes: Optional[Dict[str, Any]] = None
+) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a child span of the current span.
+
+    Args:
+        name: Span name, e.g. "issue_spt"
+        kind: SPAN_CLIENT for outbound requests, SPAN_INTERNAL otherwise
+        attributes: Initial span attributes
+
+    Yields:
+        The span, or None when tracing is disabled
+    """
+    active = start_span(name, kind, attributes=attributes)
+    try:
+        yield active
+    except BaseException:
+        end_span(active, error=True)
+        raise
+    end_span(active)
+
+
+@contextmanager
+def client_span(
+    operation: Optional[str],
+    method: str,
+    url: str,
+    headers: Dict[str, str]
+) -> Iterator[Optional[Span]]:
+    """
+    Time an outbound HTTP request and add its traceparent header.
+
+    Args:
+        operation: Operation name, e.g. "get_checkout"
+        method: HTTP method
+        url: Request URL
+        headers: Outbound request headers, modified in place
+
+    Yields:
+        The span, or None when tracing is disabled; set http.status_code on it
+    """
+    with span(
+        operation or f"{method} {url}",
+        SPAN_CLIENT,
+        {'http.method': method, 'http.url': url}
+    ) as active:
+        inject(headers)
+        yield active
+
+
+def record_status(active: Optional[Span], status_code: int) -> None:
+    """
+    Record an HTTP response status on a span; 4xx and 5xx mark it as failed.
+    """
+    if active is None:
+        return
+    active.set_attribute('http.status_code', status_code)
+    active.error = status_code >= 400
+
+
+def tracing_stats() -> Optional[Dict[str, Any]]:
+    """
+    Report exporter statistics, or None when no spans are exported.
+    """
+    return exporter.stats() if exporter is not None else None
@@ -464,7 +464,10 @@ async function selectInitialShipping(optionId) {
         const response = await fetch(`${API_BASE_URL}/checkout/${state.currentCheckout.id}/update`, {
             method: 'PUT',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ fulfillment_option_id: optionId })
+            body: JSON.stringify({
+                fulfillment_option_id: optionId,
+                payment_token: DEFAULT_PAYMENT_METHOD.payment_method
+            })
         });
 
         const updatedCheckout = await response.json();
@@ -538,7 +541,11 @@ async function completeOrder() {
         
         const response = await fetch(`${API_BASE_URL}/checkout/${state.currentCheckout.id}/complete`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: {
+                'Content-Type': 'application/json',
+                // A checkout is paid once: repeated clicks replay the first result
+                'Idempotency-Key': `complete-${state.currentCheckout.id}`
+            },
             body: JSON.stringify(paymentData)
         });
         
@@ -968,7 +975,10 @@ async function updateShippingOption(optionId) {
         const response = await fetch(`${API_BASE_URL}/checkout/${state.currentCheckout.id}/update`, {
             method: 'PUT',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ fulfillment_option_id: optionId })
+            body: JSON.stringify({
+                fulfillment_option_id: optionId,
+                payment_token: DEFAULT_PAYMENT_METHOD.payment_method
+            })
         });
 
         const updatedCheckout = await response.json();
@@ -1205,7 +1215,10 @@ async function selectModalShipping(optionId) {
         const response = await fetch(`${API_BASE_URL}/checkout/${state.currentCheckout.id}/update`, {
             method: 'PUT',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ fulfillment_option_id: optionId })
+            body: JSON.stringify({
+                fulfillment_option_id: optionId,
+                payment_token: DEFAULT_PAYMENT_METHOD.payment_method
+            })
         });
 
         const updatedCheckout = await response.json();
@@ -1324,7 +1337,11 @@ async function completeModalCheckout() {
         
         const response = await fetch(`${API_BASE_URL}/checkout/${state.currentCheckout.id}/complete`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: {
+                'Content-Type': 'application/json',
+                // A checkout is paid once: repeated clicks replay the first result
+                'Idempotency-Key': `complete-${state.currentCheckout.id}`
+            },
             body: JSON.stringify(paymentData)
         });
         
@@ -0,0 +1,514 @@
+"""
+Mock LLM Server
+OpenAI-compatible chat completions stand-in for offline load testing of the chat backend
+"""
+
+from flask import Flask, Response, jsonify, request, g, stream_with_context
+from flask_cors import CORS
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import json
+import os
+import random
+import re
+import secrets
+import time
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+PORT = int(os.getenv('MOCK_LLM_PORT', '8002'))
+DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+MODEL_NAME = os.getenv('MOCK_LLM_MODEL', 'mock-llm')
+
+# Leave unset to accept any bearer token
+API_KEY = os.getenv('MOCK_LLM_API_KEY') or None
+
+# Time to first token, as "<distribution>:<parameters>" in seconds (see _parse_latency)
+LATENCY = os.getenv('MOCK_LLM_LATENCY', 'lognormal:0.4,0.5')
+# Generation time per completion token (streamed content word or tool call chunk)
+TOKEN_DELAY = float(os.getenv('MOCK_LLM_TOKEN_DELAY', '0.02'))
+# Fraction of completions answered with a 503, to exercise the backend's error paths
+ERROR_RATE = float(os.getenv('MOCK_LLM_ERROR_RATE', '0'))
+# Seed for reproducible latencies and errors; leave unset for a random run
+SEED = os.getenv('MOCK_LLM_SEED')
+
+# Per-request latency override, same format as MOCK_LLM_LATENCY
+LATENCY_HEADER = 'X-Mock-Latency'
+CHARS_PER_TOKEN = 4
+
+# Scripted intents, matched against the last user message
+PRODUCTS_RE = re.compile(r'\b(drinks?|menu|products?|catalog|for sale|what do you have)\b', re.IGNORECASE)
+ADD_TO_CART_RE = re.compile(r'\b(add|buy|order|want|take)\b', re.IGNORECASE)
+START_CHECKOUT_RE = re.compile(r'\bcheck ?out\b', re.IGNORECASE)
+ITEM_ID_RE = re.compile(r'\bitem_\d+\b')
+CHECKOUT_ID_RE = re.compile(r'\bcheckout_[0-9a-z_]+\b')
+PAYMENT_TOKEN_RE = re.compile(r'\b(?:pm|spt)_[0-9A-Za-z_]+\b')
+
+# ============================================================================
+# APPLICATION SETUP
+# ============================================================================
+
+app = Flask(__name__)
+CORS(app)
+
+_random = random.Random(SEED)
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter(
+    'mock_llm_requests_total', 'HTTP requests served, by route, method and status code',
+    ['route', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'mock_llm_request_duration_seconds', 'Time to serve an HTTP request, by route and method',
+    ['route', 'method'], buckets=LATENCY_BUCKETS
+)
+COMPLETIONS = Counter(
+    'mock_llm_completions_total', 'Completions served, by scripted action and streaming mode',
+    ['action', 'stream']
+)
+
+
+@app.before_request
+def _start_request_timer() -> None:
+    g.request_started_at = time.perf_counter()
+
+
+@app.after_request
+def _record_request_metrics(response: Response) -> Response:
+    # Streamed responses are timed to their headers, like any WSGI response
+    started_at = g.pop('request_started_at', None)
+    if started_at is not None:
+        route = request.endpoint or 'unmatched'
+        REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(route, request.method).observe(time.perf_counter() - started_at)
+    return response
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def _parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Parses a latency distribution setting into a sampler.
+
+    Supported forms, in seconds:
+        - fixed:<seconds>
+        - uniform:<low>,<high>
+        - normal:<mean>,<stddev>
+        - lognormal:<median>,<sigma>
+        - exponential:<mean>
+
+    Args:
+        spec: The distribution setting
+
+    Returns:
+        A function returning one non-negative latency sample per call
+
+    Raises:
+        ValueError: If the setting cannot be parsed
+    """
+    name, _, raw_parameters = spec.strip().partition(':')
+    try:
+        parameters = [float(value) for value in raw_parameters.split(',') if value.strip()]
+    except ValueError:
+        raise ValueError(f"Invalid latency setting: {spec}") from None
+
+    samplers = {
+        ('fixed', 1): lambda: parameters[0],
+        ('uniform', 2): lambda: _random.uniform(parameters[0], parameters[1]),
+        ('normal', 2): lambda: _random.gauss(parameters[0], parameters[1]),
+        ('lognormal', 2): lambda: parameters[0] * _random.lognormvariate(0, parameters[1]),
+        ('exponential', 1): lambda: _random.expovariate(1 / parameters[0]) if parameters[0] > 0 else 0.0
+    }
+    sampler = samplers.get((name.lower(), len(parameters)))
+    if sampler is None:
+        raise ValueError(f"Invalid latency setting: {spec}")
+    return lambda: max(0.0, sampler())
+
+
+def _create_error_response(error_type: str, message: str, status_code: int) -> tuple[Response, int]:
+    """
+    Creates an error response in OpenAI API format.
+
+    Args:
+        error_type: The type of error (e.g., 'invalid_request_error')
+        message: Human-readable error message
+        status_code: HTTP status code to return
+
+    Returns:
+        A tuple containing the JSON response and status code
+    """
+    return jsonify({'error': {'type': error_type, 'message': message}}), status_code
+
+
+def _tool_call(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds an assistant tool call.
+
+    Args:
+        name: Name of the tool to call
+        arguments: Tool arguments
+
+    Returns:
+        Tool call in OpenAI format
+    """
+    return {
+        'id': f"call_{secrets.token_hex(8)}",
+        'type': 'function',
+        'function': {'name': name, 'arguments': json.dumps(arguments)}
+    }
+
+
+def _catalog_from_history(messages: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Reads product ids and names from the latest list_products result in the conversation.
+
+    Understands the chat backend's table encoding ("id|name|...") and JSON with a
+    'products' list.
+
+    Args:
+        messages: Conversation history
+
+    Returns:
+        Dictionary of product name to product id
+    """
+    for message in reversed(messages):
+        if message.get('role') != 'tool' or message.get('name') != 'list_products':
+            continue
+        content = message.get('content') or ''
+        try:
+            products = json.loads(content).get('products') or []
+            return {str(product.get('name', '')): product['id'] for product in products if 'id' in product}
+        except (ValueError, AttributeError):
+            rows = [line.split('|') for line in content.split('\n') if '|' in line]
+            if rows and rows[0][:2] == ['id', 'name']:
+                return {row[1]: row[0] for row in rows[1:] if len(row) > 1}
+    return {}
+
+
+def _find_item_id(text: str, messages: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Finds the product a user message refers to, by id or by a name from the catalog.
+
+    Args:
+        text: The user message
+        messages: Conversation history
+
+    Returns:
+        The product id, or None if no product is mentioned
+    """
+    match = ITEM_ID_RE.search(text)
+    if match:
+        return match.group(0)
+    lowered = text.lower()
+    for name, item_id in _catalog_from_history(messages).items():
+        if name and name.lower() in lowered:
+            return item_id
+    return None
+
+
+def _describe_tool_results(messages: List[Dict[str, Any]]) -> str:
+    """
+    Writes the follow-up answer for the tool results at the end of the conversation.
+
+    Args:
+        messages: Conversation history ending with tool results
+
+    Returns:
+        Assistant text
+    """
+    tool_messages = []
+    for message in reversed(messages):
+        if message.get('role') != 'tool':
+            break
+        tool_messages.insert(0, message)
+
+    sentences = []
+    for message in tool_messages:
+        name = message.get('name')
+        content = message.get('content') or ''
+        if 'error' in content.lower():
+            sentences.append(f"Sorry, {name} did not work out this time.")
+        elif name == 'list_products':
+            names = list(_catalog_from_history([message]))
+            sentences.append(f"Here is what we have: {', '.join(names) or 'nothing right now'}.")
+        elif name == 'add_to_cart':
+            sentences.append("I've added that to your cart.")
+        elif name == 'start_checkout':
+            sentences.append("Your checkout is ready, please confirm the payment.")
+        elif name == 'complete_checkout':
+            sentences.append("Your payment went through and your order is confirmed.")
+        else:
+            sentences.append("Done.")
+    return ' '.join(sentences)
+
+
+def _scripted_reply(messages: List[Dict[str, Any]], tool_names: List[str]) -> Dict[str, Any]:
+    """
+    Picks the assistant message for a conversation.
+
+    After tool results, the reply describes them. Otherwise the last user message
+    is matched against the scripted intents, most specific first, and only tools
+    offered in the request are called:
+        - a checkout id and a payment token -> complete_checkout
+        - "add"/"buy"/... and a product id or name -> add_to_cart
+        - "checkout" -> start_checkout
+        - "drinks"/"menu"/... -> list_products
+    Anything else gets a plain text answer.
+
+    Args:
+        messages: Conversation history
+        tool_names: Names of the tools offered in the request
+
+    Returns:
+        Assistant message in OpenAI format
+    """
+    if messages and messages[-1].get('role') == 'tool':
+        return {'role': 'assistant', 'content': _describe_tool_results(messages)}
+
+    text = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+    tool_call = None
+
+    checkout_id = CHECKOUT_ID_RE.search(text)
+    payment_token = PAYMENT_TOKEN_RE.search(text)
+    item_id = _find_item_id(text, messages) if ADD_TO_CART_RE.search(text) else None
+
+    if checkout_id and payment_token and 'complete_checkout' in tool_names:
+        tool_call = _tool_call('complete_checkout', {
+            'checkout_id': checkout_id.group(0),
+            'payment_token': payment_token.group(0)
+        })
+    elif item_id and 'add_to_cart' in tool_names:
+        tool_call = _tool_call('add_to_cart', {'item_id': item_id})
+    elif START_CHECKOUT_RE.search(text) and 'start_checkout' in tool_names:
+        tool_call = _tool_call('start_checkout', {})
+    elif PRODUCTS_RE.search(text) and 'list_products' in tool_names:
+        tool_call = _tool_call('list_products', {})
+
+    if tool_call is not None:
+        return {'role': 'assistant', 'content': None, 'tool_calls': [tool_call]}
+    return {
+        'role': 'assistant',
+        'content': "I'm the mock assistant. Ask me which drinks we have, or to add one to your cart."
+    }
+
+
+def _reply_action(message: Dict[str, Any]) -> str:
+    """
+    Names the scripted action a reply performs, for metrics.
+    """
+    if message.get('tool_calls'):
+        return message['tool_calls'][0]['function']['name']
+    return 'text'
+
+
+def _content_chunks(content: Optional[str]) -> List[str]:
+    """
+    Splits assistant text into streamed chunks, one word each.
+    """
+    if not content:
+        return []
+    words = content.split(' ')
+    return [word + ' ' for word in words[:-1]] + [words[-1]]
+
+
+def _arguments_chunks(arguments: str, size: int = 8) -> List[str]:
+    """
+    Splits tool call arguments into streamed chunks.
+    """
+    return [arguments[index:index + size] for index in range(0, len(arguments), size)] or ['']
+
+
+def _usage(messages: List[Dict[str, Any]], completion_tokens: int) -> Dict[str, int]:
+    """
+    Estimates token usage at roughly four characters per token.
+    """
+    prompt_tokens = sum(len(json.dumps(message)) for message in messages) // CHARS_PER_TOKEN
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens
+    }
+
+
+def _completion_tokens(message: Dict[str, Any]) -> int:
+    """
+    Counts the completion tokens of a reply: content words plus tool call chunks.
+    """
+    tokens = len(_content_chunks(message.get('content')))
+    for tool_call in message.get('tool_calls') or []:
+        tokens += 1 + len(_arguments_chunks(tool_call['function']['arguments']))
+    return tokens
+
+
+def _stream_chunks(completion_id: str, message: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the chat.completion.chunk deltas of a reply, ending with the finish reason.
+    """
+    base = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': MODEL_NAME}
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        return {**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+    yield chunk({'role': 'assistant', 'content': ''})
+    for content in _content_chunks(message.get('content')):
+        yield chunk({'content': content})
+    for index, tool_call in enumerate(message.get('tool_calls') or []):
+        yield chunk({'tool_calls': [{
+            'index': index,
+            'id': tool_call['id'],
+            'type': 'function',
+            'function': {'name': tool_call['function']['name'], 'arguments': ''}
+        }]})
+        for arguments in _arguments_chunks(tool_call['function']['arguments']):
+            yield chunk({'tool_calls': [{'index': index, 'function': {'arguments': arguments}}]})
+    yield chunk({}, 'tool_calls' if message.get('tool_calls') else 'stop')
+
+
+default_latency = _parse_latency(LATENCY)
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions() -> tuple[Response, int]:
+    """
+    Answers a chat completion request with a scripted reply.
+
+    Expected JSON body (OpenAI format):
+        - messages: Required. Conversation history
+        - tools: Optional. Tools the model may call; only these are scripted
+        - stream: Optional. Stream the reply as Server-Sent Events
+
+    The reply is delayed by a time to first token sampled from MOCK_LLM_LATENCY
+    (or the X-Mock-Latency header), plus MOCK_LLM_TOKEN_DELAY per completion token.
+
+    Returns:
+        JSON completion, an event stream of completion chunks, or an error response
+    """
+    # Step 1: Authenticate and validate the request
+    if API_KEY and request.headers.get('Authorization') != f"Bearer {API_KEY}":
+        return _create_error_response('invalid_request_error', 'Invalid API key', 401)
+
+    body = request.get_json(silent=True) or {}
+    messages = body.get('messages')
+    if not isinstance(messages, list) or not messages:
+        return _create_error_response('invalid_request_error', 'messages is required', 400)
+
+    try:
+        sample_latency = _parse_latency(request.headers[LATENCY_HEADER]) if LATENCY_HEADER in request.headers \
+            else default_latency
+    except ValueError as error:
+        return _create_error_response('invalid_request_error', str(error), 400)
+
+    # Step 2: Wait for the first token, failing the configured share of requests
+    time.sleep(sample_latency())
+    if ERROR_RATE and _random.random() < ERROR_RATE:
+        return _create_error_response('server_error', 'The mock model is overloaded', 503)
+
+    # Step 3: Script the reply
+    tool_names = [tool.get('function', {}).get('name') for tool in body.get('tools') or []]
+    message = _scripted_reply(messages, tool_names)
+    completion_tokens = _completion_tokens(message)
+    completion_id = f"chatcmpl-{secrets.token_hex(12)}"
+    stream = bool(body.get('stream'))
+    COMPLETIONS.labels(_reply_action(message), str(stream).lower()).inc()
+
+    # Step 4: Stream the reply chunk by chunk...
+    if stream:
+        def generate() -> Iterator[str]:
+            for index, chunk in enumerate(_stream_chunks(completion_id, message)):
+                if index > 0:
+                    time.sleep(TOKEN_DELAY)
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        response = Response(stream_with_context(generate()), content_type='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response, 200
+
+    # Step 5: ...or return it once fully generated
+    time.sleep(TOKEN_DELAY * completion_tokens)
+    return jsonify({
+        'id': completion_id,
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': MODEL_NAME,
+        'choices': [{
+            'index': 0,
+            'message': message,
+            'finish_reason': 'tool_calls' if message.get('tool_calls') else 'stop'
+        }],
+        'usage': _usage(messages, completion_tokens)
+    }), 200
+
+
+@app.route('/v1/models', methods=['GET'])
+def models() -> tuple[Response, int]:
+    """
+    Lists the single mock model.
+
+    Returns:
+        JSON model list in OpenAI format
+    """
+    return jsonify({
+        'object': 'list',
+        'data': [{'id': MODEL_NAME, 'object': 'model', 'owned_by': 'mock'}]
+    }), 200
+
+
+@app.route('/health', methods=['GET'])
+def health() -> tuple[Response, int]:
+    """
+    Health check endpoint to verify the service is running.
+
+    Returns:
+        JSON response with service status and latency settings
+    """
+    return jsonify({
+        'status': 'healthy',
+        'service': 'mock-llm',
+        'latency': LATENCY,
+        'token_delay': TOKEN_DELAY,
+        'error_rate': ERROR_RATE
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics() -> tuple[Response, int]:
+    """
+    Prometheus metrics endpoint.
+
+    Returns:
+        Request counters, latency histograms and completion counters in the
+        Prometheus text exposition format
+    """
+    return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST), 200
+
+# ============================================================================
+# APPLICATION ENTRY POINT
+# ============================================================================
+
+if __name__ == '__main__':
+    # Step 1: Display startup information
+    print("\nMock LLM Server Starting...")
+    print(f"Port: {PORT}")
+    print(f"Base URL: http://localhost:{PORT}")
+    print(f"Latency: {LATENCY} to first token, {TOKEN_DELAY}s per token, error rate {ERROR_RATE}")
+    print("\nAvailable endpoints:")
+    print("  POST   /v1/chat/completions - Chat completion (streaming supported)")
+    print("  GET    /v1/models           - List models")
+    print("  GET    /health              - Health check")
+    print("  GET    /metrics             - Prometheus metrics")
+    print("\n")
+
+    # Step 2: Start the Flask application, one thread per request
+    app.run(host='0.0.0.0', port=PORT, debug=DEBUG, threaded=True)
@@ -0,0 +1,65 @@
+"""
+Gunicorn configuration for the mock SPT server in production mode:
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Runs MOCK_SPT_WORKERS processes (default: CPU count) of MOCK_SPT_THREADS
+threads each, without the Flask debugger and reloader. Workers are separate
+processes, so with more than one they share tokens through the SQLite token
+store, and Prometheus metrics through a multiprocess directory.
+"""
+
+import os
+import shutil
+import tempfile
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+PORT = int(os.getenv('MOCK_STRIPE_SPT_PORT', '8001'))
+WORKERS = int(os.getenv('MOCK_SPT_WORKERS', str(os.cpu_count() or 1)))
+THREADS = int(os.getenv('MOCK_SPT_THREADS', '4'))
+
+# ============================================================================
+# SHARED STATE
+# ============================================================================
+
+# Tokens issued by one worker must be found by the others
+os.environ.setdefault('MOCK_SPT_STORE_BACKEND', 'sqlite' if WORKERS > 1 else 'memory')
+if WORKERS > 1 and os.environ['MOCK_SPT_STORE_BACKEND'] != 'sqlite':
+    raise SystemExit('MOCK_SPT_STORE_BACKEND must be sqlite when running more than one worker')
+
+# Removed on exit when created here
+_metrics_dir = None
+if WORKERS > 1 and not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    _metrics_dir = tempfile.mkdtemp(prefix='mock-spt-metrics-')
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = _metrics_dir
+
+# Per-token logging serializes workers on stdout
+os.environ.setdefault('MOCK_SPT_LOG_TOKENS', 'False')
+
+# ============================================================================
+# SERVER SETTINGS
+# ============================================================================
+
+bind = f"0.0.0.0:{PORT}"
+workers = WORKERS
+threads = THREADS
+worker_class = 'gthread'
+keepalive = 5
+# Workers import the app after forking, so each starts its own sweeper and writer threads
+preload_app = False
+
+
+def child_exit(server, worker) -> None:
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        # Imported here: prometheus_client picks its multiprocess mode when first
+        # imported, which must happen after PROMETHEUS_MULTIPROC_DIR is set
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server) -> None:
+    if _metrics_dir:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
@@ -1,23 +1,48 @@
 """
 Mock Stripe Shared Payment Token Server
 Simulates Stripe's SPT API for European demo purposes
+
+Development:  python server.py
+Production:   gunicorn -c gunicorn.conf.py server:app
 """
 
-from flask import Flask, Response, jsonify, request
+from flask import Flask, Response, jsonify, request, g
 from flask_cors import CORS
-from typing import Dict, Any, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from typing import Dict, Any, Iterator, List, Optional
+import json
+import re
 import secrets
+import threading
 import time
 import os
 
+from token_store import STATUS_EXPIRED, TokenRecord, create_token_store
+
 # ============================================================================
 # CONSTANTS
 # ============================================================================
 
 PORT = int(os.getenv('MOCK_STRIPE_SPT_PORT', '8001'))
+# Flask debugger and reloader for `python server.py`
+DEBUG = os.getenv('MOCK_SPT_DEBUG', 'False').lower() == 'true'
+# Print every issued and retrieved token
+LOG_TOKENS = os.getenv('MOCK_SPT_LOG_TOKENS', 'True').lower() == 'true'
+# Set by gunicorn.conf.py when running several workers, so their metrics are aggregated
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
 DEFAULT_CURRENCY = 'usd'
 SPT_ID_PREFIX = 'spt_'
 SPT_ID_LENGTH = 12
+# Most tokens issued or looked up by one batch request
+MAX_BATCH_SIZE = int(os.getenv('MOCK_SPT_MAX_BATCH', '1000'))
+
+# Spans are appended as JSON lines; leave unset to only log trace IDs
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH') or None
+TRACE_SERVICE_NAME = 'mock_stripe_spt'
+TRACE_ID_HEADER = 'X-Trace-Id'
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
 
 # ============================================================================
 # APPLICATION SETUP
@@ -30,9 +55,103 @@ CORS(app)
 # DATA STORAGE
 # ============================================================================
 
-# In-memory storage for Shared Payment Tokens
-# Format: {spt_id: {payment_method, usage_limits, created_at, metadata}}
-spt_storage: Dict[str, Dict[str, Any]] = {}
+# Storage for Shared Payment Tokens (in memory, or SQLite with MOCK_SPT_STORE_BACKEND=sqlite),
+# swept of expired tokens in the background
+# Format: {spt_id: TokenRecord(payment_method, usage limits, seller details, created_at, status, trace_id)}
+spt_storage = create_token_store(on_remove=lambda reason, count: TOKENS_REMOVED.labels(reason).inc(count))
+spt_storage.start_sweeper()
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REQUESTS = Counter(
+    'mock_spt_requests_total', 'HTTP requests served, by route, method and status code',
+    ['route', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'mock_spt_request_duration_seconds', 'Time to serve an HTTP request, by route and method',
+    ['route', 'method'], buckets=LATENCY_BUCKETS
+)
+TOKENS_REMOVED = Counter(
+    'mock_spt_tokens_removed_total', 'Shared Payment Tokens removed from the store, by reason (expired or evicted)',
+    ['reason']
+)
+
+
+class TokenStoreCollector:
+    """
+    Token gauges read from the store at scrape time, so they are also correct
+    when several workers share an SQLite store.
+    """
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        stats = spt_storage.stats()
+        yield GaugeMetricFamily(
+            'mock_spt_tokens_stored', 'Shared Payment Tokens stored, expired ones included', value=stats['stored']
+        )
+        yield GaugeMetricFamily(
+            'mock_spt_tokens_active', 'Shared Payment Tokens stored that have not expired', value=stats['active']
+        )
+
+
+TOKEN_STORE_COLLECTOR = TokenStoreCollector()
+REGISTRY.register(TOKEN_STORE_COLLECTOR)
+
+
+@app.before_request
+def _start_request_timer() -> None:
+    g.request_started_at = time.perf_counter()
+
+
+@app.after_request
+def _record_request_metrics(response: Response) -> Response:
+    started_at = g.pop('request_started_at', None)
+    if started_at is not None:
+        route = request.endpoint or 'unmatched'
+        REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(route, request.method).observe(time.perf_counter() - started_at)
+    return response
+
+# ============================================================================
+# TRACING
+# ============================================================================
+
+_trace_export_lock = threading.Lock()
+
+
+@app.before_request
+def _start_request_span() -> None:
+    # Join the caller's trace from its W3C traceparent header, or start a new one
+    match = TRACEPARENT_RE.match(request.headers.get('traceparent', '').strip().lower())
+    g.trace_id = match.group(1) if match else secrets.token_hex(16)
+    g.parent_span_id = match.group(2) if match else None
+    g.span_id = secrets.token_hex(8)
+    g.span_started_at = (time.time(), time.perf_counter())
+
+
+@app.after_request
+def _export_request_span(response: Response) -> Response:
+    response.headers[TRACE_ID_HEADER] = g.trace_id
+    if TRACE_EXPORT_PATH:
+        start_time, started_at = g.span_started_at
+        line = json.dumps({
+            'trace_id': g.trace_id,
+            'span_id': g.span_id,
+            'parent_id': g.parent_span_id,
+            'service': TRACE_SERVICE_NAME,
+            'name': f"{request.method} {request.endpoint or 'unmatched'}",
+            'kind': 'server',
+            'start_time': start_time,
+            'duration_ms': round((time.perf_counter() - started_at) * 1000, 3),
+            'error': response.status_code >= 500,
+            'attributes': {'http.path': request.path, 'http.status_code': response.status_code}
+        })
+        with _trace_export_lock, open(TRACE_EXPORT_PATH, 'a', encoding='utf-8') as export_file:
+            export_file.write(line + '\n')
+    return response
 
 # ============================================================================
 # HELPER FUNCTIONS
@@ -156,9 +275,10 @@ def _is_token_expired(expires_at: Optional[int]) -> bool:
 
 
 def _store_spt(spt_id: str, payment_method: str, currency: str, max_amount: Optional[int], 
-                expires_at: Optional[int], network_id: Optional[str], external_id: Optional[str]) -> None:
+                expires_at: Optional[int], network_id: Optional[str], external_id: Optional[str],
+                trace_id: Optional[str] = None) -> None:
     """
-    Stores a Shared Payment Token in memory.
+    Stores a new, active Shared Payment Token, indexed by its expiration.
     
     Args:
         spt_id: Unique identifier for the token
@@ -168,21 +288,97 @@ def _store_spt(spt_id: str, payment_method: str, currency: str, max_amount: Opti
         expires_at: Expiration timestamp, or None
         network_id: Seller network identifier, or None
         external_id: Seller external identifier, or None
+        trace_id: Trace ID of the request that issued the token, or None
     """
-    spt_storage[spt_id] = {
+    spt_storage.put(TokenRecord(
+        spt_id=spt_id,
+        payment_method=payment_method,
+        currency=currency,
+        max_amount=max_amount,
+        expires_at=expires_at,
+        network_id=network_id,
+        external_id=external_id,
+        created_at=int(time.time()),
+        trace_id=trace_id
+    ))
+
+
+def _read_batch(key: str) -> List[Any]:
+    """
+    Reads the list of items of a batch request from its JSON body.
+    
+    Args:
+        key: Name of the list in the request body (e.g., 'tokens')
+        
+    Returns:
+        The items of the batch
+        
+    Raises:
+        ValueError: If the list is missing, empty or longer than MAX_BATCH_SIZE
+    """
+    body = request.get_json(silent=True)
+    items = body.get(key) if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError(f'{key} must be a non-empty list')
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f'{key} holds {len(items)} items; at most {MAX_BATCH_SIZE} are allowed per request')
+    return items
+
+
+def _build_spt_record(request_data: Dict[str, Any], trace_id: str) -> TokenRecord:
+    """
+    Builds a new, active token from the parameters of one issue request.
+    
+    Args:
+        request_data: Parameters in the form data format of create_spt
+        trace_id: Trace ID of the request that issues the token
+        
+    Returns:
+        The token, with a newly generated ID
+        
+    Raises:
+        ValueError: If payment_method is missing or an amount or timestamp is not an integer
+    """
+    parameters = _extract_request_parameters(request_data)
+    _validate_payment_method(parameters['payment_method'])
+    return TokenRecord(
+        spt_id=_generate_spt_id(),
+        payment_method=parameters['payment_method'],
+        currency=parameters['currency'] or DEFAULT_CURRENCY,
+        max_amount=_parse_amount(parameters['max_amount']),
+        expires_at=_parse_timestamp(parameters['expires_at']),
+        network_id=parameters['network_id'],
+        external_id=parameters['external_id'],
+        created_at=int(time.time()),
+        trace_id=trace_id
+    )
+
+
+def _issued_token(spt_id: str) -> Dict[str, Any]:
+    """
+    Builds the API representation of a newly issued token.
+    """
+    return {
         'id': spt_id,
-        'payment_method': payment_method,
-        'usage_limits': {
-            'currency': currency,
-            'max_amount': max_amount,
-            'expires_at': expires_at
-        },
-        'seller_details': {
-            'network_id': network_id,
-            'external_id': external_id
-        },
-        'created_at': int(time.time()),
-        'status': 'active'
+        'object': 'shared_payment.issued_token',
+        'created': int(time.time()),
+        'livemode': False
+    }
+
+
+def _granted_token(spt_data: TokenRecord) -> Dict[str, Any]:
+    """
+    Builds the API representation of a stored token, as returned to sellers.
+    """
+    return {
+        'id': spt_data.id,
+        'object': 'shared_payment.granted_token',
+        'payment_method': spt_data.payment_method,
+        'usage_limits': spt_data.usage_limits(),
+        'seller_details': spt_data.seller_details(),
+        'created': spt_data.created_at,
+        'status': spt_data.status,
+        'livemode': False
     }
 
 # ============================================================================
@@ -228,11 +424,29 @@ def index():
                 <p>Retrieve payment method details for an SPT</p>
             </div>
             
+            <div class="endpoint">
+                <span class="method post">POST</span>
+                <code>/v1/shared_payment/issued_tokens/batch</code>
+                <p>Create up to MOCK_SPT_MAX_BATCH SPTs in one request</p>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method post">POST</span>
+                <code>/v1/shared_payment/granted_tokens/batch</code>
+                <p>Retrieve details for many SPTs by ID, without marking them used</p>
+            </div>
+            
             <div class="endpoint">
                 <span class="method get">GET</span>
                 <code>/health</code>
                 <p>Health check endpoint</p>
             </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/metrics</code>
+                <p>Prometheus metrics</p>
+            </div>
         </div>
     </body>
     </html>
@@ -291,19 +505,60 @@ def create_spt() -> tuple[Response, int]:
         max_amount=max_amount,
         expires_at=expires_at,
         network_id=network_id,
-        external_id=external_id
+        external_id=external_id,
+        trace_id=g.trace_id
     )
     
-    print(f"Created SPT: {spt_id}")
-    print(f"  Payment Method: {parameters['payment_method']}")
-    print(f"  Max Amount: {max_amount} {currency}")
+    if LOG_TOKENS:
+        print(f"Created SPT: {spt_id} (trace {g.trace_id})")
+        print(f"  Payment Method: {parameters['payment_method']}")
+        print(f"  Max Amount: {max_amount} {currency}")
     
     # Step 6: Return success response
+    return jsonify(_issued_token(spt_id)), 201
+
+
+@app.route('/v1/shared_payment/issued_tokens/batch', methods=['POST'])
+def create_spt_batch() -> tuple[Response, int]:
+    """
+    Creates several Shared Payment Tokens in one request.
+    
+    Used to pre-provision tokens, e.g. for load tests. Either every token is
+    created or, if one is invalid, none is.
+    
+    Expected JSON body:
+        - tokens: Required. List of at most MOCK_SPT_MAX_BATCH objects holding
+          the form fields of create_spt (payment_method, usage_limits[currency], ...)
+        
+    Returns:
+        JSON list of the created tokens, in request order, or an error response
+    """
+    # Step 1: Read the batch
+    try:
+        tokens = _read_batch('tokens')
+    except ValueError as error:
+        return _create_error_response('invalid_request', 'invalid_batch', str(error), 400)
+    
+    # Step 2: Validate and build every token before storing any
+    records = []
+    for index, request_data in enumerate(tokens):
+        try:
+            if not isinstance(request_data, dict):
+                raise ValueError('each token must be an object')
+            records.append(_build_spt_record(request_data, g.trace_id))
+        except ValueError as error:
+            return _create_error_response('invalid_request', 'invalid_token', f'tokens[{index}]: {error}', 400)
+    
+    # Step 3: Store the tokens together
+    spt_storage.put_many(records)
+    
+    if LOG_TOKENS:
+        print(f"Created {len(records)} SPTs (trace {g.trace_id})")
+    
+    # Step 4: Return success response
     return jsonify({
-        'id': spt_id,
-        'object': 'shared_payment.issued_token',
-        'created': int(time.time()),
-        'livemode': False
+        'object': 'list',
+        'data': [_issued_token(record.id) for record in records]
     }), 201
 
 
@@ -313,7 +568,8 @@ def get_spt(spt_id: str) -> tuple[Response, int]:
     Retrieves details for an existing Shared Payment Token.
     
     This endpoint is called by the Seller Backend to retrieve token information
-    for payment processing.
+    for payment processing. The first retrieval marks the token as used; later
+    ones still succeed, so a seller can retry a failed payment.
     
     Args:
         spt_id: The identifier of the token to retrieve
@@ -321,8 +577,9 @@ def get_spt(spt_id: str) -> tuple[Response, int]:
     Returns:
         JSON response with token details, or an error response if not found or expired
     """
-    # Step 1: Check if token exists
-    if spt_id not in spt_storage:
+    # Step 1: Retrieve token data, checking that the token exists
+    spt_data = spt_storage.get(spt_id)
+    if spt_data is None:
         return _create_error_response(
             'invalid_request',
             'spt_not_found',
@@ -330,12 +587,8 @@ def get_spt(spt_id: str) -> tuple[Response, int]:
             404
         )
     
-    # Step 2: Retrieve token data
-    spt_data = spt_storage[spt_id]
-    
-    # Step 3: Check if token has expired
-    expires_at = spt_data['usage_limits']['expires_at']
-    if _is_token_expired(expires_at):
+    # Step 2: Check if token has expired
+    if spt_data.status == STATUS_EXPIRED or _is_token_expired(spt_data.expires_at):
         return _create_error_response(
             'invalid_request',
             'spt_expired',
@@ -343,19 +596,69 @@ def get_spt(spt_id: str) -> tuple[Response, int]:
             400
         )
     
-    print(f"Retrieved SPT: {spt_id}")
-    print(f"  Payment Method: {spt_data['payment_method']}")
+    # Step 3: Mark the token as used (None if it was removed in the meantime)
+    spt_data = spt_storage.mark_used(spt_id) or spt_data
+    
+    if LOG_TOKENS:
+        print(f"Retrieved SPT: {spt_id} (trace {g.trace_id}, issued in trace {spt_data.trace_id})")
+        print(f"  Payment Method: {spt_data.payment_method}")
+    
+    # Step 4: Return token details
+    return jsonify(_granted_token(spt_data)), 200
+
+
+@app.route('/v1/shared_payment/granted_tokens/batch', methods=['POST'])
+def get_spt_batch() -> tuple[Response, int]:
+    """
+    Retrieves details for many Shared Payment Tokens in one request.
+    
+    Used to reconcile orders against their tokens. Unlike a single retrieval,
+    it does not mark tokens as used, so reading them changes nothing.
+    
+    Expected JSON body:
+        - ids: Required. List of at most MOCK_SPT_MAX_BATCH token identifiers
+        
+    Returns:
+        JSON list of the found tokens in request order, with an error per
+        token that is unknown or expired, or an error response
+    """
+    # Step 1: Read the batch
+    try:
+        spt_ids = _read_batch('ids')
+    except ValueError as error:
+        return _create_error_response('invalid_request', 'invalid_batch', str(error), 400)
+    spt_ids = [str(spt_id) for spt_id in spt_ids]
+    
+    # Step 2: Retrieve the tokens together
+    found = spt_storage.get_many(spt_ids)
+    
+    # Step 3: Split them into details and per-token errors, as a single retrieval would answer
+    data, errors = [], []
+    for spt_id in spt_ids:
+        spt_data = found.get(spt_id)
+        if spt_data is None:
+            errors.append({'id': spt_id, 'error': {
+                'type': 'invalid_request',
+                'code': 'spt_not_found',
+                'message': f'Shared payment token {spt_id} not found'
+            }})
+        elif spt_data.status == STATUS_EXPIRED or _is_token_expired(spt_data.expires_at):
+            errors.append({'id': spt_id, 'error': {
+                'type': 'invalid_request',
+                'code': 'spt_expired',
+                'message': 'Shared payment token has expired'
+            }})
+        else:
+            data.append(_granted_token(spt_data))
+    
+    if LOG_TOKENS:
+        print(f"Retrieved {len(data)} of {len(spt_ids)} SPTs (trace {g.trace_id})")
     
     # Step 4: Return token details
     return jsonify({
-        'id': spt_id,
-        'object': 'shared_payment.granted_token',
-        'payment_method': spt_data['payment_method'],
-        'usage_limits': spt_data['usage_limits'],
-        'seller_details': spt_data['seller_details'],
-        'created': spt_data['created_at'],
-        'status': spt_data['status'],
-        'livemode': False
+        'object': 'list',
+        'data': data,
+        'errors': errors
     }), 200
 
 
@@ -365,14 +668,34 @@ def health() -> tuple[Response, int]:
     Health check endpoint to verify the service is running.
     
     Returns:
-        JSON response with service status and active token count
+        JSON response with service status, active token count and token store statistics
     """
+    token_stats = spt_storage.stats()
     return jsonify({
         'status': 'healthy',
         'service': 'mock-stripe-spt',
-        'active_tokens': len(spt_storage)
+        'active_tokens': token_stats['active'],
+        'token_store': token_stats
     }), 200
 
+
+@app.route('/metrics', methods=['GET'])
+def metrics() -> tuple[Response, int]:
+    """
+    Prometheus metrics endpoint.
+    
+    Returns:
+        Request counters, latency histograms and the stored token count in
+        the Prometheus text exposition format, aggregated across workers
+    """
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST), 200
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    registry.register(TOKEN_STORE_COLLECTOR)
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST), 200
+
 # ============================================================================
 # APPLICATION ENTRY POINT
 # ============================================================================
@@ -382,11 +705,16 @@ if __name__ == '__main__':
     print("\nMock Stripe SPT Server Starting...")
     print(f"Port: {PORT}")
     print(f"Base URL: http://localhost:{PORT}")
+    print(f"Token store: {spt_storage.backend}")
     print("\nAvailable endpoints:")
     print("  POST   /v1/shared_payment/issued_tokens    - Create SPT")
     print("  GET    /v1/shared_payment/granted_tokens/<id> - Retrieve SPT")
+    print("  POST   /v1/shared_payment/issued_tokens/batch  - Create SPTs in bulk")
+    print("  POST   /v1/shared_payment/granted_tokens/batch - Retrieve SPTs in bulk")
     print("  GET    /health                             - Health check")
+    print("  GET    /metrics                            - Prometheus metrics")
+    print("\nDevelopment server; use gunicorn -c gunicorn.conf.py server:app for load tests")
     print("\n")
     
     # Step 2: Start the Flask application
-    app.run(host='0.0.0.0', port=PORT, debug=True)
+    app.run(host='0.0.0.0', port=PORT, debug=DEBUG, threaded=True)
@@ -0,0 +1,746 @@
+"""
+Shared Payment Token Store
+
+Holds issued tokens in memory with an expiry index, so memory stays flat
+however long the server runs. A min-heap on `expires_at` lets a background
+sweeper find due tokens without scanning the store. Each pass removes them
+in small batches and releases the lock between batches, so lookups are never
+stalled behind a large sweep.
+
+The store is split into shards by token ID, each with its own lock, index
+and share of the size ceiling, so concurrent issues and lookups rarely wait
+on each other. Tokens are compact slot records. A token is `active` when
+issued, `used` once the seller has retrieved it, and `expired` once past
+`expires_at`; transitions happen under the shard lock and only move forward.
+
+An expired token is kept for a retention period so lookups can still answer
+"expired" rather than "not found", then removed. The store holds at most
+`max_tokens` tokens. At the ceiling, an issue evicts the token that expired
+first, or else the oldest issued one.
+
+Tokens live in a pluggable backend: the sharded in-memory store (default),
+or an SQLite file in WAL mode that worker processes share and that survives
+restarts. Its issues are group-committed, and its sweeps and ceiling run
+as batched SQL statements on indexes.
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# ============================================================================
+# CONSTANTS
+# ============================================================================
+
+SPT_STORE_BACKEND = os.getenv('MOCK_SPT_STORE_BACKEND', 'memory').lower()
+SPT_STORE_PATH = os.getenv('MOCK_SPT_STORE_PATH', 'spt_tokens.sqlite3')
+SPT_MAX_TOKENS = int(os.getenv('MOCK_SPT_MAX_TOKENS', '100000'))
+SPT_STORE_SHARDS = int(os.getenv('MOCK_SPT_STORE_SHARDS', '16'))
+# Seconds an expired token is still reported as expired before it is removed
+SPT_EXPIRED_RETENTION = float(os.getenv('MOCK_SPT_EXPIRED_RETENTION', '300'))
+SPT_SWEEP_INTERVAL = float(os.getenv('MOCK_SPT_SWEEP_INTERVAL', '1'))
+SPT_SWEEP_BATCH = int(os.getenv('MOCK_SPT_SWEEP_BATCH', '1000'))
+# Group commit of the SQLite backend: seconds to wait for more issues, and most tokens per transaction
+SPT_COMMIT_DELAY = float(os.getenv('MOCK_SPT_COMMIT_DELAY', '0'))
+SPT_COMMIT_BATCH = int(os.getenv('MOCK_SPT_COMMIT_BATCH', '256'))
+
+# Backends
+BACKEND_MEMORY = 'memory'
+BACKEND_SQLITE = 'sqlite'
+
+# Token states
+STATUS_ACTIVE = 'active'
+STATUS_USED = 'used'
+STATUS_EXPIRED = 'expired'
+# Allowed transitions: a token only moves forward
+TRANSITIONS = {
+    STATUS_ACTIVE: (STATUS_USED, STATUS_EXPIRED),
+    STATUS_USED: (STATUS_EXPIRED,),
+    STATUS_EXPIRED: ()
+}
+
+# Reasons a token leaves the store
+REMOVED_EXPIRED = 'expired'
+REMOVED_EVICTED = 'evicted'
+
+# The expiry heap is rebuilt once stale entries outnumber live ones by this factor
+HEAP_COMPACTION_FACTOR = 2
+
+SQLITE_BUSY_TIMEOUT = 5
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+# Most IDs bound to one batch lookup statement, below SQLite's host parameter limit
+SQLITE_LOOKUP_CHUNK = 500
+# Columns in TokenRecord constructor order
+SQLITE_COLUMN_NAMES = (
+    'id', 'payment_method', 'currency', 'max_amount', 'expires_at',
+    'network_id', 'external_id', 'created_at', 'trace_id', 'status'
+)
+SQLITE_COLUMNS = ', '.join(SQLITE_COLUMN_NAMES)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    id TEXT PRIMARY KEY,
+    payment_method TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    max_amount INTEGER,
+    expires_at INTEGER,
+    network_id TEXT,
+    external_id TEXT,
+    created_at INTEGER NOT NULL,
+    trace_id TEXT,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tokens_expires_at ON tokens (expires_at) WHERE expires_at IS NOT NULL;
+-- Tokens still to be marked expired, so each sweep only visits newly due tokens
+CREATE INDEX IF NOT EXISTS tokens_unexpired ON tokens (expires_at)
+    WHERE expires_at IS NOT NULL AND status != 'expired';
+"""
+
+# ============================================================================
+# TOKEN RECORD CLASS
+# ============================================================================
+
+class TokenRecord:
+    """
+    One Shared Payment Token. Fields are slots rather than nested dicts, so a
+    token costs one small object; the API shape is built when it is returned.
+    """
+
+    __slots__ = (
+        'id', 'payment_method', 'currency', 'max_amount', 'expires_at',
+        'network_id', 'external_id', 'created_at', 'status', 'trace_id'
+    )
+
+    def __init__(
+        self,
+        spt_id: str,
+        payment_method: str,
+        currency: str,
+        max_amount: Optional[int],
+        expires_at: Optional[int],
+        network_id: Optional[str],
+        external_id: Optional[str],
+        created_at: int,
+        trace_id: Optional[str] = None,
+        status: str = STATUS_ACTIVE
+    ) -> None:
+        self.id = spt_id
+        self.payment_method = payment_method
+        self.currency = currency
+        self.max_amount = max_amount
+        self.expires_at = expires_at
+        self.network_id = network_id
+        self.external_id = external_id
+        self.created_at = created_at
+        self.status = status
+        self.trace_id = trace_id
+
+    def usage_limits(self) -> Dict[str, Any]:
+        return {'currency': self.currency, 'max_amount': self.max_amount, 'expires_at': self.expires_at}
+
+    def seller_details(self) -> Dict[str, Any]:
+        return {'network_id': self.network_id, 'external_id': self.external_id}
+
+# ============================================================================
+# SHARD CLASS
+# ============================================================================
+
+class _Shard:
+    """
+    One lock-protected slice of the store with its own expiry index.
+    """
+
+    def __init__(self, max_tokens: int) -> None:
+        self.max_tokens = max_tokens
+        self.lock = threading.Lock()
+        # spt_id -> record, in issue order
+        self.tokens: 'OrderedDict[str, TokenRecord]' = OrderedDict()
+        # (expires_at, spt_id) of tokens that have not expired yet
+        self.expiry_heap: List[Tuple[int, str]] = []
+        # (expires_at, spt_id) of expired tokens still retained, oldest first
+        self.expired: Deque[Tuple[int, str]] = deque()
+        self.counts = {status: 0 for status in TRANSITIONS}
+
+    def put(self, record: TokenRecord, sweep_batch: int) -> int:
+        """Store a token, evicting as needed; returns the number of tokens evicted"""
+        with self.lock:
+            evicted = 0
+            while len(self.tokens) >= self.max_tokens:
+                self._evict_one()
+                evicted += 1
+            self.tokens[record.id] = record
+            self.counts[record.status] += 1
+            if record.expires_at is not None:
+                heapq.heappush(self.expiry_heap, (record.expires_at, record.id))
+            if len(self.expiry_heap) > HEAP_COMPACTION_FACTOR * len(self.tokens) + sweep_batch:
+                self._compact_heap()
+            return evicted
+
+    def transition(self, spt_id: str, status: str) -> Optional[TokenRecord]:
+        """Move a token to a later state if allowed; returns the token, or None if unknown"""
+        with self.lock:
+            record = self.tokens.get(spt_id)
+            if record is not None:
+                self._set_status(record, status)
+            return record
+
+    def sweep(self, now: float, expired_before: float, batch: int) -> Tuple[int, int]:
+        """Mark and remove up to one batch of tokens; returns (marked, removed)"""
+        with self.lock:
+            marked = 0
+            while self.expiry_heap and marked < batch and self.expiry_heap[0][0] < now:
+                expires_at, spt_id = heapq.heappop(self.expiry_heap)
+                marked += 1
+                record = self.tokens.get(spt_id)
+                # Tokens evicted before expiring leave stale heap entries
+                if record is not None:
+                    self._set_status(record, STATUS_EXPIRED)
+                    self.expired.append((expires_at, spt_id))
+
+            removed = 0
+            while self.expired and removed < batch and self.expired[0][0] < expired_before:
+                _, spt_id = self.expired.popleft()
+                self._remove(spt_id)
+                removed += 1
+            return marked, removed
+
+    def snapshot(self, now: float) -> Dict[str, int]:
+        """
+        Number of tokens per state, with those past their expiry but not yet
+        swept counted as expired. Read-only: walks only the due part of the heap.
+        """
+        with self.lock:
+            counts = dict(self.counts)
+            seen = set()
+            stack = [0] if self.expiry_heap else []
+            while stack:
+                index = stack.pop()
+                expires_at, spt_id = self.expiry_heap[index]
+                if expires_at >= now:
+                    # Every entry below this one in the heap is due later
+                    continue
+                record = self.tokens.get(spt_id)
+                if record is not None and record.status != STATUS_EXPIRED and spt_id not in seen:
+                    seen.add(spt_id)
+                    counts[record.status] -= 1
+                    counts[STATUS_EXPIRED] += 1
+                stack.extend(child for child in (2 * index + 1, 2 * index + 2) if child < len(self.expiry_heap))
+            return counts
+
+    def clear(self) -> None:
+        with self.lock:
+            self.tokens.clear()
+            self.expiry_heap.clear()
+            self.expired.clear()
+            self.counts = {status: 0 for status in TRANSITIONS}
+
+    def _set_status(self, record: TokenRecord, status: str) -> None:
+        if status in TRANSITIONS[record.status]:
+            self.counts[record.status] -= 1
+            self.counts[status] += 1
+            record.status = status
+
+    def _remove(self, spt_id: str) -> None:
+        record = self.tokens.pop(spt_id)
+        self.counts[record.status] -= 1
+
+    def _evict_one(self) -> None:
+        """Remove the token that expired first, or else the oldest issued one"""
+        if self.expired:
+            _, spt_id = self.expired.popleft()
+            self._remove(spt_id)
+        else:
+            _, record = self.tokens.popitem(last=False)
+            self.counts[record.status] -= 1
+
+    def _compact_heap(self) -> None:
+        """Rebuild the expiry heap without the entries of evicted tokens"""
+        self.expiry_heap = [entry for entry in self.expiry_heap if entry[1] in self.tokens]
+        heapq.heapify(self.expiry_heap)
+
+# ============================================================================
+# TOKEN STORE CLASSES
+# ============================================================================
+
+class _SweptStore:
+    """
+    Background sweeping, removal notifications and statistics shared by the
+    store backends. Subclasses implement sweep() and counts().
+    """
+
+    backend = ''
+
+    def __init__(
+        self,
+        max_tokens: int,
+        expired_retention: float,
+        sweep_interval: float,
+        sweep_batch: int,
+        on_remove: Optional[Callable[[str, int], None]],
+        clock: Callable[[], float]
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.expired_retention = expired_retention
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._on_remove = on_remove
+        self._clock = clock
+        self._removed_lock = threading.Lock()
+        self._removed = {REMOVED_EXPIRED: 0, REMOVED_EVICTED: 0}
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def sweep(self) -> int:
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def active_count(self) -> int:
+        """Number of stored tokens that have not expired"""
+        counts = self.counts()
+        return counts[STATUS_ACTIVE] + counts[STATUS_USED]
+
+    def stats(self) -> Dict[str, Any]:
+        counts = self.counts()
+        with self._removed_lock:
+            removed = dict(self._removed)
+        return {
+            'backend': self.backend,
+            'stored': sum(counts.values()),
+            'active': counts[STATUS_ACTIVE] + counts[STATUS_USED],
+            'unused': counts[STATUS_ACTIVE],
+            'used': counts[STATUS_USED],
+            'expired_retained': counts[STATUS_EXPIRED],
+            'max_tokens': self.max_tokens,
+            'removed_expired': removed[REMOVED_EXPIRED],
+            'removed_evicted': removed[REMOVED_EVICTED]
+        }
+
+    def start_sweeper(self) -> None:
+        """Start sweeping every `sweep_interval` seconds in a daemon thread"""
+        if self._sweeper is not None:
+            return
+        self._sweeper = threading.Thread(target=self._sweep_loop, name='spt-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+        self._stop.clear()
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as error:
+                print(f"SPT sweep failed: {error}")
+
+    def _notify(self, reason: str, count: int) -> None:
+        if not count:
+            return
+        with self._removed_lock:
+            self._removed[reason] += count
+        if self._on_remove is not None:
+            self._on_remove(reason, count)
+
+
+class TokenStore(_SweptStore):
+    """
+    Thread-safe, sharded in-memory token store with expiry sweeping and a size ceiling.
+    """
+
+    backend = BACKEND_MEMORY
+
+    def __init__(
+        self,
+        max_tokens: int = SPT_MAX_TOKENS,
+        shards: int = SPT_STORE_SHARDS,
+        expired_retention: float = SPT_EXPIRED_RETENTION,
+        sweep_interval: float = SPT_SWEEP_INTERVAL,
+        sweep_batch: int = SPT_SWEEP_BATCH,
+        on_remove: Optional[Callable[[str, int], None]] = None,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        """
+        Initialize an empty token store.
+
+        Args:
+            max_tokens: Most tokens held at once, expired ones included
+            shards: Number of independently locked shards
+            expired_retention: Seconds an expired token is kept before removal
+            sweep_interval: Seconds between background sweeps
+            sweep_batch: Most tokens handled per batch while holding a shard lock
+            on_remove: Called with the reason and count whenever tokens are removed
+            clock: Time source returning Unix seconds
+        """
+        super().__init__(max_tokens, expired_retention, sweep_interval, sweep_batch, on_remove, clock)
+        shards = max(1, min(shards, max_tokens))
+        # The ceiling is split across shards, rounding up so their sum is at least max_tokens
+        self._shards = [_Shard(-(-max_tokens // shards)) for _ in range(shards)]
+
+    def _shard(self, spt_id: str) -> _Shard:
+        return self._shards[hash(spt_id) % len(self._shards)]
+
+    def __len__(self) -> int:
+        return sum(len(shard.tokens) for shard in self._shards)
+
+    def __contains__(self, spt_id: str) -> bool:
+        return spt_id in self._shard(spt_id).tokens
+
+    def get(self, spt_id: str) -> Optional[TokenRecord]:
+        """Return a token, or None if unknown or already removed"""
+        # A single dict lookup is atomic, so reads take no lock
+        return self._shard(spt_id).tokens.get(spt_id)
+
+    def get_many(self, spt_ids: List[str]) -> Dict[str, TokenRecord]:
+        """Return the known tokens among `spt_ids`, by ID"""
+        records = {}
+        for spt_id in spt_ids:
+            record = self._shard(spt_id).tokens.get(spt_id)
+            if record is not None:
+                records[spt_id] = record
+        return records
+
+    def put(self, record: TokenRecord) -> None:
+        """Store a token, evicting one first if its shard is full"""
+        self._notify(REMOVED_EVICTED, self._shard(record.id).put(record, self.sweep_batch))
+
+    def put_many(self, records: List[TokenRecord]) -> None:
+        """Store several tokens, evicting as put() does"""
+        evicted = sum(self._shard(record.id).put(record, self.sweep_batch) for record in records)
+        self._notify(REMOVED_EVICTED, evicted)
+
+    def mark_used(self, spt_id: str) -> Optional[TokenRecord]:
+        """
+        Move an active token to used. Used and expired tokens keep their state.
+
+        Returns:
+            The token, or None if unknown or already removed
+        """
+        return self._shard(spt_id).transition(spt_id, STATUS_USED)
+
+    def clear(self) -> None:
+        for shard in self._shards:
+            shard.clear()
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Number of stored tokens per state, those past their expiry counted as
+        expired. Read-only: marking and removing them is left to the sweeper.
+        """
+        now = self._clock()
+        totals = {status: 0 for status in TRANSITIONS}
+        for shard in self._shards:
+            for status, count in shard.snapshot(now).items():
+                totals[status] += count
+        return totals
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), 'shards': len(self._shards)}
+
+    def sweep(self) -> int:
+        """
+        Mark tokens that reached their expiry as expired, and remove those past
+        the retention period. Works shard by shard in batches of `sweep_batch`,
+        releasing the shard lock in between.
+
+        Returns:
+            Number of tokens removed
+        """
+        removed = 0
+        for shard in self._shards:
+            while True:
+                now = self._clock()
+                marked, batch_removed = shard.sweep(now, now - self.expired_retention, self.sweep_batch)
+                removed += batch_removed
+                if marked < self.sweep_batch and batch_removed < self.sweep_batch:
+                    break
+        self._notify(REMOVED_EXPIRED, removed)
+        return removed
+
+
+class _CommitBatch:
+    """Tokens waiting for the same transaction"""
+
+    def __init__(self) -> None:
+        self.records: List[TokenRecord] = []
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class SQLiteTokenStore(_SweptStore):
+    """
+    Token store in an SQLite file in WAL mode, shared by every process that
+    opens it and kept across restarts.
+
+    Issues are group-committed: a writer thread inserts every token issued
+    while the previous transaction was committing in one transaction, and each
+    issue returns once its token is committed. Lookups use a connection per
+    thread and the primary key index, and WAL lets them run during commits.
+    Opening the file replays its WAL, so startup does not depend on how many
+    tokens are stored.
+    """
+
+    backend = BACKEND_SQLITE
+
+    def __init__(
+        self,
+        path: str = SPT_STORE_PATH,
+        max_tokens: int = SPT_MAX_TOKENS,
+        expired_retention: float = SPT_EXPIRED_RETENTION,
+        sweep_interval: float = SPT_SWEEP_INTERVAL,
+        sweep_batch: int = SPT_SWEEP_BATCH,
+        commit_delay: float = SPT_COMMIT_DELAY,
+        commit_batch: int = SPT_COMMIT_BATCH,
+        on_remove: Optional[Callable[[str, int], None]] = None,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        """
+        Open (or create) the token database.
+
+        Args:
+            path: SQLite file holding the tokens
+            max_tokens: Most tokens held at once, expired ones included
+            expired_retention: Seconds an expired token is kept before removal
+            sweep_interval: Seconds between background sweeps
+            sweep_batch: Most tokens updated or deleted per sweep transaction
+            commit_delay: Seconds the writer waits for more tokens before committing
+            commit_batch: Most tokens inserted per transaction
+            on_remove: Called with the reason and count whenever tokens are removed
+            clock: Time source returning Unix seconds
+        """
+        super().__init__(max_tokens, expired_retention, sweep_interval, sweep_batch, on_remove, clock)
+        self.path = path
+        self.commit_delay = commit_delay
+        self.commit_batch = commit_batch
+        self._local = threading.local()
+        self._connection().executescript(SQLITE_SCHEMA)
+
+        self._batch_ready = threading.Condition()
+        # Transactions waiting for the writer, oldest first
+        self._batches: Deque[_CommitBatch] = deque()
+        self._commits = 0
+        self._committed = 0
+        self._writer = threading.Thread(target=self._write_loop, name='spt-writer', daemon=True)
+        self._writer.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            self._local.connection = connection
+        return connection
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM tokens').fetchone()[0]
+
+    def __contains__(self, spt_id: str) -> bool:
+        return self._connection().execute('SELECT 1 FROM tokens WHERE id = ?', (spt_id,)).fetchone() is not None
+
+    def get(self, spt_id: str) -> Optional[TokenRecord]:
+        """Return a token, or None if unknown or already removed"""
+        row = self._connection().execute(f"SELECT {SQLITE_COLUMNS} FROM tokens WHERE id = ?", (spt_id,)).fetchone()
+        return TokenRecord(*row) if row is not None else None
+
+    def get_many(self, spt_ids: List[str]) -> Dict[str, TokenRecord]:
+        """Return the known tokens among `spt_ids`, by ID, with one query per chunk of IDs"""
+        records = {}
+        for start in range(0, len(spt_ids), SQLITE_LOOKUP_CHUNK):
+            chunk = spt_ids[start:start + SQLITE_LOOKUP_CHUNK]
+            rows = self._connection().execute(
+                f"SELECT {SQLITE_COLUMNS} FROM tokens WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            for row in rows:
+                records[row[0]] = TokenRecord(*row)
+        return records
+
+    def put(self, record: TokenRecord) -> None:
+        """
+        Store a token, returning once the transaction holding it has committed.
+
+        Raises:
+            sqlite3.Error: If the transaction failed
+        """
+        self.put_many([record])
+
+    def put_many(self, records: List[TokenRecord]) -> None:
+        """
+        Store several tokens, returning once every transaction holding them has
+        committed. They join the pending transactions like single issues, so
+        a large batch is split at `commit_batch` tokens.
+
+        Raises:
+            sqlite3.Error: If a transaction failed
+        """
+        batches: List[_CommitBatch] = []
+        with self._batch_ready:
+            for record in records:
+                if not self._batches or len(self._batches[-1].records) >= self.commit_batch:
+                    self._batches.append(_CommitBatch())
+                    self._batch_ready.notify()
+                if not batches or batches[-1] is not self._batches[-1]:
+                    batches.append(self._batches[-1])
+                self._batches[-1].records.append(record)
+        for batch in batches:
+            batch.done.wait()
+        for batch in batches:
+            if batch.error is not None:
+                raise batch.error
+
+    def mark_used(self, spt_id: str) -> Optional[TokenRecord]:
+        """
+        Move an active token to used. Used and expired tokens keep their state.
+
+        Returns:
+            The token, or None if unknown or already removed
+        """
+        self._connection().execute(
+            'UPDATE tokens SET status = ? WHERE id = ? AND status = ?', (STATUS_USED, spt_id, STATUS_ACTIVE)
+        )
+        return self.get(spt_id)
+
+    def clear(self) -> None:
+        self._connection().execute('DELETE FROM tokens')
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Number of stored tokens per state, those past their expiry counted as
+        expired. Read-only, so monitoring never writes to the shared file:
+        marking and removing expired tokens is left to the sweeper.
+        """
+        now = self._clock()
+        stored, active, used = self._connection().execute(
+            "SELECT COUNT(*),"
+            " COALESCE(SUM(status = 'active' AND (expires_at IS NULL OR expires_at >= ?)), 0),"
+            " COALESCE(SUM(status = 'used' AND (expires_at IS NULL OR expires_at >= ?)), 0)"
+            " FROM tokens", (now, now)
+        ).fetchone()
+        return {STATUS_ACTIVE: active, STATUS_USED: used, STATUS_EXPIRED: stored - active - used}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._batch_ready:
+            commits, committed = self._commits, self._committed
+        return {
+            **super().stats(),
+            'path': self.path,
+            'commits': commits,
+            'tokens_per_commit': round(committed / commits, 2) if commits else 0
+        }
+
+    def sweep(self) -> int:
+        """
+        Mark tokens that reached their expiry as expired, remove those past the
+        retention period, then evict down to `max_tokens`: expired tokens
+        first, then the oldest. Each statement handles at most `sweep_batch`
+        tokens, so other processes' writes are never held up for long.
+
+        Returns:
+            Number of tokens removed
+        """
+        now = self._clock()
+        # The status literal lets SQLite use the partial index of unexpired tokens
+        self._run_batches(
+            "UPDATE tokens SET status = 'expired' WHERE rowid IN (SELECT rowid FROM tokens"
+            " WHERE expires_at < ? AND status != 'expired' LIMIT ?)", now
+        )
+
+        removed = self._run_batches(
+            'DELETE FROM tokens WHERE rowid IN (SELECT rowid FROM tokens WHERE expires_at < ? LIMIT ?)',
+            now - self.expired_retention
+        )
+        self._notify(REMOVED_EXPIRED, removed)
+
+        evicted = 0
+        excess = len(self) - self.max_tokens
+        if excess > 0:
+            evicted += self._run_batches(
+                'DELETE FROM tokens WHERE rowid IN (SELECT rowid FROM tokens'
+                ' WHERE status = ? ORDER BY expires_at LIMIT ?)', STATUS_EXPIRED, limit=excess
+            )
+            evicted += self._run_batches(
+                'DELETE FROM tokens WHERE rowid IN (SELECT rowid FROM tokens ORDER BY rowid LIMIT ?)',
+                limit=excess - evicted
+            )
+        self._notify(REMOVED_EVICTED, evicted)
+        return removed + evicted
+
+    def _run_batches(self, statement: str, *parameters: Any, limit: Optional[int] = None) -> int:
+        """
+        Run an UPDATE or DELETE ending in LIMIT ? repeatedly, one transaction per
+        batch, until it changes fewer rows than the batch or `limit` rows in total.
+        Returns the number of rows changed.
+        """
+        changed = 0
+        while limit is None or changed < limit:
+            batch = self.sweep_batch if limit is None else min(self.sweep_batch, limit - changed)
+            count = self._connection().execute(statement, (*parameters, batch)).rowcount
+            changed += count
+            if count < batch:
+                break
+        return changed
+
+    def _write_loop(self) -> None:
+        connection = self._connection()
+        while True:
+            with self._batch_ready:
+                self._batch_ready.wait_for(lambda: self._batches)
+                if self.commit_delay:
+                    # Let concurrent issues join the transaction
+                    self._batch_ready.wait_for(
+                        lambda: len(self._batches[0].records) >= self.commit_batch, timeout=self.commit_delay
+                    )
+                # Issues arriving from now on start the next transaction
+                batch = self._batches.popleft()
+
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    connection.executemany(
+                        f"INSERT OR REPLACE INTO tokens ({SQLITE_COLUMNS}) VALUES ({', '.join('?' * 10)})",
+                        [_record_row(record) for record in batch.records]
+                    )
+                    connection.execute('COMMIT')
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                with self._batch_ready:
+                    self._commits += 1
+                    self._committed += len(batch.records)
+            except Exception as error:
+                batch.error = error
+            batch.done.set()
+
+
+def _record_row(record: TokenRecord) -> Tuple[Any, ...]:
+    return tuple(getattr(record, column) for column in SQLITE_COLUMN_NAMES)
+
+
+def create_token_store(backend: str = SPT_STORE_BACKEND, **kwargs: Any) -> _SweptStore:
+    """
+    Create the token store for a backend.
+
+    Args:
+        backend: BACKEND_MEMORY or BACKEND_SQLITE
+        **kwargs: Options passed to the store
+
+    Returns:
+        A TokenStore or SQLiteTokenStore
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == BACKEND_MEMORY:
+        return TokenStore(**kwargs)
+    if backend == BACKEND_SQLITE:
+        return SQLiteTokenStore(**kwargs)
+    raise ValueError(f"Unknown SPT store backend: {backend}")
@@ -271,7 +271,7 @@ app.post(
         checkout.buyer = createBuyer(buyer);
       }
 
-      await processPayment(checkout, payment_data);
+      await processPayment(checkout, payment_data, req.header('traceparent'));
       
       checkout.status = CheckoutStatus.COMPLETED;
       addMessage(checkout, MessageType.INFO, 'Payment processed successfully. Order confirmed!');
@@ -562,16 +562,18 @@ function updateCheckoutStatus(checkout: CheckoutSession): void {
  * 
  * @param checkout - Checkout session to process payment for
  * @param paymentData - Payment data containing token
+ * @param traceparent - W3C traceparent header of the incoming request, forwarded to the SPT server
  * @throws Error if payment processing fails
  */
 async function processPayment(
   checkout: CheckoutSession,
-  paymentData: PaymentData
+  paymentData: PaymentData,
+  traceparent?: string
 ): Promise<void> {
   const totalAmount = getTotalAmount(checkout);
   
   if (paymentData.token.startsWith('spt_')) {
-    await processMockSptPayment(checkout, paymentData, totalAmount);
+    await processMockSptPayment(checkout, paymentData, totalAmount, traceparent);
   } else {
     throw new Error('Only SPT tokens are supported in demo mode');
   }
@@ -598,16 +600,19 @@ function getTotalAmount(checkout: CheckoutSession): number {
  * @param checkout - Checkout session
  * @param paymentData - Payment data containing SPT token
  * @param totalAmount - Total amount to charge in cents
+ * @param traceparent - W3C traceparent header to forward, if any
  * @throws Error if payment processing fails
  */
 async function processMockSptPayment(
   checkout: CheckoutSession,
   paymentData: PaymentData,
-  totalAmount: number
+  totalAmount: number,
+  traceparent?: string
 ): Promise<void> {
   // Step 1: Retrieve payment method from mock SPT server
   const sptResponse = await fetch(
-    `${MOCK_STRIPE_SPT_URL}/v1/shared_payment/granted_tokens/${paymentData.token}`
+    `${MOCK_STRIPE_SPT_URL}/v1/shared_payment/granted_tokens/${paymentData.token}`,
+    { headers: traceparent ? { traceparent } : {} }
   );
 
   const sptData = await sptResponse.json() as MockSptResponse;